@@ -5,13 +5,85 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key'
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
+    BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))  # Hashes with another cost are upgraded at login
+    PASSWORD_HASH_CONCURRENCY = int(os.environ.get('PASSWORD_HASH_CONCURRENCY', 8))  # Max bcrypt calls running at once
+    PASSWORD_HASH_WAIT_TIMEOUT = float(os.environ.get('PASSWORD_HASH_WAIT_TIMEOUT', 5.0))  # Seconds to wait for a slot before a 503
     
     # MongoDB
     MONGO_URI = os.environ.get('MONGO_URI') or 'mongodb://localhost:27017/paper_trading'
+    AUTO_MIGRATE = os.environ.get('AUTO_MIGRATE', 'true').lower() == 'true'  # Apply index migrations in create_app
     
     # Redis
     REDIS_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379/0'
     
+    # Model cache
+    MODEL_CACHE_TTL = int(os.environ.get('MODEL_CACHE_TTL', 60))  # Seconds a cached portfolio or profile lives in Redis
+    MODEL_CACHE_MAX_BYTES = int(os.environ.get('MODEL_CACHE_MAX_BYTES', 2048))  # Larger documents are not cached
+    
+    # Notifications
+    NOTIFICATION_BACKEND = os.environ.get('NOTIFICATION_BACKEND', 'log')  # 'log' prints messages, 'live' sends them
+    NOTIFICATION_WORKERS = int(os.environ.get('NOTIFICATION_WORKERS', 4))  # Dispatch threads, each with its own SMTP session
+    NOTIFICATION_QUEUE_SIZE = int(os.environ.get('NOTIFICATION_QUEUE_SIZE', 10000))  # Jobs beyond this are dropped
+    NOTIFICATION_MAX_RETRIES = int(os.environ.get('NOTIFICATION_MAX_RETRIES', 3))
+    NOTIFICATION_RETRY_BACKOFF = float(os.environ.get('NOTIFICATION_RETRY_BACKOFF', 0.5))  # Seconds, doubled per retry
+    NOTIFICATION_TIMEOUT = float(os.environ.get('NOTIFICATION_TIMEOUT', 10.0))  # SMTP and SMS API timeout
+    NOTIFICATION_COALESCE_WINDOW = float(os.environ.get('NOTIFICATION_COALESCE_WINDOW', 5.0))  # Seconds events are held to merge into a digest
+    NOTIFICATION_SMS_MIN_INTERVAL = float(os.environ.get('NOTIFICATION_SMS_MIN_INTERVAL', 60.0))  # Min seconds between SMS per user
+    NOTIFICATION_EMAIL_MIN_INTERVAL = float(os.environ.get('NOTIFICATION_EMAIL_MIN_INTERVAL', 10.0))  # Min seconds between emails per user
+    SMTP_SERVER = os.environ.get('SMTP_SERVER', 'smtp.gmail.com')
+    SMTP_PORT = int(os.environ.get('SMTP_PORT', 587))
+    SMTP_USE_TLS = os.environ.get('SMTP_USE_TLS', 'true').lower() == 'true'
+    EMAIL_SENDER = os.environ.get('EMAIL_SENDER', 'noreply@papertrading.com')
+    EMAIL_PASSWORD = os.environ.get('EMAIL_PASSWORD', '')
+    SMS_API_URL = os.environ.get('SMS_API_URL', 'https://api.sms_service.com/send')
+    SMS_API_KEY = os.environ.get('SMS_API_KEY', '')
+    
     # Market Data API
     MARKET_DATA_API_KEY = os.environ.get('MARKET_DATA_API_KEY', '')
-    MARKET_DATA_BASE_URL = 'https://api.upstox.com/v2'  # Example API
\ No newline at end of file
+    MARKET_DATA_BASE_URL = os.environ.get('MARKET_DATA_BASE_URL', 'https://api.upstox.com/v2')  # Example API
+    MARKET_DATA_PROVIDER = os.environ.get('MARKET_DATA_PROVIDER', 'mock')  # mock, http, synthetic or replay
+    MARKET_DATA_POOL_SIZE = int(os.environ.get('MARKET_DATA_POOL_SIZE', 20))  # Keep-alive connections to the quote API
+    MARKET_DATA_TIMEOUT = float(os.environ.get('MARKET_DATA_TIMEOUT', 2.0))
+    MARKET_DATA_BATCH_SIZE = int(os.environ.get('MARKET_DATA_BATCH_SIZE', 50))  # Symbols per upstream quote request
+    MARKET_DATA_FEED_ENABLED = os.environ.get('MARKET_DATA_FEED_ENABLED', 'false').lower() == 'true'  # Stream provider ticks
+    FEED_BATCH_SIZE = int(os.environ.get('FEED_BATCH_SIZE', 500))  # Ticks per pipelined Redis write
+    SYNTHETIC_SYMBOLS = os.environ.get('SYNTHETIC_SYMBOLS', 'NIFTY50,SENSEX,RELIANCE,TCS').split(',')
+    SYNTHETIC_SEED = int(os.environ.get('SYNTHETIC_SEED', 42))
+    SYNTHETIC_TICK_RATE = int(os.environ.get('SYNTHETIC_TICK_RATE', 5000))  # Ticks per second across all symbols
+    SYNTHETIC_VOLATILITY = float(os.environ.get('SYNTHETIC_VOLATILITY', 0.2))  # Annualized
+    REPLAY_FILE = os.environ.get('REPLAY_FILE', '')
+    REPLAY_SPEED = float(os.environ.get('REPLAY_SPEED', 1.0))  # 0 replays as fast as possible
+    PRICE_CACHE_TTL = int(os.environ.get('PRICE_CACHE_TTL', 5))  # Seconds a quote lives in Redis and in-process
+    PRICE_STALE_TTL = int(os.environ.get('PRICE_STALE_TTL', 60))  # Seconds a stale quote may be served during a refresh
+    PRICE_REFRESH_LOCK_MS = int(os.environ.get('PRICE_REFRESH_LOCK_MS', 2000))  # Cross-process refresh lock lifetime
+    QUOTE_CACHE_SIZE = int(os.environ.get('QUOTE_CACHE_SIZE', 1024))  # Max symbols in the in-process quote cache
+    
+    # Trade monitor
+    MONITOR_IN_PROCESS = os.environ.get('MONITOR_IN_PROCESS', 'true').lower() == 'true'  # Disable when running monitor_worker.py
+    MONITOR_MODE = os.environ.get('MONITOR_MODE', 'push')  # 'push' reacts to published ticks, 'poll' only scans
+    MONITOR_POLL_INTERVAL = int(os.environ.get('MONITOR_POLL_INTERVAL', 5))  # Seconds between scans when polling
+    MONITOR_SWEEP_INTERVAL = int(os.environ.get('MONITOR_SWEEP_INTERVAL', 30))  # Safety scan while push is healthy
+    MONITOR_TICK_STALE_AFTER = int(os.environ.get('MONITOR_TICK_STALE_AFTER', 10))  # Seconds without a tick before push falls back to polling
+    MONITOR_BOOK = os.environ.get('MONITOR_BOOK', 'levels')  # 'levels' (sorted trigger levels) or 'columnar' (NumPy)
+    MONITOR_RESYNC_INTERVAL = int(os.environ.get('MONITOR_RESYNC_INTERVAL', 60))  # Seconds between trigger book reloads
+    MTM_SNAPSHOT_INTERVAL = int(os.environ.get('MTM_SNAPSHOT_INTERVAL', 0))  # Seconds between stored marks of open trades; 0 writes every pass
+    MONITOR_SHARDS = int(os.environ.get('MONITOR_SHARDS', 64))  # Symbol partitions leased out to monitor workers
+    MONITOR_LEASE_TTL = int(os.environ.get('MONITOR_LEASE_TTL', 15))  # Seconds a shard lease lives without renewal
+    
+    # Socket.IO market data stream
+    MARKET_STREAM_INTERVAL = float(os.environ.get('MARKET_STREAM_INTERVAL', 0.25))  # Min seconds between pushes per symbol
+    MARKET_STREAM_LEADER_TTL = int(os.environ.get('MARKET_STREAM_LEADER_TTL', 5))  # Seconds the broadcaster lease lives
+    MARKET_STREAM_POLL_AFTER = float(os.environ.get('MARKET_STREAM_POLL_AFTER', 2.0))  # Seconds without a tick before a watched symbol is polled
+    PORTFOLIO_STREAM_INTERVAL = float(os.environ.get('PORTFOLIO_STREAM_INTERVAL', 0.5))  # Seconds between PnL pushes per user
+    PORTFOLIO_STREAM_LOAD_TIMEOUT = float(os.environ.get('PORTFOLIO_STREAM_LOAD_TIMEOUT', 10.0))  # Seconds a second socket waits for the user's positions to load
+    
+    # OHLCV candles
+    CANDLES_ENABLED = os.environ.get('CANDLES_ENABLED', 'true').lower() == 'true'  # Aggregate ticks into bars in run.py
+    CANDLE_INTERVALS = os.environ.get('CANDLE_INTERVALS', '1m,5m,15m,1d')  # Bar sizes built from ticks
+    CANDLE_FLUSH_INTERVAL = float(os.environ.get('CANDLE_FLUSH_INTERVAL', 1.0))  # Seconds between hot/closed bar writes
+    CANDLE_CLOSE_GRACE = float(os.environ.get('CANDLE_CLOSE_GRACE', 2.0))  # Seconds a bar stays open for late ticks
+    CANDLE_LEADER_TTL = int(os.environ.get('CANDLE_LEADER_TTL', 5))  # Seconds the aggregator lease lives
+    CANDLE_MAX_LIMIT = int(os.environ.get('CANDLE_MAX_LIMIT', 5000))  # Most bars one /market/candles response returns
+    
+    # Metrics
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'  # Serve /metrics and time requests, Mongo and Redis
\ No newline at end of file
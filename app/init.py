@@ -1,9 +1,10 @@
-from flask import Flask
-from flask_socketio import SocketIO
-from flask_jwt_extended import JWTManager
+from flask import Flask, g, request
+from flask_socketio import SocketIO, emit
+from flask_jwt_extended import JWTManager, decode_token
 from pymongo import MongoClient
 import redis
 import os
+import time
 
 # Initialize extensions
 socketio = SocketIO()
@@ -21,10 +22,53 @@ def create_app():
     socketio.init_app(app, cors_allowed_origins="*", message_queue=app.config['REDIS_URL'])
     jwt.init_app(app)
     
-    # Initialize databases
+    # Initialize databases, timing every Mongo command and Redis call when metrics are on
+    from app.config import Config
     global mongo_client, redis_client
-    mongo_client = MongoClient(app.config['MONGO_URI'])
-    redis_client = redis.from_url(app.config['REDIS_URL'])
+    if Config.METRICS_ENABLED:
+        from app.services.metrics import InstrumentedRedis, MongoCommandListener
+        mongo_client = MongoClient(app.config['MONGO_URI'], event_listeners=[MongoCommandListener()])
+        redis_client = InstrumentedRedis.from_url(app.config['REDIS_URL'])
+    else:
+        mongo_client = MongoClient(app.config['MONGO_URI'])
+        redis_client = redis.from_url(app.config['REDIS_URL'])
+    
+    # Indexes and other schema migrations
+    from app.migrations import run_migrations, check_query_plans
+    if Config.AUTO_MIGRATE:
+        run_migrations(mongo_client.paper_trading)
+    
+    @app.cli.command('migrate')
+    def migrate_command():
+        """Apply pending index migrations"""
+        applied = run_migrations(mongo_client.paper_trading)
+        print(f"{len(applied)} migration(s) applied")
+    
+    @app.cli.command('rebuild-stats')
+    def rebuild_stats_command():
+        """Recompute every user's trade stats from their trades"""
+        from app.models.trade_stats import TradeStats
+        print(f"Trade stats rebuilt for {TradeStats.rebuild()} user(s)")
+    
+    @app.cli.command('check-query-plans')
+    def check_query_plans_command():
+        """Fail if any hot query falls back to a collection scan"""
+        collscans = check_query_plans(mongo_client.paper_trading)
+        for name in collscans:
+            print(f"COLLSCAN: {name}")
+        if collscans:
+            raise SystemExit(1)
+        print("All hot queries use an index")
+    
+    @app.cli.command('square-off')
+    def square_off_command():
+        """Close every active trade at market, e.g. after the session ends"""
+        from app.services.settlement import settlement_service
+        summary = settlement_service.square_off_all()
+        print(
+            f"Squared off {summary['closed']} of {summary['active']} active trades: "
+            f"{summary['margin_freed']:.2f} margin freed, {summary['pnl']:.2f} PnL"
+        )
     
     # Register blueprints
     from app.routes.auth import auth_bp
@@ -37,21 +81,51 @@ def create_app():
     app.register_blueprint(trades_bp, url_prefix='/trades')
     app.register_blueprint(market_bp, url_prefix='/market')
     
+    if Config.METRICS_ENABLED:
+        from app.routes.metrics import metrics_bp, register_collectors
+        from app.services.metrics import http_request_duration
+        register_collectors()
+        app.register_blueprint(metrics_bp)
+        
+        @app.before_request
+        def start_request_timer():
+            g.request_started = time.perf_counter()
+        
+        @app.after_request
+        def record_request_duration(response):
+            started = g.pop('request_started', None)
+            if started is not None:
+                # The route pattern, not the path, keeps one series per endpoint
+                route = request.url_rule.rule if request.url_rule else 'unmatched'
+                http_request_duration.observe(
+                    time.perf_counter() - started, request.blueprint or '', route, request.method, str(response.status_code)
+                )
+            return response
+    
+    from app.services.market_data import market_data_service
+    from app.services.market_stream import market_broadcaster
+    from app.services.portfolio_stream import portfolio_stream
+    
     # WebSocket events
     @socketio.on('connect')
     def handle_connect():
         print('Client connected')
+        market_broadcaster.connect(request.sid)
         emit('connection_status', {'status': 'connected'})
     
     @socketio.on('disconnect')
     def handle_disconnect():
         print('Client disconnected')
+        market_broadcaster.disconnect(request.sid)
+        portfolio_stream.disconnect(request.sid)
     
     @socketio.on('subscribe_market_data')
     def handle_subscribe_market_data(data):
-        symbol = data.get('symbol')
+        symbol = (data.get('symbol') or '').upper()
         if symbol:
-            # In a real implementation, you'd add to a room
+            # Join the symbol's room; the broadcaster pushes every later tick
+            market_broadcaster.start()
+            market_broadcaster.subscribe(request.sid, symbol)
             emit('market_data', {
                 'symbol': symbol,
                 'data': market_data_service.get_live_price(symbol)
@@ -59,7 +133,24 @@ def create_app():
     
     @socketio.on('unsubscribe_market_data')
     def handle_unsubscribe_market_data(data):
-        symbol = data.get('symbol')
-        # Remove from room implementation
+        symbol = (data.get('symbol') or '').upper()
+        if symbol:
+            market_broadcaster.unsubscribe(request.sid, symbol)
+    
+    @socketio.on('subscribe_portfolio')
+    def handle_subscribe_portfolio(data):
+        # The access token identifies the user whose PnL is streamed
+        try:
+            client_id = decode_token(data.get('token', ''))['sub']
+        except Exception:
+            emit('portfolio_error', {'error': 'Invalid or expired token'})
+            return
+        
+        portfolio_stream.start()
+        emit('portfolio_pnl', portfolio_stream.subscribe(request.sid, client_id))
+    
+    @socketio.on('unsubscribe_portfolio')
+    def handle_unsubscribe_portfolio(data):
+        portfolio_stream.disconnect(request.sid)
     
     return app
\ No newline at end of file
@@ -0,0 +1,118 @@
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import CollectionInvalid, DuplicateKeyError
+
+def _initial_indexes(db):
+    db.trades.create_indexes([
+        # Monitor scans and per-symbol mark-to-market only ever touch open trades
+        IndexModel(
+            [('status', ASCENDING), ('symbol', ASCENDING)],
+            name='active_by_symbol',
+            partialFilterExpression={'status': 'ACTIVE'}
+        ),
+        IndexModel([('user_id', ASCENDING), ('status', ASCENDING)], name='user_status'),
+        # Keyset-paginated history, newest first
+        IndexModel(
+            [('user_id', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)],
+            name='user_history'
+        )
+    ])
+    db.users.create_indexes([
+        IndexModel([('email', ASCENDING)], name='email_unique', unique=True),
+        IndexModel([('client_id', ASCENDING)], name='client_id_unique', unique=True)
+    ])
+    db.portfolios.create_index([('user_id', ASCENDING)], name='user_id_unique', unique=True)
+    db.trade_stats.create_index([('user_id', ASCENDING)], name='user_id_unique', unique=True)
+
+def _candles_collection(db):
+    # Time-series storage buckets bars per symbol/interval; needs MongoDB 5.0+
+    try:
+        db.create_collection(
+            'candles',
+            timeseries={'timeField': 't', 'metaField': 'meta', 'granularity': 'minutes'}
+        )
+    except CollectionInvalid:
+        pass  # Already created
+    db.candles.create_index(
+        [('meta.symbol', ASCENDING), ('meta.interval', ASCENDING), ('t', ASCENDING)],
+        name='symbol_interval_time'
+    )
+
+def _uppercase_trade_symbols(db):
+    # Trades were stored with the symbol as sent; lookups and filters use upper case
+    db.trades.update_many(
+        {'symbol': {'$regex': '[a-z]'}},
+        [{'$set': {'symbol': {'$toUpper': '$symbol'}}}]
+    )
+
+# Applied in order, once each; append new versions, never edit applied ones
+MIGRATIONS = [
+    (1, 'Initial index set', _initial_indexes),
+    (2, 'Candles time-series collection', _candles_collection),
+    (3, 'Upper-case trade symbols', _uppercase_trade_symbols)
+]
+
+# Queries on hot paths that must never fall back to a collection scan
+HOT_QUERIES = [
+    ('monitor active trades', 'trades', {'status': 'ACTIVE'}, None),
+    ('active trades by symbol', 'trades', {'symbol': 'RELIANCE', 'status': 'ACTIVE'}, None),
+    ('user active trades', 'trades', {'user_id': 'client01', 'status': 'ACTIVE'}, None),
+    ('user history page', 'trades', {'user_id': 'client01'}, [('created_at', -1), ('_id', -1)]),
+    ('user by email', 'users', {'email': 'user@example.com'}, None),
+    ('user by client_id', 'users', {'client_id': 'client01'}, None),
+    ('portfolio by user', 'portfolios', {'user_id': 'client01'}, None),
+    ('trade stats by user', 'trade_stats', {'user_id': 'client01'}, None),
+    ('candles by symbol', 'candles', {'meta.symbol': 'RELIANCE', 'meta.interval': '1m'}, [('t', -1)])
+]
+
+def run_migrations(db):
+    """Apply every migration not yet recorded in schema_migrations"""
+    applied = {migration['_id'] for migration in db.schema_migrations.find({}, {'_id': 1})}
+    newly_applied = []
+    for version, description, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        
+        migrate(db)
+        try:
+            db.schema_migrations.insert_one({
+                '_id': version,
+                'description': description,
+                'applied_at': datetime.utcnow()
+            })
+        except DuplicateKeyError:
+            pass  # Another process applied it concurrently; migrations are idempotent
+        newly_applied.append(version)
+        print(f"Applied migration {version}: {description}")
+    return newly_applied
+
+def _plan_stages(plan):
+    """Yield every stage name in an explain() plan tree"""
+    if not isinstance(plan, dict):
+        return
+    if 'stage' in plan:
+        yield plan['stage']
+    for key in ('inputStage', 'queryPlan', 'thenStage', 'elseStage'):
+        yield from _plan_stages(plan.get(key))
+    for child in plan.get('inputStages', []):
+        yield from _plan_stages(child)
+
+def _winning_plan(explain):
+    """The winning plan of a find explain; time-series collections wrap it in an aggregation"""
+    if 'queryPlanner' in explain:
+        return explain['queryPlanner']['winningPlan']
+    for stage in explain.get('stages', []):
+        if '$cursor' in stage:
+            return stage['$cursor']['queryPlanner']['winningPlan']
+    return {}
+
+def check_query_plans(db):
+    """Explain each hot query; return the names of those that use a COLLSCAN"""
+    collscans = []
+    for name, collection, query, sort in HOT_QUERIES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        if 'COLLSCAN' in _plan_stages(_winning_plan(cursor.explain())):
+            collscans.append(name)
+    return collscans
\ No newline at end of file
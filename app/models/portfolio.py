@@ -1,5 +1,7 @@
 from datetime import datetime
+from pymongo import ReturnDocument, UpdateOne
 from app import mongo_client
+from app.services.model_cache import portfolio_cache
 
 class Portfolio:
     def __init__(self, user_id, available_margin=100000.0):
@@ -20,40 +22,97 @@ class Portfolio:
             'created_at': self.created_at,
             'updated_at': self.updated_at
         }
-        return db.portfolios.insert_one(portfolio_data)
+        result = db.portfolios.insert_one(portfolio_data)
+        portfolio_cache.set(self.user_id, portfolio_data)
+        return result
+    
+    @staticmethod
+    def from_dict(portfolio_data):
+        portfolio = Portfolio(
+            user_id=portfolio_data['user_id'],
+            available_margin=portfolio_data['available_margin']
+        )
+        portfolio.utilized_margin = portfolio_data['utilized_margin']
+        portfolio.total_pnl = portfolio_data['total_pnl']
+        portfolio.created_at = portfolio_data['created_at']
+        portfolio.updated_at = portfolio_data['updated_at']
+        return portfolio
     
     @staticmethod
     def find_by_user_id(user_id):
+        """Read through the portfolio cache; margin checks never rely on it"""
+        portfolio_data, generation = portfolio_cache.lookup(user_id)
+        if portfolio_data:
+            return Portfolio.from_dict(portfolio_data)
+        
         db = mongo_client.paper_trading
         portfolio_data = db.portfolios.find_one({'user_id': user_id})
         if portfolio_data:
-            portfolio = Portfolio(
-                user_id=portfolio_data['user_id'],
-                available_margin=portfolio_data['available_margin']
-            )
-            portfolio.utilized_margin = portfolio_data['utilized_margin']
-            portfolio.total_pnl = portfolio_data['total_pnl']
-            portfolio.created_at = portfolio_data['created_at']
-            portfolio.updated_at = portfolio_data['updated_at']
-            return portfolio
+            portfolio_cache.set(user_id, portfolio_data, generation=generation)
+            return Portfolio.from_dict(portfolio_data)
         return None
     
+    @staticmethod
+    def reserve_margin(user_id, amount):
+        """Move amount from available to utilized margin in one conditional update.
+        
+        Returns the updated portfolio, or None when the portfolio is missing
+        or has less than amount available; nothing is written in that case.
+        """
+        db = mongo_client.paper_trading
+        portfolio_data = db.portfolios.find_one_and_update(
+            {'user_id': user_id, 'available_margin': {'$gte': amount}},
+            Portfolio.margin_change(amount),
+            return_document=ReturnDocument.AFTER
+        )
+        if portfolio_data:
+            # Concurrent updates may finish in any order, so drop rather than overwrite
+            portfolio_cache.invalidate(user_id)
+        return Portfolio.from_dict(portfolio_data) if portfolio_data else None
+    
+    @staticmethod
+    def release_margin(user_id, amount, pnl=0):
+        """Return amount to available margin and book pnl in one update"""
+        db = mongo_client.paper_trading
+        portfolio_data = db.portfolios.find_one_and_update(
+            {'user_id': user_id},
+            Portfolio.margin_change(-amount, pnl),
+            return_document=ReturnDocument.AFTER
+        )
+        portfolio_cache.invalidate(user_id)
+        return Portfolio.from_dict(portfolio_data) if portfolio_data else None
+    
     def update_margin(self, utilized_margin_change, pnl_change=0):
+        """Apply a margin/PnL change as an increment and refresh from the stored values"""
         db = mongo_client.paper_trading
-        self.utilized_margin += utilized_margin_change
-        self.available_margin -= utilized_margin_change
-        self.total_pnl += pnl_change
-        self.updated_at = datetime.utcnow()
-        
-        db.portfolios.update_one(
+        portfolio_data = db.portfolios.find_one_and_update(
             {'user_id': self.user_id},
-            {'$set': {
-                'available_margin': self.available_margin,
-                'utilized_margin': self.utilized_margin,
-                'total_pnl': self.total_pnl,
-                'updated_at': self.updated_at
-            }}
+            Portfolio.margin_change(utilized_margin_change, pnl_change),
+            return_document=ReturnDocument.AFTER
         )
+        portfolio_cache.invalidate(self.user_id)
+        if portfolio_data:
+            self.available_margin = portfolio_data['available_margin']
+            self.utilized_margin = portfolio_data['utilized_margin']
+            self.total_pnl = portfolio_data['total_pnl']
+            self.updated_at = portfolio_data['updated_at']
+    
+    @staticmethod
+    def margin_change(utilized_margin_change, pnl_change=0):
+        """Update document incrementing margins and PnL, so concurrent changes never overwrite each other"""
+        return {
+            '$inc': {
+                'utilized_margin': utilized_margin_change,
+                'available_margin': -utilized_margin_change,
+                'total_pnl': pnl_change
+            },
+            '$set': {'updated_at': datetime.utcnow()}
+        }
+    
+    @staticmethod
+    def release_margin_op(user_id, amount, pnl=0):
+        """Bulk op form of release_margin, one per user in a settlement batch"""
+        return UpdateOne({'user_id': user_id}, Portfolio.margin_change(-amount, pnl))
     
     def to_dict(self):
         return {
@@ -1,19 +1,31 @@
+import base64
 from datetime import datetime
-from enum import Enum
+from bson.objectid import ObjectId
+from pymongo import UpdateMany, UpdateOne
 from app import mongo_client
+from app.models.trade_rules import TradeType, TradeStatus, calculate_pnl, evaluate_auto_exit
 
-class TradeType(Enum):
-    BUY = "BUY"
-    SELL = "SELL"
-
-class TradeStatus(Enum):
-    ACTIVE = "ACTIVE"
-    CLOSED = "CLOSED"
-    STOP_LOSS_HIT = "STOP_LOSS_HIT"
-    TARGET_HIT = "TARGET_HIT"
+# Fields read for trade listings; anything else on the document is skipped
+TRADE_LIST_PROJECTION = {
+    'user_id': 1,
+    'symbol': 1,
+    'trade_type': 1,
+    'quantity': 1,
+    'entry_price': 1,
+    'current_price': 1,
+    'margin_used': 1,
+    'stop_loss': 1,
+    'target_price': 1,
+    'pnl': 1,
+    'status': 1,
+    'created_at': 1,
+    'updated_at': 1,
+    'closed_at': 1,
+    'exit_price': 1
+}
 
 class Trade:
-    def __init__(self, user_id, symbol, trade_type, quantity, entry_price, 
+    def __init__(self, user_id, symbol, trade_type, quantity, entry_price,
                  margin_used, stop_loss=None, target_price=None):
         self.trade_id = None
         self.user_id = user_id
@@ -55,20 +67,32 @@ class Trade:
         self.trade_id = str(result.inserted_id)
         return result
     
+    def apply_live_price(self, current_price):
+        """Mark an active trade at current_price in memory only; closed trades keep their exit values"""
+        if self.status == TradeStatus.ACTIVE:
+            self.current_price = current_price
+            self.pnl = calculate_pnl(self.trade_type, self.entry_price, current_price, self.quantity)
+    
+    @staticmethod
+    def apply_live_prices(trades, prices):
+        """Mark trades from a {symbol: price_data} map; trades without a price keep their stored snapshot"""
+        for trade in trades:
+            price_data = prices.get(trade.symbol)
+            if price_data:
+                trade.apply_live_price(price_data['price'])
+        return trades
+    
     def update_price(self, current_price):
         db = mongo_client.paper_trading
         self.current_price = current_price
         
         # Calculate PnL
-        if self.trade_type == TradeType.BUY:
-            self.pnl = (current_price - self.entry_price) * self.quantity
-        else:  # SELL
-            self.pnl = (self.entry_price - current_price) * self.quantity
+        self.pnl = calculate_pnl(self.trade_type, self.entry_price, current_price, self.quantity)
         
         self.updated_at = datetime.utcnow()
         
         db.trades.update_one(
-            {'_id': self.trade_id},
+            {'_id': ObjectId(self.trade_id)},
             {'$set': {
                 'current_price': self.current_price,
                 'pnl': self.pnl,
@@ -77,52 +101,68 @@ class Trade:
         )
     
     def close_trade(self, exit_price, status=TradeStatus.CLOSED):
+        """Close the trade if it is still active; returns False if someone else closed it first"""
         db = mongo_client.paper_trading
         self.exit_price = exit_price
         self.status = status
         self.closed_at = datetime.utcnow()
+        self.updated_at = self.closed_at
         
         # Calculate final PnL
-        if self.trade_type == TradeType.BUY:
-            self.pnl = (exit_price - self.entry_price) * self.quantity
-        else:  # SELL
-            self.pnl = (self.entry_price - exit_price) * self.quantity
+        self.pnl = calculate_pnl(self.trade_type, self.entry_price, exit_price, self.quantity)
         
-        db.trades.update_one(
-            {'_id': self.trade_id},
-            {'$set': {
-                'exit_price': self.exit_price,
-                'status': self.status.value,
-                'pnl': self.pnl,
-                'closed_at': self.closed_at,
-                'updated_at': self.updated_at
-            }}
-        )
+        result = db.trades.bulk_write([
+            Trade.close_op(self.trade_id, exit_price, status, self.pnl, self.closed_at)
+        ])
+        return result.modified_count == 1
     
     def check_auto_exit(self, current_price):
         if self.status != TradeStatus.ACTIVE:
             return False
         
-        if self.stop_loss and (
-            (self.trade_type == TradeType.BUY and current_price <= self.stop_loss) or
-            (self.trade_type == TradeType.SELL and current_price >= self.stop_loss)
-        ):
-            self.close_trade(current_price, TradeStatus.STOP_LOSS_HIT)
-            return True
-        
-        if self.target_price and (
-            (self.trade_type == TradeType.BUY and current_price >= self.target_price) or
-            (self.trade_type == TradeType.SELL and current_price <= self.target_price)
-        ):
-            self.close_trade(current_price, TradeStatus.TARGET_HIT)
-            return True
+        exit_status = evaluate_auto_exit(self.trade_type, self.stop_loss, self.target_price, current_price)
+        if exit_status:
+            return self.close_trade(current_price, exit_status)
         
         return False
     
+    @staticmethod
+    def mark_to_market_op(symbol, current_price):
+        """Bulk op updating price and PnL of every active trade in a symbol"""
+        return UpdateMany(
+            {'symbol': symbol, 'status': TradeStatus.ACTIVE.value},
+            [{'$set': {
+                'current_price': current_price,
+                'pnl': {'$cond': [
+                    {'$eq': ['$trade_type', TradeType.BUY.value]},
+                    {'$multiply': [{'$subtract': [current_price, '$entry_price']}, '$quantity']},
+                    {'$multiply': [{'$subtract': ['$entry_price', current_price]}, '$quantity']}
+                ]},
+                'updated_at': '$$NOW'
+            }}]
+        )
+    
+    @staticmethod
+    def close_op(trade_id, exit_price, status, pnl, closed_at, settlement_id=None):
+        """Bulk op closing a trade, matching only while it is still active
+        
+        settlement_id tags the trade with the batch that closed it.
+        """
+        update = {
+            'exit_price': exit_price,
+            'current_price': exit_price,
+            'status': status.value,
+            'pnl': pnl,
+            'closed_at': closed_at,
+            'updated_at': closed_at
+        }
+        if settlement_id:
+            update['settlement_id'] = settlement_id
+        return UpdateOne({'_id': ObjectId(trade_id), 'status': TradeStatus.ACTIVE.value}, {'$set': update})
+    
     @staticmethod
     def find_by_id(trade_id):
         db = mongo_client.paper_trading
-        from bson.objectid import ObjectId
         trade_data = db.trades.find_one({'_id': ObjectId(trade_id)})
         return Trade.from_dict(trade_data) if trade_data else None
     
@@ -141,6 +181,65 @@ class Trade:
         trades_data = db.trades.find({'user_id': user_id}).sort('created_at', -1)
         return [Trade.from_dict(trade) for trade in trades_data]
     
+    @staticmethod
+    def encode_cursor(trade):
+        """Opaque keyset cursor pointing just after the given trade"""
+        key = f"{trade.created_at.isoformat()}|{trade.trade_id}"
+        return base64.urlsafe_b64encode(key.encode('utf-8')).decode('ascii')
+    
+    @staticmethod
+    def decode_cursor(cursor):
+        """Return (created_at, ObjectId); raises ValueError on a malformed cursor"""
+        try:
+            created_at, trade_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|')
+            return datetime.fromisoformat(created_at), ObjectId(trade_id)
+        except Exception:
+            raise ValueError('Invalid cursor')
+    
+    @staticmethod
+    def history_query(user_id, status=None, symbol=None, start=None, end=None, cursor=None):
+        """Filter for a user's history, newest first, resuming after cursor"""
+        query = {'user_id': user_id}
+        if status:
+            query['status'] = status
+        if symbol:
+            query['symbol'] = symbol
+        if start or end:
+            query['created_at'] = {}
+            if start:
+                query['created_at']['$gte'] = start
+            if end:
+                query['created_at']['$lt'] = end
+        if cursor:
+            created_at, trade_id = Trade.decode_cursor(cursor)
+            query = {'$and': [query, {'$or': [
+                {'created_at': {'$lt': created_at}},
+                {'created_at': created_at, '_id': {'$lt': trade_id}}
+            ]}]}
+        return query
+    
+    @staticmethod
+    def find_trades_page(user_id, limit, **filters):
+        """One page of history plus the cursor for the next page (None on the last)"""
+        db = mongo_client.paper_trading
+        trades_data = db.trades.find(Trade.history_query(user_id, **filters), TRADE_LIST_PROJECTION) \
+            .sort([('created_at', -1), ('_id', -1)]) \
+            .limit(limit + 1)
+        trades = [Trade.from_dict(trade) for trade in trades_data]
+        
+        next_cursor = Trade.encode_cursor(trades[limit - 1]) if len(trades) > limit else None
+        return trades[:limit], next_cursor
+    
+    @staticmethod
+    def iter_trades_by_user(user_id, **filters):
+        """Lazily yield a user's whole filtered history, newest first"""
+        db = mongo_client.paper_trading
+        trades_data = db.trades.find(Trade.history_query(user_id, **filters), TRADE_LIST_PROJECTION) \
+            .sort([('created_at', -1), ('_id', -1)]) \
+            .batch_size(1000)
+        for trade in trades_data:
+            yield Trade.from_dict(trade)
+    
     @staticmethod
     def from_dict(trade_data):
         trade = Trade(
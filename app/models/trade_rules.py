@@ -0,0 +1,38 @@
+from enum import Enum
+
+# Trade enums and exit rules with no database imports, so offline tools
+# like the backtester load them without the app's Mongo and Redis clients
+
+class TradeType(Enum):
+    BUY = "BUY"
+    SELL = "SELL"
+
+class TradeStatus(Enum):
+    ACTIVE = "ACTIVE"
+    CLOSED = "CLOSED"
+    STOP_LOSS_HIT = "STOP_LOSS_HIT"
+    TARGET_HIT = "TARGET_HIT"
+
+def calculate_pnl(trade_type, entry_price, price, quantity):
+    """Calculate PnL of a position marked at the given price"""
+    if TradeType(trade_type) == TradeType.BUY:
+        return (price - entry_price) * quantity
+    return (entry_price - price) * quantity  # SELL
+
+def evaluate_auto_exit(trade_type, stop_loss, target_price, current_price):
+    """Return the exit status triggered at current_price, or None"""
+    trade_type = TradeType(trade_type)
+    
+    if stop_loss and (
+        (trade_type == TradeType.BUY and current_price <= stop_loss) or
+        (trade_type == TradeType.SELL and current_price >= stop_loss)
+    ):
+        return TradeStatus.STOP_LOSS_HIT
+    
+    if target_price and (
+        (trade_type == TradeType.BUY and current_price >= target_price) or
+        (trade_type == TradeType.SELL and current_price <= target_price)
+    ):
+        return TradeStatus.TARGET_HIT
+    
+    return None
\ No newline at end of file
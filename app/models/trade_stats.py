@@ -0,0 +1,173 @@
+from collections import defaultdict
+from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from app import mongo_client
+
+# Rebuilds that keep losing to concurrent increments give up after this many tries
+REBUILD_ATTEMPTS = 5
+
+class TradeStats:
+    """Per-user trade counters, kept current with $inc as trades open and close.
+    
+    Every increment also bumps version. A document an increment created
+    before any rebuild has no rebuilt_at and is rebuilt on first read.
+    """
+    def __init__(self, user_id, total_trades=0, active_trades=0, profitable_trades=0,
+                 closed_pnl=0.0, profit_sum=0.0):
+        self.user_id = user_id
+        self.total_trades = total_trades
+        self.active_trades = active_trades
+        self.profitable_trades = profitable_trades
+        self.closed_pnl = closed_pnl
+        self.profit_sum = profit_sum
+    
+    @property
+    def closed_trades(self):
+        return self.total_trades - self.active_trades
+    
+    @staticmethod
+    def record_open(user_id):
+        db = mongo_client.paper_trading
+        db.trade_stats.update_one(
+            {'user_id': user_id},
+            {
+                '$inc': {'total_trades': 1, 'active_trades': 1, 'version': 1},
+                '$set': {'updated_at': datetime.utcnow()}
+            },
+            upsert=True
+        )
+    
+    @staticmethod
+    def close_ops(closed_pnls):
+        """Bulk ops recording closed trades from (user_id, pnl) pairs, one per user"""
+        totals = defaultdict(lambda: {
+            'active_trades': 0, 'profitable_trades': 0, 'closed_pnl': 0.0, 'profit_sum': 0.0, 'version': 1
+        })
+        for user_id, pnl in closed_pnls:
+            user_totals = totals[user_id]
+            user_totals['active_trades'] -= 1
+            user_totals['closed_pnl'] += pnl
+            if pnl > 0:
+                user_totals['profitable_trades'] += 1
+                user_totals['profit_sum'] += pnl
+        
+        updated_at = datetime.utcnow()
+        return [
+            UpdateOne({'user_id': user_id}, {'$inc': user_totals, '$set': {'updated_at': updated_at}}, upsert=True)
+            for user_id, user_totals in totals.items()
+        ]
+    
+    @staticmethod
+    def record_closes(closed_pnls):
+        db = mongo_client.paper_trading
+        ops = TradeStats.close_ops(closed_pnls)
+        if ops:
+            db.trade_stats.bulk_write(ops, ordered=False)
+    
+    @staticmethod
+    def aggregation_pipeline(user_id):
+        """Recompute every counter of one user from the trades collection"""
+        is_closed = {'$ne': ['$status', 'ACTIVE']}
+        is_profitable = {'$and': [is_closed, {'$gt': ['$pnl', 0]}]}
+        return [
+            {'$match': {'user_id': user_id}},
+            {'$group': {
+                '_id': '$user_id',
+                'total_trades': {'$sum': 1},
+                'active_trades': {'$sum': {'$cond': [is_closed, 0, 1]}},
+                'profitable_trades': {'$sum': {'$cond': [is_profitable, 1, 0]}},
+                'closed_pnl': {'$sum': {'$cond': [is_closed, '$pnl', 0]}},
+                'profit_sum': {'$sum': {'$cond': [is_profitable, '$pnl', 0]}}
+            }}
+        ]
+    
+    @staticmethod
+    def rebuild(user_id=None):
+        """Rebuild one user's stats document, or every user's when user_id is None; returns the count"""
+        db = mongo_client.paper_trading
+        user_ids = db.trades.distinct('user_id') if user_id is None else [user_id]
+        for stats_user_id in user_ids:
+            for _ in range(REBUILD_ATTEMPTS):
+                if TradeStats._rebuild_once(stats_user_id):
+                    break
+            else:
+                raise RuntimeError(f"Trade stats for {stats_user_id} kept changing during rebuild")
+        return len(user_ids)
+    
+    @staticmethod
+    def _rebuild_once(user_id):
+        """Aggregate the user's trades and write the totals only if no increment landed meanwhile"""
+        db = mongo_client.paper_trading
+        stats_data = db.trade_stats.find_one({'user_id': user_id}, {'version': 1})
+        totals = next(db.trades.aggregate(TradeStats.aggregation_pipeline(user_id)), None) or {
+            'total_trades': 0, 'active_trades': 0, 'profitable_trades': 0, 'closed_pnl': 0.0, 'profit_sum': 0.0
+        }
+        totals.pop('_id', None)
+        rebuilt_at = datetime.utcnow()
+        totals.update(rebuilt_at=rebuilt_at, updated_at=rebuilt_at)
+        
+        if stats_data is None:
+            try:
+                result = db.trade_stats.update_one(
+                    {'user_id': user_id}, {'$setOnInsert': dict(totals, version=0)}, upsert=True
+                )
+            except DuplicateKeyError:
+                return False
+            return result.upserted_id is not None
+        
+        # An increment since the read bumped version; the totals may miss it, so start over
+        result = db.trade_stats.update_one(
+            {'user_id': user_id, 'version': stats_data.get('version')},
+            {'$set': totals}
+        )
+        return result.matched_count == 1
+    
+    @staticmethod
+    def find_by_user_id(user_id):
+        db = mongo_client.paper_trading
+        stats_data = db.trade_stats.find_one({'user_id': user_id})
+        if not stats_data or 'rebuilt_at' not in stats_data:
+            TradeStats.rebuild(user_id)
+            stats_data = db.trade_stats.find_one({'user_id': user_id})
+        
+        return TradeStats(
+            user_id=user_id,
+            total_trades=stats_data['total_trades'],
+            active_trades=stats_data['active_trades'],
+            profitable_trades=stats_data['profitable_trades'],
+            closed_pnl=stats_data['closed_pnl'],
+            profit_sum=stats_data['profit_sum']
+        )
+    
+    @staticmethod
+    def active_positions(user_id):
+        """Per-symbol net quantity and net cost of the user's open trades, with their stored PnL"""
+        db = mongo_client.paper_trading
+        is_buy = {'$eq': ['$trade_type', 'BUY']}
+        signed_quantity = {'$cond': [is_buy, '$quantity', {'$multiply': ['$quantity', -1]}]}
+        return {
+            position.pop('_id'): position
+            for position in db.trades.aggregate([
+                {'$match': {'user_id': user_id, 'status': 'ACTIVE'}},
+                {'$group': {
+                    '_id': '$symbol',
+                    'net_quantity': {'$sum': signed_quantity},
+                    'net_cost': {'$sum': {'$multiply': [signed_quantity, '$entry_price']}},
+                    'stored_pnl': {'$sum': '$pnl'}
+                }}
+            ])
+        }
+    
+    @staticmethod
+    def marked_pnl(positions, prices):
+        """Open PnL marked at live prices; symbols without a price fall back to their stored PnL"""
+        pnl = 0.0
+        for symbol, position in positions.items():
+            price_data = prices.get(symbol)
+            if price_data:
+                # Sum over trades of side * (price - entry) * quantity
+                pnl += position['net_quantity'] * price_data['price'] - position['net_cost']
+            else:
+                pnl += position['stored_pnl']
+        return pnl
\ No newline at end of file
@@ -1,6 +1,7 @@
 from datetime import datetime
 from app import mongo_client
-import bcrypt
+from app.services.model_cache import user_cache
+from app.services.password_hasher import password_hasher
 
 class User:
     def __init__(self, client_id, name, email, phone, password_hash):
@@ -14,10 +15,24 @@ class User:
     
     @staticmethod
     def hash_password(password):
-        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        return password_hasher.hash(password)
     
     def verify_password(self, password):
-        return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
+        return password_hasher.verify(password, self.password_hash)
+    
+    def rehash_password_if_needed(self, password):
+        """Re-hash a just-verified password when BCRYPT_ROUNDS has changed"""
+        if not password_hasher.needs_rehash(self.password_hash):
+            return False
+        
+        db = mongo_client.paper_trading
+        self.password_hash = password_hasher.hash(password)
+        self.updated_at = datetime.utcnow()
+        db.users.update_one(
+            {'client_id': self.client_id},
+            {'$set': {'password_hash': self.password_hash, 'updated_at': self.updated_at}}
+        )
+        return True
     
     def save(self):
         db = mongo_client.paper_trading
@@ -30,7 +45,9 @@ class User:
             'created_at': self.created_at,
             'updated_at': self.updated_at
         }
-        return db.users.insert_one(user_data)
+        result = db.users.insert_one(user_data)
+        user_cache.set(self.client_id, user_data)
+        return result
     
     @staticmethod
     def find_by_email(email):
@@ -48,17 +65,22 @@ class User:
     
     @staticmethod
     def find_by_client_id(client_id):
-        db = mongo_client.paper_trading
-        user_data = db.users.find_one({'client_id': client_id})
-        if user_data:
-            return User(
-                client_id=user_data['client_id'],
-                name=user_data['name'],
-                email=user_data['email'],
-                phone=user_data['phone'],
-                password_hash=user_data['password_hash']
-            )
-        return None
+        """Profile lookup through the user cache; password_hash is left unset"""
+        user_data, generation = user_cache.lookup(client_id)
+        if not user_data:
+            db = mongo_client.paper_trading
+            user_data = db.users.find_one({'client_id': client_id}, {'password_hash': 0})
+            if not user_data:
+                return None
+            user_cache.set(client_id, user_data, generation=generation)
+        
+        return User(
+            client_id=user_data['client_id'],
+            name=user_data['name'],
+            email=user_data['email'],
+            phone=user_data['phone'],
+            password_hash=None
+        )
     
     @staticmethod
     def email_exists(email):
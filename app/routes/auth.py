@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from app.models.user import User
+from app.services.password_hasher import PasswordHasherBusy
 import uuid
 from datetime import datetime
 
@@ -45,6 +46,8 @@ def register():
             }
         }), 201
         
+    except PasswordHasherBusy as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -59,6 +62,7 @@ def login():
         user = User.find_by_email(data['email'])
         if not user or not user.verify_password(data['password']):
             return jsonify({'error': 'Invalid credentials'}), 401
+        user.rehash_password_if_needed(data['password'])
         
         # Create access token
         access_token = create_access_token(identity=user.client_id)
@@ -73,6 +77,8 @@ def login():
             }
         }), 200
         
+    except PasswordHasherBusy as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1,8 +1,19 @@
+import time
+from datetime import datetime
 from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from app.config import Config
+from app.services.candle_service import candle_service
 from app.services.market_data import market_data_service
+from app.services.market_data_providers import tick_epoch
+from app.services.market_stream import market_broadcaster
+from app.services.model_cache import portfolio_cache, user_cache
+from app.services.trade_monitor import trade_monitor
 
 market_bp = Blueprint('market', __name__)
 
+MAX_QUOTE_SYMBOLS = 100
+
 @market_bp.route('/live/<symbol>', methods=['GET'])
 def get_live_price(symbol):
     try:
@@ -15,7 +26,62 @@ def get_live_price(symbol):
             'symbol': symbol,
             'data': price_data
         }), 200
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@market_bp.route('/quotes', methods=['GET'])
+def get_quotes():
+    try:
+        symbols = [symbol.strip().upper() for symbol in request.args.get('symbols', '').split(',') if symbol.strip()]
+        
+        if not symbols:
+            return jsonify({'error': 'symbols is required'}), 400
+        
+        if len(symbols) > MAX_QUOTE_SYMBOLS:
+            return jsonify({'error': f'At most {MAX_QUOTE_SYMBOLS} symbols per request'}), 400
+        
+        quotes = market_data_service.get_live_prices(symbols)
+        if not quotes:
+            return jsonify({'error': 'Failed to fetch market data'}), 500
+        
+        return jsonify({
+            'quotes': quotes
+        }), 200
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@market_bp.route('/candles/<symbol>', methods=['GET'])
+def get_candles(symbol):
+    try:
+        interval = request.args.get('interval', '1m')
+        if interval not in candle_service.intervals:
+            return jsonify({'error': f"interval must be one of {', '.join(candle_service.intervals)}"}), 400
+        
+        try:
+            # from/to are ISO times (UTC when naive) or epoch seconds
+            end = tick_epoch(request.args['to']) if 'to' in request.args else time.time()
+            limit = min(int(request.args.get('limit', 500)), Config.CANDLE_MAX_LIMIT)
+            start = tick_epoch(request.args['from']) if 'from' in request.args \
+                else end - limit * candle_service.intervals[interval]
+            points = int(request.args['points']) if 'points' in request.args else None
+        except ValueError:
+            return jsonify({'error': 'from/to must be ISO times or epoch seconds; limit and points integers'}), 400
+        
+        if limit < 1 or (points is not None and points < 1) or start > end:
+            return jsonify({'error': 'limit and points must be positive and from no later than to'}), 400
         
+        bars = candle_service.candles(symbol.upper(), interval, start, end, limit, points)
+        
+        return jsonify({
+            'symbol': symbol.upper(),
+            'interval': interval,
+            'candles': [
+                dict(bar, t=datetime.utcfromtimestamp(bar['t']).isoformat()) for bar in bars
+            ]
+        }), 200
+    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -27,6 +93,40 @@ def get_indices():
         return jsonify({
             'indices': indices_data
         }), 200
-        
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@market_bp.route('/monitor/stats', methods=['GET'])
+@jwt_required()
+def get_monitor_stats():
+    try:
+        return jsonify({
+            'monitor': trade_monitor.get_stats()
+        }), 200
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@market_bp.route('/stream/stats', methods=['GET'])
+def get_stream_stats():
+    try:
+        return jsonify({
+            'stream': market_broadcaster.stats(),
+            'candles': candle_service.stats()
+        }), 200
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@market_bp.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    try:
+        return jsonify({
+            'quotes': market_data_service.get_cache_stats(),
+            'portfolios': portfolio_cache.stats(),
+            'users': user_cache.stats()
+        }), 200
+    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
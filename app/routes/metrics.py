@@ -0,0 +1,71 @@
+import time
+from flask import Blueprint, Response
+from app.services.market_data import market_data_service
+from app.services.market_stream import market_broadcaster
+from app.services.metrics import registry
+from app.services.model_cache import portfolio_cache, user_cache
+from app.services.notification_service import notification_service
+from app.services.trade_monitor import trade_monitor
+
+metrics_bp = Blueprint('metrics', __name__)
+
+def _cache_stats():
+    return {
+        'quotes': market_data_service.get_cache_stats(),
+        'portfolios': portfolio_cache.stats(),
+        'users': user_cache.stats()
+    }
+
+_collectors_registered = False
+
+def register_collectors():
+    """Register the scrape-time collectors once, however many apps are created"""
+    global _collectors_registered
+    if _collectors_registered:
+        return
+    _collectors_registered = True
+    
+    # Read from each service's own counters when scraped
+    registry.counter_callback(
+        'cache_hits_total', 'Cache lookups that found an entry',
+        lambda: {(cache,): stats['hits'] for cache, stats in _cache_stats().items()}, ('cache',)
+    )
+    registry.counter_callback(
+        'cache_misses_total', 'Cache lookups that found nothing',
+        lambda: {(cache,): stats['misses'] for cache, stats in _cache_stats().items()}, ('cache',)
+    )
+    registry.gauge_callback(
+        'cache_hit_ratio', 'Hits over lookups since start',
+        lambda: {(cache,): stats['hit_ratio'] for cache, stats in _cache_stats().items()}, ('cache',)
+    )
+    registry.gauge_callback(
+        'socketio_connections', 'Open Socket.IO connections in this process',
+        lambda: market_broadcaster.connections
+    )
+    registry.gauge_callback(
+        'monitor_tracked_trades', 'Active trades held in the monitor trigger books',
+        trade_monitor.tracked_trades
+    )
+    registry.gauge_callback(
+        'monitor_last_cycle_age_seconds', 'Seconds since the last full monitor scan finished',
+        lambda: time.time() - trade_monitor.last_cycle_at if trade_monitor.last_cycle_at else None
+    )
+    registry.gauge_callback(
+        'notification_queue_depth', 'Notification jobs waiting for a dispatch worker',
+        lambda: notification_service.dispatcher.stats()['queued']
+    )
+    registry.gauge_callback(
+        'notification_pending_events', 'Events held for coalescing into digests',
+        lambda: notification_service.coalescer.stats()['pending_events']
+    )
+    registry.counter_callback(
+        'notification_jobs_total', 'Notification jobs by outcome',
+        lambda: {
+            (outcome,): notification_service.dispatcher.stats()[outcome]
+            for outcome in ('submitted', 'completed', 'retried', 'failed', 'dropped')
+        }, ('outcome',)
+    )
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
\ No newline at end of file
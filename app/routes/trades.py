@@ -1,13 +1,20 @@
-from flask import Blueprint, request, jsonify
+import json
+from datetime import datetime
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.trade import Trade, TradeType, TradeStatus
 from app.models.portfolio import Portfolio
+from app.models.trade_stats import TradeStats
 from app.services.market_data import market_data_service
 from app.services.notification_service import notification_service
-from app.models.user import User
+from app.services.settlement import settlement_service
+from app.services.trade_monitor import trade_monitor
 
 trades_bp = Blueprint('trades', __name__)
 
+DEFAULT_HISTORY_PAGE_SIZE = 100
+MAX_HISTORY_PAGE_SIZE = 500
+
 @trades_bp.route('/create', methods=['POST'])
 @jwt_required()
 def create_trade():
@@ -21,8 +28,11 @@ def create_trade():
             if not data.get(field):
                 return jsonify({'error': f'{field} is required'}), 400
         
+        # Stored upper-case, as quotes, trigger books and history filters expect
+        symbol = data['symbol'].strip().upper()
+        
         # Get current market price
-        market_data = market_data_service.get_live_price(data['symbol'])
+        market_data = market_data_service.get_live_price(symbol)
         if not market_data:
             return jsonify({'error': 'Failed to fetch market price'}), 500
         
@@ -30,18 +40,16 @@ def create_trade():
         quantity = data['quantity']
         margin_used = entry_price * quantity
         
-        # Check portfolio margin
-        portfolio = Portfolio.find_by_user_id(current_user_id)
-        if not portfolio:
-            return jsonify({'error': 'Portfolio not found. Create a portfolio first.'}), 404
-        
-        if portfolio.available_margin < margin_used:
+        # Reserve margin in one conditional update so concurrent orders can't overdraw
+        if not Portfolio.reserve_margin(current_user_id, margin_used):
+            if not Portfolio.find_by_user_id(current_user_id):
+                return jsonify({'error': 'Portfolio not found. Create a portfolio first.'}), 404
             return jsonify({'error': 'Insufficient margin'}), 400
         
         # Create trade
         trade = Trade(
             user_id=current_user_id,
-            symbol=data['symbol'],
+            symbol=symbol,
             trade_type=data['trade_type'],
             quantity=quantity,
             entry_price=entry_price,
@@ -50,27 +58,22 @@ def create_trade():
             target_price=data.get('target_price')
         )
         
-        trade.save()
-        
-        # Update portfolio margin
-        portfolio.update_margin(margin_used)
+        try:
+            trade.save()
+        except Exception:
+            Portfolio.release_margin(current_user_id, margin_used)
+            raise
+        trade_monitor.track_trade(trade)
+        TradeStats.record_open(current_user_id)
+        notification_service.notify_user(current_user_id, 'trade_created', trade.to_dict())
         
         return jsonify({
             'message': 'Trade created successfully',
             'trade': trade.to_dict()
         }), 201
-        
+    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    
-    user = User.find_by_client_id(current_user_id)
-    if user:
-        trade_dict = trade.to_dict()
-        notification_service.notify_trade_creation(
-            user.email, 
-            user.phone, 
-            trade_dict
-        )
 
 
 @trades_bp.route('/active', methods=['GET'])
@@ -80,10 +83,14 @@ def get_active_trades():
         current_user_id = get_jwt_identity()
         trades = Trade.find_active_trades_by_user(current_user_id)
         
+        # Stored marks may be a snapshot; report open trades at the live price
+        prices = market_data_service.get_live_prices({trade.symbol for trade in trades})
+        Trade.apply_live_prices(trades, prices)
+        
         return jsonify({
             'trades': [trade.to_dict() for trade in trades]
         }), 200
-        
+    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -92,12 +99,61 @@ def get_active_trades():
 def get_trade_history():
     try:
         current_user_id = get_jwt_identity()
-        trades = Trade.find_all_trades_by_user(current_user_id)
+        
+        # Filters: status, symbol and a created_at range given as ISO dates
+        try:
+            filters = {
+                'status': request.args.get('status'),
+                'symbol': request.args.get('symbol', '').upper() or None,
+                'start': datetime.fromisoformat(request.args['from']) if request.args.get('from') else None,
+                'end': datetime.fromisoformat(request.args['to']) if request.args.get('to') else None
+            }
+            if filters['status']:
+                filters['status'] = TradeStatus(filters['status'].upper()).value
+        except ValueError as e:
+            return jsonify({'error': f'Invalid filter: {e}'}), 400
+        
+        # Full export: stream one JSON object per line in constant memory
+        if request.args.get('format') == 'ndjson':
+            trades = Trade.iter_trades_by_user(current_user_id, **filters)
+            
+            def generate():
+                prices = {}
+                for trade in trades:
+                    if trade.status == TradeStatus.ACTIVE:
+                        if trade.symbol not in prices:
+                            prices[trade.symbol] = market_data_service.get_live_price(trade.symbol)
+                        Trade.apply_live_prices([trade], prices)
+                    yield json.dumps(trade.to_dict()) + '\n'
+            
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
+        try:
+            limit = int(request.args.get('limit', DEFAULT_HISTORY_PAGE_SIZE))
+            if request.args.get('cursor'):
+                Trade.decode_cursor(request.args['cursor'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if not 1 <= limit <= MAX_HISTORY_PAGE_SIZE:
+            return jsonify({'error': f'limit must be between 1 and {MAX_HISTORY_PAGE_SIZE}'}), 400
+        
+        trades, next_cursor = Trade.find_trades_page(
+            current_user_id,
+            limit,
+            cursor=request.args.get('cursor'),
+            **filters
+        )
+        prices = market_data_service.get_live_prices({
+            trade.symbol for trade in trades if trade.status == TradeStatus.ACTIVE
+        })
+        Trade.apply_live_prices(trades, prices)
         
         return jsonify({
-            'trades': [trade.to_dict() for trade in trades]
+            'trades': [trade.to_dict() for trade in trades],
+            'next_cursor': next_cursor
         }), 200
-        
+    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -115,24 +171,24 @@ def get_trade_performance(user_id):
         if not portfolio:
             return jsonify({'error': 'Portfolio not found'}), 404
         
-        all_trades = Trade.find_all_trades_by_user(user_id)
-        active_trades = Trade.find_active_trades_by_user(user_id)
+        # Counters are maintained incrementally; open trades are marked at live prices
+        stats = TradeStats.find_by_user_id(user_id)
+        positions = TradeStats.active_positions(user_id)
+        active_pnl = TradeStats.marked_pnl(positions, market_data_service.get_live_prices(positions))
         
         # Calculate performance metrics
-        total_trades = len(all_trades)
-        active_trades_count = len(active_trades)
-        closed_trades_count = total_trades - active_trades_count
+        total_trades = stats.total_trades
+        active_trades_count = stats.active_trades
+        closed_trades_count = stats.closed_trades
         
         # Calculate win rate
-        profitable_trades = [t for t in all_trades if t.pnl > 0 and t.status != TradeStatus.ACTIVE]
-        win_rate = (len(profitable_trades) / closed_trades_count * 100) if closed_trades_count > 0 else 0
+        win_rate = (stats.profitable_trades / closed_trades_count * 100) if closed_trades_count > 0 else 0
         
         # Calculate total PnL
-        total_pnl = sum(trade.pnl for trade in all_trades)
-        active_pnl = sum(trade.pnl for trade in active_trades)
+        total_pnl = stats.closed_pnl + active_pnl
         
         # Calculate average trade metrics
-        avg_profit = sum(trade.pnl for trade in profitable_trades) / len(profitable_trades) if profitable_trades else 0
+        avg_profit = stats.profit_sum / stats.profitable_trades if stats.profitable_trades else 0
         
         return jsonify({
             'performance': {
@@ -145,7 +201,7 @@ def get_trade_performance(user_id):
                     'total_pnl': total_pnl,
                     'active_pnl': active_pnl,
                     'average_profit': round(avg_profit, 2),
-                    'profitable_trades': len(profitable_trades)
+                    'profitable_trades': stats.profitable_trades
                 },
                 'margin_utilization': {
                     'available_margin': portfolio.available_margin,
@@ -156,7 +212,7 @@ def get_trade_performance(user_id):
                 }
             }
         }), 200
-        
+    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -185,19 +241,21 @@ def exit_trade(trade_id):
         
         exit_price = market_data['price']
         
-        # Close trade
-        trade.close_trade(exit_price, TradeStatus.CLOSED)
+        # Close trade; a concurrent exit or auto-exit may have got there first
+        if not trade.close_trade(exit_price, TradeStatus.CLOSED):
+            return jsonify({'error': 'Trade is already closed'}), 400
+        trade_monitor.untrack_trade(trade.trade_id, trade.symbol, trade.user_id)
+        TradeStats.record_closes([(trade.user_id, trade.pnl)])
         
         # Update portfolio
-        portfolio = Portfolio.find_by_user_id(current_user_id)
-        if portfolio:
-            portfolio.update_margin(-trade.margin_used, trade.pnl)
+        Portfolio.release_margin(current_user_id, trade.margin_used, trade.pnl)
+        notification_service.notify_user(current_user_id, 'trade_exited', trade.to_dict())
         
         return jsonify({
             'message': 'Trade exited successfully',
             'trade': trade.to_dict()
         }), 200
-        
+    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -211,29 +269,14 @@ def exit_all_trades(user_id):
         if user_id != current_user_id:
             return jsonify({'error': 'Unauthorized access'}), 403
         
-        active_trades = Trade.find_active_trades_by_user(user_id)
-        
-        if not active_trades:
+        # Prices once per symbol, one bulk close, one portfolio update
+        closed = settlement_service.exit_all(user_id)
+        if closed is None:
             return jsonify({'error': 'No active trades found'}), 404
         
-        exited_trades = []
-        total_pnl = 0
-        total_margin_freed = 0
-        
-        for trade in active_trades:
-            # Get current market price
-            market_data = market_data_service.get_live_price(trade.symbol)
-            if market_data:
-                exit_price = market_data['price']
-                trade.close_trade(exit_price, TradeStatus.CLOSED)
-                exited_trades.append(trade.to_dict())
-                total_pnl += trade.pnl
-                total_margin_freed += trade.margin_used
-        
-        # Update portfolio
-        portfolio = Portfolio.find_by_user_id(user_id)
-        if portfolio:
-            portfolio.update_margin(-total_margin_freed, total_pnl)
+        exited_trades = [Trade.from_dict(trade_data).to_dict() for trade_data in closed]
+        total_pnl = sum(trade['pnl'] for trade in exited_trades)
+        total_margin_freed = sum(trade['margin_used'] for trade in exited_trades)
         
         return jsonify({
             'message': f'All {len(exited_trades)} trades exited successfully',
@@ -241,6 +284,6 @@ def exit_all_trades(user_id):
             'total_pnl': total_pnl,
             'margin_freed': total_margin_freed
         }), 200
-        
+    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
@@ -0,0 +1,209 @@
+import json
+import struct
+import time
+from collections import defaultdict
+import numpy as np
+from app.models.trade_rules import TradeType, TradeStatus
+from app.services.market_data_providers import read_tick_rows, tick_epoch
+
+# Tick file layout: MAGIC, a little-endian uint64 header length, a JSON
+# header padded to 8 bytes, then every timestamp (float64 epoch seconds)
+# followed by every price (float64). Rows are grouped by symbol and sorted
+# by time within a symbol; the header maps symbol -> [first row, row count].
+MAGIC = b'PTTICKS1'
+
+# Ticks replayed at a time; bounds the range table to a few MB however long the day is
+CHUNK_TICKS = 1 << 16
+
+def convert_ticks(source_path, output_path):
+    """Write a tick file from a CSV (symbol,price,timestamp) or NDJSON recording; returns the tick count"""
+    by_symbol = defaultdict(list)
+    for row in read_tick_rows(source_path):
+        by_symbol[row['symbol']].append((tick_epoch(row['timestamp']), float(row['price'])))
+    
+    symbols = {}
+    timestamps = []
+    prices = []
+    for symbol in sorted(by_symbol):
+        ticks = sorted(by_symbol[symbol])
+        symbols[symbol] = [len(timestamps), len(ticks)]
+        timestamps.extend(tick[0] for tick in ticks)
+        prices.extend(tick[1] for tick in ticks)
+    
+    header = json.dumps({'count': len(timestamps), 'symbols': symbols}).encode('utf-8')
+    header += b' ' * (-len(header) % 8)
+    with open(output_path, 'wb') as tick_file:
+        tick_file.write(MAGIC)
+        tick_file.write(struct.pack('<Q', len(header)))
+        tick_file.write(header)
+        tick_file.write(np.asarray(timestamps, dtype='<f8').tobytes())
+        tick_file.write(np.asarray(prices, dtype='<f8').tobytes())
+    return len(timestamps)
+
+class TickFile:
+    """Read-only memory map of a tick file; pages load only as they are touched"""
+    def __init__(self, path):
+        with open(path, 'rb') as tick_file:
+            if tick_file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a tick file")
+            header_length = struct.unpack('<Q', tick_file.read(8))[0]
+            header = json.loads(tick_file.read(header_length))
+        
+        self.count = header['count']
+        self.symbols = {symbol: tuple(span) for symbol, span in header['symbols'].items()}
+        data_offset = len(MAGIC) + 8 + header_length
+        self.columns = np.memmap(path, dtype='<f8', mode='r', offset=data_offset, shape=(2, self.count)) \
+            if self.count else np.empty((2, 0))
+    
+    def ticks(self, symbol):
+        """(timestamps, prices) views for one symbol"""
+        start, count = self.symbols.get(symbol, (0, 0))
+        return self.columns[0, start:start + count], self.columns[1, start:start + count]
+
+class _RangeTable:
+    """Sparse table of window minima and maxima for vectorized first-crossing search"""
+    def __init__(self, prices):
+        self.size = len(prices)
+        self.mins = [prices]
+        self.maxs = [prices]
+        width = 1
+        while width * 2 <= self.size:
+            self.mins.append(np.minimum(self.mins[-1][:-width], self.mins[-1][width:]))
+            self.maxs.append(np.maximum(self.maxs[-1][:-width], self.maxs[-1][width:]))
+            width *= 2
+    
+    def first_crossing(self, starts, levels, at_or_below):
+        """Index of the first tick at or after each start whose price is <= level
+        (at_or_below) or >= level, or size when it never crosses; NaN never crosses"""
+        tables = self.mins if at_or_below else self.maxs
+        positions = starts.copy()
+        # Binary lifting: skip the longest windows that stay entirely on the safe side
+        for power in range(len(tables) - 1, -1, -1):
+            window = 1 << power
+            in_range = positions + window <= self.size
+            extremes = np.full(len(positions), np.nan)
+            extremes[in_range] = tables[power][positions[in_range]]
+            safe = extremes > levels if at_or_below else extremes < levels
+            positions = np.where(in_range & safe, positions + window, positions)
+        
+        prices = self.mins[0]
+        crossed = positions < self.size
+        tick_prices = np.full(len(positions), np.nan)
+        tick_prices[crossed] = prices[positions[crossed]]
+        crossed &= (tick_prices <= levels) if at_or_below else (tick_prices >= levels)
+        return np.where(crossed, positions, self.size)
+
+def run_backtest(tick_file, positions, chunk_ticks=CHUNK_TICKS):
+    """Replay every symbol's ticks against positions with the monitor's exit rules.
+    
+    Each position is a dict with symbol, trade_type, quantity, entry_time
+    (epoch seconds) and optional stop_loss, target_price and entry_price;
+    entry_price defaults to the first tick at or after entry_time. Exits
+    fill at the first tick whose price crosses a level, a stop-loss
+    winning when both cross on the same tick, exactly as
+    Trade.check_auto_exit decides. Ticks are read chunk_ticks at a time
+    from the memory map, positions still open carrying into the next
+    chunk. Returns (fills, report).
+    """
+    started = time.perf_counter()
+    by_symbol = defaultdict(list)
+    for index, position in enumerate(positions):
+        by_symbol[position['symbol']].append(index)
+    
+    fills = [None] * len(positions)
+    ticks_replayed = 0
+    for symbol, indexes in by_symbol.items():
+        timestamps, prices = tick_file.ticks(symbol)
+        if not len(prices):
+            for index in indexes:
+                fills[index] = dict(positions[index], status='NO_DATA')
+            continue
+        ticks_replayed += len(prices)
+        count = len(prices)
+        
+        entry_times = np.array([positions[index]['entry_time'] for index in indexes], dtype=np.float64)
+        starts = np.searchsorted(timestamps, entry_times, side='left')
+        opened = starts < count
+        starts = np.minimum(starts, count - 1)
+        is_buy = np.array([TradeType(positions[index]['trade_type']) == TradeType.BUY for index in indexes])
+        # Falsy levels never trigger in check_auto_exit
+        stop_loss = np.array([positions[index].get('stop_loss') or np.nan for index in indexes], dtype=np.float64)
+        target_price = np.array([positions[index].get('target_price') or np.nan for index in indexes], dtype=np.float64)
+        
+        # Tick index of each level's first crossing; count while not crossed yet
+        stop_loss_at = np.full(len(indexes), count)
+        target_at = np.full(len(indexes), count)
+        for chunk_start in range(0, count, chunk_ticks):
+            chunk_end = min(chunk_start + chunk_ticks, count)
+            pending = np.flatnonzero(opened & (starts < chunk_end) & (stop_loss_at == count) & (target_at == count))
+            if not len(pending):
+                continue
+            
+            table = _RangeTable(np.array(prices[chunk_start:chunk_end]))
+            chunk_starts = np.maximum(starts[pending] - chunk_start, 0)
+            pending_buy = is_buy[pending]
+            # A long stops out at or below its stop and takes profit at or above its target; a short the reverse
+            for crossings, levels, buy_at_or_below in ((stop_loss_at, stop_loss, True), (target_at, target_price, False)):
+                found_at = np.where(
+                    pending_buy,
+                    table.first_crossing(chunk_starts, levels[pending], at_or_below=buy_at_or_below),
+                    table.first_crossing(chunk_starts, levels[pending], at_or_below=not buy_at_or_below)
+                )
+                crossings[pending] = np.where(found_at < table.size, chunk_start + found_at, count)
+        
+        exit_at = np.minimum(stop_loss_at, target_at)
+        
+        for row, index in enumerate(indexes):
+            position = positions[index]
+            if not opened[row]:
+                fills[index] = dict(position, status='NOT_OPENED')
+                continue
+            
+            entry_price = position.get('entry_price') or float(prices[starts[row]])
+            if exit_at[row] < count:
+                status = TradeStatus.STOP_LOSS_HIT if stop_loss_at[row] <= target_at[row] else TradeStatus.TARGET_HIT
+                exit_index = exit_at[row]
+            else:
+                status = TradeStatus.ACTIVE
+                exit_index = count - 1
+            exit_price = float(prices[exit_index])
+            side = 1 if is_buy[row] else -1
+            fills[index] = dict(
+                position,
+                entry_price=entry_price,
+                entry_time=float(timestamps[starts[row]]),
+                exit_price=exit_price,
+                exit_time=float(timestamps[exit_index]),
+                status=status.value,
+                pnl=round(side * (exit_price - entry_price) * position['quantity'], 2)
+            )
+    
+    elapsed = time.perf_counter() - started
+    return fills, summarize(fills, ticks_replayed, elapsed)
+
+def summarize(fills, ticks_replayed, elapsed):
+    """PnL report over backtest fills; ACTIVE fills are still open, marked at the last tick"""
+    statuses = defaultdict(int)
+    realized = []
+    unrealized_pnl = 0.0
+    for fill in fills:
+        statuses[fill['status']] += 1
+        if fill['status'] in (TradeStatus.STOP_LOSS_HIT.value, TradeStatus.TARGET_HIT.value):
+            realized.append(fill['pnl'])
+        elif fill['status'] == TradeStatus.ACTIVE.value:
+            unrealized_pnl += fill['pnl']
+    
+    winners = [pnl for pnl in realized if pnl > 0]
+    losers = [pnl for pnl in realized if pnl <= 0]
+    return {
+        'positions': len(fills),
+        'statuses': dict(statuses),
+        'realized_pnl': round(sum(realized), 2),
+        'unrealized_pnl': round(unrealized_pnl, 2),
+        'win_rate': round(len(winners) / len(realized) * 100, 2) if realized else 0,
+        'average_win': round(sum(winners) / len(winners), 2) if winners else 0,
+        'average_loss': round(sum(losers) / len(losers), 2) if losers else 0,
+        'ticks_replayed': ticks_replayed,
+        'elapsed_s': round(elapsed, 4),
+        'ticks_per_second': round(ticks_replayed / elapsed) if elapsed > 0 else None
+    }
\ No newline at end of file
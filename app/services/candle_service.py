@@ -0,0 +1,294 @@
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+from app import mongo_client, redis_client
+from app.config import Config
+from app.services.event_bus import event_bus
+from app.services.market_data_providers import tick_epoch
+from app.services.redis_scripts import RENEW_LEASE_SCRIPT
+
+INTERVAL_SECONDS = {'1m': 60, '5m': 300, '15m': 900, '1h': 3600, '1d': 86400}
+
+# Stored candle times are naive UTC
+EPOCH = datetime(1970, 1, 1)
+
+# Hot bar hash fields: bucket start (epoch), open, high, low, close, volume,
+# and the provider's cumulative volume at the last tick
+BAR_FIELDS = ('t', 'o', 'h', 'l', 'c', 'v', 'cv')
+
+def merge_bars(bars):
+    """One bar spanning consecutive bars, oldest first"""
+    return {
+        't': bars[0]['t'],
+        'o': bars[0]['o'],
+        'h': max(bar['h'] for bar in bars),
+        'l': min(bar['l'] for bar in bars),
+        'c': bars[-1]['c'],
+        'v': sum(bar['v'] for bar in bars)
+    }
+
+class CandleService:
+    """Build OHLCV bars from published ticks.
+    
+    Bars are updated in memory as ticks arrive and flushed every
+    CANDLE_FLUSH_INTERVAL: open bars to Redis hashes (candle:{symbol}:{interval}),
+    closed bars to the candles time-series collection. A bar closes once
+    ticks on any symbol have moved CANDLE_CLOSE_GRACE past its end, so a
+    quiet symbol's bar still closes on time. Only the holder of a Redis
+    leader lease aggregates, so each bar is written once however many
+    processes run the service; a new leader picks up the open bars from Redis.
+    """
+    LEADER_KEY = 'candles:leader'
+    
+    def __init__(self, intervals=('1m', '5m', '15m', '1d')):
+        self.intervals = {interval: INTERVAL_SECONDS[interval] for interval in intervals}
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.lock = threading.Lock()
+        self.started = False
+        self.is_leader = False
+        # (symbol, interval) -> open bar; bars closed since the last flush wait in closed_bars
+        self.bars = {}
+        self.dirty = set()
+        self.closed_bars = []
+        # (symbol, interval) -> start of the newest closed bucket; ticks at or before it are late
+        self.closed_buckets = {}
+        self.cumulative_volumes = {}
+        self.watermark = 0.0
+        self.ticks_aggregated = 0
+        self.late_ticks = 0
+        self.bars_written = 0
+    
+    @property
+    def collection(self):
+        return mongo_client.paper_trading.candles
+    
+    @staticmethod
+    def key(symbol, interval):
+        return f"candle:{symbol}:{interval}"
+    
+    def start(self):
+        """Start the aggregator once per process"""
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+        event_bus.subscribe('tick:*', self._on_tick)
+        flush_thread = threading.Thread(target=self._run)
+        flush_thread.daemon = True
+        flush_thread.start()
+    
+    def _on_tick(self, channel, tick):
+        if not self.is_leader:
+            return
+        symbol = tick['symbol']
+        price = float(tick['price'])
+        at = tick_epoch(tick['timestamp'])
+        
+        with self.lock:
+            # Providers report the session's cumulative volume; a drop means a new session
+            cumulative = int(tick.get('volume') or 0)
+            previous = self.cumulative_volumes.get(symbol)
+            volume = 0 if previous is None else cumulative - previous if cumulative >= previous else cumulative
+            self.cumulative_volumes[symbol] = cumulative
+            self.watermark = max(self.watermark, at)
+            self.ticks_aggregated += 1
+            
+            for interval, seconds in self.intervals.items():
+                # Buckets are aligned to the epoch, so 1d bars run midnight to midnight UTC
+                bucket = at - at % seconds
+                bar = self.bars.get((symbol, interval))
+                if (bar is not None and bucket < bar['t']) or bucket <= self.closed_buckets.get((symbol, interval), -1):
+                    # Reopening a closed bucket would write a second candle for it
+                    self.late_ticks += 1
+                    continue
+                if bar is not None and bucket > bar['t']:
+                    self._close(symbol, interval)
+                    bar = None
+                if bar is None:
+                    self.bars[(symbol, interval)] = {
+                        't': bucket, 'o': price, 'h': price, 'l': price, 'c': price, 'v': volume
+                    }
+                else:
+                    bar['h'] = max(bar['h'], price)
+                    bar['l'] = min(bar['l'], price)
+                    bar['c'] = price
+                    bar['v'] += volume
+                self.dirty.add((symbol, interval))
+    
+    def _close(self, symbol, interval):
+        """Move an open bar to the closed queue; call with the lock held"""
+        bar = self.bars.pop((symbol, interval))
+        self.closed_bars.append((symbol, interval, bar))
+        self.closed_buckets[(symbol, interval)] = bar['t']
+    
+    def _run(self):
+        refresh_at = 0
+        while True:
+            try:
+                if time.time() >= refresh_at:
+                    self._refresh_leadership()
+                    refresh_at = time.time() + 1
+                if self.is_leader:
+                    self.flush()
+            except Exception as e:
+                print(f"Error in candle aggregator: {e}")
+            time.sleep(Config.CANDLE_FLUSH_INTERVAL)
+    
+    def _refresh_leadership(self):
+        ttl_ms = Config.CANDLE_LEADER_TTL * 1000
+        if self.is_leader:
+            self.is_leader = bool(redis_client.eval(RENEW_LEASE_SCRIPT, 1, self.LEADER_KEY, self.worker_id, ttl_ms))
+            if not self.is_leader:
+                # Another process owns the bars now; ours would be stale by the time we lead again
+                with self.lock:
+                    self.bars, self.dirty, self.closed_bars = {}, set(), []
+                    self.closed_buckets, self.cumulative_volumes = {}, {}
+        elif redis_client.set(self.LEADER_KEY, self.worker_id, nx=True, px=ttl_ms):
+            self._load_open_bars()
+            self.is_leader = True
+    
+    def _load_open_bars(self):
+        """Continue the previous leader's open bars"""
+        keys = list(redis_client.scan_iter(match='candle:*', count=1000))
+        pipe = redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.hmget(key, *BAR_FIELDS)
+        
+        with self.lock:
+            for key, values in zip(keys, pipe.execute()):
+                _, symbol, interval = key.decode('utf-8').split(':', 2)
+                if interval not in self.intervals or None in values[:6]:
+                    continue
+                bar = dict(zip(BAR_FIELDS[:6], (float(value) for value in values[:6])))
+                self.bars[(symbol, interval)] = bar
+                self.watermark = max(self.watermark, bar['t'])
+                if values[6] is not None:
+                    self.cumulative_volumes[symbol] = int(values[6])
+    
+    def flush(self):
+        """Close bars past the watermark, then write closed bars to Mongo and open bars to Redis"""
+        with self.lock:
+            for (symbol, interval), bar in list(self.bars.items()):
+                if bar['t'] + self.intervals[interval] + Config.CANDLE_CLOSE_GRACE <= self.watermark:
+                    self._close(symbol, interval)
+                    self.dirty.add((symbol, interval))
+            closed_bars, self.closed_bars = self.closed_bars, []
+            open_bars = {
+                (symbol, interval): dict(self.bars[(symbol, interval)])
+                for symbol, interval in self.dirty if (symbol, interval) in self.bars
+            }
+            closed_keys = self.dirty - open_bars.keys()
+            self.dirty = set()
+            cumulative_volumes = dict(self.cumulative_volumes)
+        
+        if closed_bars:
+            try:
+                self.collection.insert_many([
+                    {
+                        't': datetime.fromtimestamp(bar['t'], tz=timezone.utc).replace(tzinfo=None),
+                        'meta': {'symbol': symbol, 'interval': interval},
+                        'o': bar['o'], 'h': bar['h'], 'l': bar['l'], 'c': bar['c'], 'v': bar['v']
+                    }
+                    for symbol, interval, bar in closed_bars
+                ], ordered=False)
+                self.bars_written += len(closed_bars)
+            except Exception:
+                # Retry on the next flush, keeping the hot bars in Redis until then
+                with self.lock:
+                    self.closed_bars = closed_bars + self.closed_bars
+                    self.dirty |= closed_keys | open_bars.keys()
+                raise
+        
+        # Closed bars are in Mongo now, so their hot copies can go
+        pipe = redis_client.pipeline(transaction=False)
+        for (symbol, interval), bar in open_bars.items():
+            key = self.key(symbol, interval)
+            pipe.hset(key, mapping=dict(bar, cv=cumulative_volumes.get(symbol, 0)))
+            pipe.expire(key, self.intervals[interval] + int(Config.CANDLE_CLOSE_GRACE) + 60)
+        for symbol, interval in closed_keys:
+            pipe.delete(self.key(symbol, interval))
+        pipe.execute()
+    
+    def open_bar(self, symbol, interval):
+        """The symbol's bar still being built, from Redis, or None"""
+        values = redis_client.hmget(self.key(symbol, interval), *BAR_FIELDS[:6])
+        if None in values:
+            return None
+        return dict(zip(BAR_FIELDS[:6], (float(value) for value in values)))
+    
+    def candles(self, symbol, interval, start, end, limit, points=None):
+        """Bars of symbol between start and end (epoch seconds), oldest first, at most limit.
+        
+        With points, bars are merged server-side into buckets of a whole
+        number of intervals so that the range fits in about that many bars.
+        """
+        seconds = self.intervals[interval]
+        bucket_seconds = seconds
+        if points and (end - start) / seconds > points:
+            bucket_seconds = seconds * int(-(-(end - start) // (seconds * points)))
+        
+        match = {
+            'meta.symbol': symbol,
+            'meta.interval': interval,
+            't': {
+                '$gte': datetime.fromtimestamp(start, tz=timezone.utc).replace(tzinfo=None),
+                '$lte': datetime.fromtimestamp(end, tz=timezone.utc).replace(tzinfo=None)
+            }
+        }
+        if bucket_seconds == seconds:
+            documents = list(self.collection.find(match, {'_id': 0, 'meta': 0}).sort('t', -1).limit(limit))
+        else:
+            documents = list(self.collection.aggregate([
+                {'$match': match},
+                {'$sort': {'t': 1}},
+                {'$group': {
+                    # Epoch-aligned buckets, the same alignment the aggregator uses;
+                    # date minus date is milliseconds, date minus a number is a date
+                    '_id': {'$subtract': [
+                        '$t', {'$mod': [{'$subtract': ['$t', EPOCH]}, bucket_seconds * 1000]}
+                    ]},
+                    'o': {'$first': '$o'},
+                    'h': {'$max': '$h'},
+                    'l': {'$min': '$l'},
+                    'c': {'$last': '$c'},
+                    'v': {'$sum': '$v'}
+                }},
+                {'$sort': {'_id': -1}},
+                {'$limit': limit},
+                {'$project': {'_id': 0, 't': '$_id', 'o': 1, 'h': 1, 'l': 1, 'c': 1, 'v': 1}}
+            ]))
+        
+        bars = [
+            dict(document, t=document['t'].replace(tzinfo=timezone.utc).timestamp())
+            for document in reversed(documents)
+        ]
+        
+        # The open bar only exists in Redis until it closes
+        hot = self.open_bar(symbol, interval)
+        if hot is not None and start <= hot['t'] <= end and (not bars or hot['t'] > bars[-1]['t']):
+            hot['t'] -= hot['t'] % bucket_seconds
+            if bars and bars[-1]['t'] == hot['t']:
+                bars[-1] = merge_bars([bars[-1], hot])
+            else:
+                bars.append(hot)
+            bars = bars[-limit:]
+        return bars
+    
+    def stats(self):
+        with self.lock:
+            open_bars = len(self.bars)
+            pending = len(self.closed_bars)
+        return {
+            'leader': self.is_leader,
+            'open_bars': open_bars,
+            'pending_closed_bars': pending,
+            'bars_written': self.bars_written,
+            'ticks_aggregated': self.ticks_aggregated,
+            'late_ticks': self.late_ticks
+        }
+
+candle_service = CandleService(
+    intervals=[interval.strip() for interval in Config.CANDLE_INTERVALS.split(',') if interval.strip()]
+)
\ No newline at end of file
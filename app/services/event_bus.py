@@ -0,0 +1,77 @@
+import json
+import threading
+import time
+from app import redis_client
+
+class EventBus:
+    """Fan out Redis pub/sub messages to in-process handlers.
+    
+    One pub/sub connection and one listener thread are shared by every
+    handler in the process. Handlers run on the listener thread and must
+    hand heavy work off to their own threads.
+    """
+    def __init__(self):
+        self.handlers = {}
+        self.pubsub = None
+        self.listener_thread = None
+        self.connected = False
+        self.lock = threading.Lock()
+    
+    def publish(self, channel, payload, client=None):
+        """Publish a JSON payload; pass a pipeline as client to batch it"""
+        (client or redis_client).publish(channel, json.dumps(payload))
+    
+    def publish_tick(self, price_data, client=None):
+        """Publish a new price on its symbol's tick channel"""
+        payload = dict(price_data, published_at=time.time())
+        self.publish(f"tick:{price_data['symbol']}", payload, client)
+    
+    def subscribe(self, pattern, callback):
+        """Call callback(channel, payload) for every message matching pattern"""
+        with self.lock:
+            is_new_pattern = pattern not in self.handlers
+            self.handlers.setdefault(pattern, []).append(callback)
+            
+            if self.listener_thread is None:
+                self.listener_thread = threading.Thread(target=self._listen)
+                self.listener_thread.daemon = True
+                self.listener_thread.start()
+            elif is_new_pattern and self.pubsub is not None:
+                self.pubsub.psubscribe(pattern)
+    
+    def _listen(self):
+        """Listener loop; reconnects with the current patterns after errors"""
+        while True:
+            try:
+                with self.lock:
+                    self.pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                    self.pubsub.psubscribe(*self.handlers.keys())
+                self.connected = True
+                
+                for message in self.pubsub.listen():
+                    if message['type'] != 'pmessage':
+                        continue
+                    self._dispatch(message)
+            
+            except Exception as e:
+                print(f"Event bus connection lost: {e}")
+            
+            self.connected = False
+            time.sleep(1)
+    
+    def _dispatch(self, message):
+        pattern = message['pattern'].decode('utf-8')
+        channel = message['channel'].decode('utf-8')
+        try:
+            payload = json.loads(message['data'])
+        except ValueError:
+            print(f"Dropping malformed message on {channel}")
+            return
+        
+        for callback in self.handlers.get(pattern, []):
+            try:
+                callback(channel, payload)
+            except Exception as e:
+                print(f"Error handling message on {channel}: {e}")
+
+event_bus = EventBus()
\ No newline at end of file
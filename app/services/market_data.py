@@ -1,56 +1,209 @@
-import requests
 import json
-from datetime import datetime
+import threading
+import uuid
 from app import redis_client
+from app.config import Config
+from app.services.event_bus import event_bus
+from app.services.local_cache import TTLCache
+from app.services.market_data_providers import create_provider
+from app.services.redis_scripts import RELEASE_LEASE_SCRIPT
+from app.services.single_flight import SingleFlight
 import time
 
 class MarketDataService:
-    def __init__(self):
-        self.base_url = "https://api.upstox.com/v2"  # Example API
-        self.api_key = "your_api_key_here"  # Should be in environment variables
+    def __init__(self, provider=None):
+        self.provider = provider or create_provider()
+        self.feed_thread = None
+        # In-process tier in front of Redis; entries never outlive the Redis key
+        self.local_cache = TTLCache(Config.QUOTE_CACHE_SIZE, Config.PRICE_CACHE_TTL)
+        self.subscribed_to_ticks = False
+        self.single_flight = SingleFlight()
     
     def get_live_price(self, symbol):
         """Get live price for a symbol"""
         try:
-            # Check cache first
-            cached_price = redis_client.get(f"price:{symbol}")
+            self._subscribe_to_ticks()
+            price_data = self.local_cache.get(symbol)
+            if price_data:
+                return price_data
+            
+            # Check Redis next, with the key's remaining TTL for the local copy
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.get(f"price:{symbol}")
+            pipe.pttl(f"price:{symbol}")
+            cached_price, ttl_ms = pipe.execute()
             if cached_price:
-                return json.loads(cached_price)
-            
-            # Simulate API call (replace with actual API integration)
-            # For demo purposes, we'll use mock data
-            mock_prices = {
-                "NIFTY50": 19500 + (datetime.now().minute % 10) * 10,
-                "SENSEX": 65000 + (datetime.now().minute % 10) * 50,
-                "RELIANCE": 2450 + (datetime.now().minute % 10) * 5,
-                "TCS": 3450 + (datetime.now().minute % 10) * 3
-            }
-            
-            price_data = {
-                'symbol': symbol,
-                'price': mock_prices.get(symbol, 1000),
-                'timestamp': datetime.utcnow().isoformat(),
-                'change': 2.5,  # Mock change percentage
-                'volume': 1000000
-            }
-            
-            # Cache for 5 seconds
-            redis_client.setex(f"price:{symbol}", 5, json.dumps(price_data))
-            
-            return price_data
+                price_data = json.loads(cached_price)
+                self.local_cache.set(symbol, price_data, ttl_ms / 1000)
+                return price_data
+            
+            return self._refresh_price(symbol)
             
         except Exception as e:
             print(f"Error fetching market data: {e}")
             return None
     
+    def get_live_prices(self, symbols):
+        """Get live prices for many symbols, keyed by symbol, in one Redis round trip"""
+        try:
+            self._subscribe_to_ticks()
+            prices = {}
+            remote = []
+            for symbol in dict.fromkeys(symbols):
+                price_data = self.local_cache.get(symbol)
+                if price_data:
+                    prices[symbol] = price_data
+                else:
+                    remote.append(symbol)
+            
+            if not remote:
+                return prices
+            
+            misses = []
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.mget([f"price:{symbol}" for symbol in remote])
+            for symbol in remote:
+                pipe.pttl(f"price:{symbol}")
+            results = pipe.execute()
+            for symbol, cached_price, ttl_ms in zip(remote, results[0], results[1:]):
+                if cached_price:
+                    prices[symbol] = json.loads(cached_price)
+                    self.local_cache.set(symbol, prices[symbol], ttl_ms / 1000)
+                else:
+                    misses.append(symbol)
+            
+            if misses:
+                prices.update(self._refresh_prices(misses))
+            
+            return prices
+            
+        except Exception as e:
+            print(f"Error fetching market data: {e}")
+            return {}
+    
+    def _refresh_price(self, symbol):
+        """Refresh one symbol; concurrent callers in this process share one fetch"""
+        return self.single_flight.do(symbol, lambda: self._refresh_prices([symbol]).get(symbol))
+    
+    def _refresh_prices(self, symbols):
+        """Refresh expired symbols with at most one upstream fetch per key across workers
+        
+        Each symbol's refresh is guarded by a short Redis lock. Symbols locked
+        by another worker are served from the longer-lived stale copy while
+        that refresh runs, or waited on briefly when there is no stale copy.
+        """
+        token = uuid.uuid4().hex
+        pipe = redis_client.pipeline(transaction=False)
+        for symbol in symbols:
+            pipe.set(f"lock:price:{symbol}", token, nx=True, px=Config.PRICE_REFRESH_LOCK_MS)
+            pipe.get(f"price_stale:{symbol}")
+        results = pipe.execute()
+        
+        prices = {}
+        claimed = []
+        contended = []
+        for symbol, locked, stale_price in zip(symbols, results[0::2], results[1::2]):
+            if locked:
+                claimed.append(symbol)
+            elif stale_price:
+                prices[symbol] = json.loads(stale_price)
+            else:
+                contended.append(symbol)
+        
+        # Fetch what we hold locks for in one provider call;
+        # cache, publish and unlock in one round trip
+        if claimed:
+            quotes = self.provider.get_quotes(claimed)
+            pipe = redis_client.pipeline(transaction=False)
+            for symbol in claimed:
+                if symbol in quotes:
+                    prices[symbol] = quotes[symbol]
+                    self._store_price(quotes[symbol], pipe)
+                pipe.eval(RELEASE_LEASE_SCRIPT, 1, f"lock:price:{symbol}", token)
+            pipe.execute()
+        
+        if contended:
+            prices.update(self._wait_for_refreshes(contended))
+        
+        return prices
+    
+    def _wait_for_refreshes(self, symbols):
+        """Wait for other workers' refreshes of all symbols at once, then fetch what never landed"""
+        prices = {}
+        pending = list(symbols)
+        deadline = time.time() + Config.PRICE_REFRESH_LOCK_MS / 1000
+        while pending and time.time() < deadline:
+            time.sleep(0.05)
+            cached_prices = redis_client.mget([f"price:{symbol}" for symbol in pending])
+            for symbol, cached_price in zip(pending, cached_prices):
+                if cached_price:
+                    prices[symbol] = json.loads(cached_price)
+            pending = [symbol for symbol in pending if symbol not in prices]
+        
+        if pending:
+            quotes = self.provider.get_quotes(pending)
+            pipe = redis_client.pipeline(transaction=False)
+            for symbol, price_data in quotes.items():
+                prices[symbol] = price_data
+                self._store_price(price_data, pipe)
+            pipe.execute()
+        return prices
+    
+    def start_feed(self):
+        """Push the provider's tick stream into Redis from a background thread"""
+        self.feed_thread = threading.Thread(target=self._run_feed)
+        self.feed_thread.daemon = True
+        self.feed_thread.start()
+        print(f"Market data feed started ({Config.MARKET_DATA_PROVIDER})")
+    
+    def _run_feed(self):
+        """Write ticks in pipelined batches of up to FEED_BATCH_SIZE or 50 ms"""
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pending = 0
+            flush_at = time.perf_counter() + 0.05
+            for price_data in self.provider.stream():
+                self._store_price(price_data, pipe)
+                pending += 1
+                if pending >= Config.FEED_BATCH_SIZE or time.perf_counter() >= flush_at:
+                    pipe.execute()
+                    pending = 0
+                    flush_at = time.perf_counter() + 0.05
+            if pending:
+                pipe.execute()
+        except Exception as e:
+            print(f"Market data feed stopped: {e}")
+    
+    def _store_price(self, price_data, pipe):
+        """Queue the cache write and tick publish for a fresh price on a pipeline"""
+        encoded = json.dumps(price_data)
+        pipe.setex(f"price:{price_data['symbol']}", Config.PRICE_CACHE_TTL, encoded)
+        pipe.setex(f"price_stale:{price_data['symbol']}", Config.PRICE_STALE_TTL, encoded)
+        event_bus.publish_tick(price_data, pipe)
+        self.local_cache.set(price_data['symbol'], price_data)
+    
+    def _subscribe_to_ticks(self):
+        """Refresh local entries whenever any process publishes a new price"""
+        if not self.subscribed_to_ticks:
+            self.subscribed_to_ticks = True
+            event_bus.subscribe('tick:*', self._on_tick)
+    
+    def _on_tick(self, channel, tick):
+        price_data = dict(tick)
+        price_data.pop('published_at', None)
+        self.local_cache.set(price_data['symbol'], price_data)
+    
+    def get_cache_stats(self):
+        """Hit, miss and eviction counters of the in-process quote cache"""
+        return self.local_cache.stats()
+    
     def get_index_data(self):
         """Get Nifty 50 and Sensex data"""
-        nifty_data = self.get_live_price("NIFTY50")
-        sensex_data = self.get_live_price("SENSEX")
+        prices = self.get_live_prices(["NIFTY50", "SENSEX"])
         
         return {
-            'nifty50': nifty_data,
-            'sensex': sensex_data
+            'nifty50': prices.get("NIFTY50"),
+            'sensex': prices.get("SENSEX")
         }
 
 market_data_service = MarketDataService()
\ No newline at end of file
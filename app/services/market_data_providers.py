@@ -0,0 +1,266 @@
+import csv
+import json
+import math
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from app.config import Config
+
+# Reference levels used by the mock and as synthetic starting prices
+BASE_PRICES = {
+    "NIFTY50": 19500,
+    "SENSEX": 65000,
+    "RELIANCE": 2450,
+    "TCS": 3450
+}
+
+# Trading seconds per year (252 sessions of 6h15m), to scale GBM steps
+TRADING_SECONDS_PER_YEAR = 252 * 6.25 * 3600
+
+def build_price_data(symbol, price, change=0.0, volume=0, timestamp=None):
+    """Quote payload shared by every provider"""
+    return {
+        'symbol': symbol,
+        'price': price,
+        'timestamp': timestamp or datetime.utcnow().isoformat(),
+        'change': change,
+        'volume': volume
+    }
+
+def read_tick_rows(path):
+    """Yield recorded tick rows from a CSV (symbol,price,timestamp[,volume]) or NDJSON file"""
+    with open(path, newline='') as tick_file:
+        if path.endswith(('.ndjson', '.jsonl')):
+            for line in tick_file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(tick_file)
+
+def tick_epoch(timestamp):
+    """Epoch seconds from a numeric or ISO timestamp; naive ISO times are UTC"""
+    try:
+        return float(timestamp)
+    except (TypeError, ValueError):
+        recorded_at = datetime.fromisoformat(timestamp)
+        if recorded_at.tzinfo is None:
+            recorded_at = recorded_at.replace(tzinfo=timezone.utc)
+        return recorded_at.timestamp()
+
+class MarketDataError(Exception):
+    """A provider could not produce quotes; the message says why"""
+
+class MarketDataProvider(ABC):
+    """Source of quotes behind MarketDataService"""
+    @abstractmethod
+    def get_quote(self, symbol):
+        """Quote for one symbol, or None when the provider has none"""
+    
+    def get_quotes(self, symbols):
+        """Quotes keyed by symbol; providers with a batch API override this"""
+        quotes = {}
+        for symbol in symbols:
+            quote = self.get_quote(symbol)
+            if quote:
+                quotes[symbol] = quote
+        return quotes
+    
+    def stream(self):
+        """Yield ticks as they happen; only feed-style providers have a stream"""
+        return iter(())
+
+class MockProvider(MarketDataProvider):
+    """Demo prices that step once a minute"""
+    def get_quote(self, symbol):
+        step = datetime.now().minute % 10
+        mock_prices = {
+            "NIFTY50": BASE_PRICES["NIFTY50"] + step * 10,
+            "SENSEX": BASE_PRICES["SENSEX"] + step * 50,
+            "RELIANCE": BASE_PRICES["RELIANCE"] + step * 5,
+            "TCS": BASE_PRICES["TCS"] + step * 3
+        }
+        # Mock change percentage and volume
+        return build_price_data(symbol, mock_prices.get(symbol, 1000), 2.5, 1000000)
+
+class HttpQuoteProvider(MarketDataProvider):
+    """Upstox-style REST quotes over a pooled keep-alive session"""
+    def __init__(self, base_url, api_key, pool_size=20, timeout=2.0, batch_size=50):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.batch_size = batch_size
+        
+        retry = Retry(
+            total=2,
+            backoff_factor=0.1,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET'])
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'Authorization': f'Bearer {api_key}',
+            'Accept': 'application/json'
+        })
+    
+    def get_quote(self, symbol):
+        return self.get_quotes([symbol]).get(symbol)
+    
+    def get_quotes(self, symbols):
+        """Fetch quotes batch_size symbols per request over reused connections"""
+        quotes = {}
+        for start in range(0, len(symbols), self.batch_size):
+            batch = symbols[start:start + self.batch_size]
+            try:
+                response = self.session.get(
+                    f"{self.base_url}/market-quote/quotes",
+                    params={'symbol': ','.join(batch)},
+                    timeout=self.timeout
+                )
+                response.raise_for_status()
+                data = response.json().get('data', {})
+            except requests.Timeout as e:
+                raise MarketDataError(f"Quote API timed out after {self.timeout}s") from e
+            except requests.exceptions.RetryError as e:
+                raise MarketDataError(f"Quote API still failing after retries: {e}") from e
+            except requests.HTTPError as e:
+                raise MarketDataError(f"Quote API returned {e.response.status_code}") from e
+            except (requests.RequestException, ValueError) as e:
+                raise MarketDataError(f"Quote API request failed: {e}") from e
+            
+            # Keys look like "NSE_EQ:RELIANCE"; prefer the explicit symbol field
+            for key, quote in data.items():
+                symbol = quote.get('symbol') or key.split(':')[-1]
+                if quote.get('last_price') is None:
+                    raise MarketDataError(f"Quote for {symbol} has no last_price")
+                quotes[symbol] = build_price_data(
+                    symbol,
+                    quote['last_price'],
+                    quote.get('net_change', 0.0),
+                    quote.get('volume', 0)
+                )
+        return quotes
+
+class SyntheticProvider(MarketDataProvider):
+    """Seeded geometric Brownian motion paths, fast enough for load tests"""
+    def __init__(self, symbols, seed=42, tick_rate=5000, volatility=0.2, drift=0.0):
+        self.symbols = list(symbols)
+        self.tick_rate = tick_rate
+        self.volatility = volatility
+        self.drift = drift
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.prices = {}
+        self.open_prices = {}
+        self.volumes = {}
+        self.cursor = 0
+        for symbol in self.symbols:
+            self._add_symbol(symbol)
+        
+        # Each symbol ticks every len(symbols) / tick_rate seconds
+        step_seconds = max(len(self.symbols), 1) / tick_rate
+        dt = step_seconds / TRADING_SECONDS_PER_YEAR
+        self.step_drift = (drift - 0.5 * volatility ** 2) * dt
+        self.step_scale = volatility * math.sqrt(dt)
+    
+    def _add_symbol(self, symbol):
+        price = BASE_PRICES.get(symbol, 1000)
+        self.prices[symbol] = price
+        self.open_prices[symbol] = price
+        self.volumes[symbol] = 0
+    
+    def _tick(self, symbol):
+        price = self.prices[symbol] * math.exp(self.step_drift + self.step_scale * self.random.gauss(0, 1))
+        self.prices[symbol] = price
+        self.volumes[symbol] += self.random.randint(1, 500)
+        change = (price - self.open_prices[symbol]) / self.open_prices[symbol] * 100
+        return build_price_data(symbol, round(price, 2), round(change, 2), self.volumes[symbol])
+    
+    def get_quote(self, symbol):
+        with self.lock:
+            if symbol not in self.prices:
+                self._add_symbol(symbol)
+                self.symbols.append(symbol)
+            return self._tick(symbol)
+    
+    def stream(self):
+        """Yield ticks round-robin across symbols, paced to tick_rate per second"""
+        batch_size = max(1, self.tick_rate // 100)
+        next_batch_at = time.perf_counter()
+        while True:
+            with self.lock:
+                ticks = []
+                for _ in range(batch_size):
+                    ticks.append(self._tick(self.symbols[self.cursor % len(self.symbols)]))
+                    self.cursor += 1
+            yield from ticks
+            
+            next_batch_at += batch_size / self.tick_rate
+            delay = next_batch_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+class ReplayProvider(MarketDataProvider):
+    """Replay recorded ticks from a CSV (symbol,price,timestamp[,volume]) or NDJSON file"""
+    def __init__(self, path, speed=1.0):
+        self.path = path
+        self.speed = speed
+        self.last_quotes = {}
+    
+    def get_quote(self, symbol):
+        """Latest replayed tick for symbol, or None before its first tick"""
+        return self.last_quotes.get(symbol)
+    
+    def stream(self):
+        """Yield recorded ticks in file order; speed 0 replays as fast as possible"""
+        first_recorded = None
+        started = time.perf_counter()
+        for row in read_tick_rows(self.path):
+            recorded_at = tick_epoch(row['timestamp'])
+            if first_recorded is None:
+                first_recorded = recorded_at
+            
+            if self.speed > 0:
+                delay = (recorded_at - first_recorded) / self.speed - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            
+            quote = build_price_data(
+                row['symbol'],
+                float(row['price']),
+                float(row.get('change') or 0.0),
+                int(float(row.get('volume') or 0)),
+                datetime.utcfromtimestamp(recorded_at).isoformat()
+            )
+            self.last_quotes[row['symbol']] = quote
+            yield quote
+
+def create_provider():
+    """Build the provider selected by Config.MARKET_DATA_PROVIDER"""
+    provider = Config.MARKET_DATA_PROVIDER
+    if provider == 'http':
+        return HttpQuoteProvider(
+            Config.MARKET_DATA_BASE_URL,
+            Config.MARKET_DATA_API_KEY,
+            pool_size=Config.MARKET_DATA_POOL_SIZE,
+            timeout=Config.MARKET_DATA_TIMEOUT,
+            batch_size=Config.MARKET_DATA_BATCH_SIZE
+        )
+    if provider == 'synthetic':
+        return SyntheticProvider(
+            Config.SYNTHETIC_SYMBOLS,
+            seed=Config.SYNTHETIC_SEED,
+            tick_rate=Config.SYNTHETIC_TICK_RATE,
+            volatility=Config.SYNTHETIC_VOLATILITY
+        )
+    if provider == 'replay':
+        return ReplayProvider(Config.REPLAY_FILE, speed=Config.REPLAY_SPEED)
+    if provider == 'mock':
+        return MockProvider()
+    raise ValueError(f"Unknown market data provider: {provider}")
\ No newline at end of file
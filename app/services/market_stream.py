@@ -0,0 +1,210 @@
+import os
+import socket
+import threading
+import time
+from collections import Counter, defaultdict
+from flask_socketio import join_room, leave_room
+from app import redis_client, socketio
+from app.config import Config
+from app.services.event_bus import event_bus
+from app.services.market_data import market_data_service
+from app.services.redis_scripts import RENEW_LEASE_SCRIPT
+
+class MarketBroadcaster:
+    """Push published ticks to per-symbol Socket.IO rooms.
+    
+    Every process runs one broadcaster, but only the holder of a Redis
+    leader lease emits, so each tick goes through the Socket.IO message
+    queue once no matter how many web processes are running.
+    
+    Each process keeps its own subscriber counts in a hash that expires
+    unless it heartbeats, so a process that dies without running its
+    disconnect handlers stops holding symbols active. Watched symbols that
+    see no ticks (no feed running, or a quiet feed) are polled instead.
+    """
+    SUBSCRIBERS_KEY = 'market_stream:subscribers'
+    WORKERS_KEY = 'market_stream:workers'
+    LEADER_KEY = 'market_stream:leader'
+    
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.subscribers_key = f"{self.SUBSCRIBERS_KEY}:{self.worker_id}"
+        self.lock = threading.Lock()
+        self.started = False
+        self.is_leader = False
+        self.pending_ticks = {}
+        self.active_symbols = set()
+        self.client_symbols = defaultdict(set)
+        self.symbol_counts = Counter()
+        self.last_tick_at = {}
+        self.connections = 0
+        self.messages_sent = 0
+        self.ticks_coalesced = 0
+        self.symbols_polled = 0
+    
+    @staticmethod
+    def room(symbol):
+        return f"market:{symbol}"
+    
+    def start(self):
+        """Start the broadcaster once per process"""
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+        event_bus.subscribe('tick:*', self._on_tick)
+        socketio.start_background_task(self._run)
+    
+    def connect(self, sid):
+        with self.lock:
+            self.connections += 1
+    
+    def subscribe(self, sid, symbol):
+        """Add a client to a symbol's room"""
+        with self.lock:
+            if symbol in self.client_symbols[sid]:
+                return
+            self.client_symbols[sid].add(symbol)
+            self.symbol_counts[symbol] += 1
+            self._write_counts([symbol])
+        join_room(self.room(symbol), sid=sid)
+    
+    def unsubscribe(self, sid, symbol):
+        """Remove a client from a symbol's room"""
+        with self.lock:
+            if symbol not in self.client_symbols.get(sid, ()):
+                return
+            self.client_symbols[sid].discard(symbol)
+            self.symbol_counts[symbol] -= 1
+            self._write_counts([symbol])
+        leave_room(self.room(symbol), sid=sid)
+    
+    def disconnect(self, sid):
+        """Drop every subscription of a disconnected client"""
+        with self.lock:
+            self.connections -= 1
+            symbols = self.client_symbols.pop(sid, set())
+            for symbol in symbols:
+                self.symbol_counts[symbol] -= 1
+            if symbols:
+                self._write_counts(symbols)
+    
+    def _write_counts(self, symbols):
+        """Mirror this process's counts for symbols into its own hash; call with the lock held"""
+        pipe = redis_client.pipeline(transaction=False)
+        for symbol in symbols:
+            if self.symbol_counts[symbol] > 0:
+                pipe.hset(self.subscribers_key, symbol, self.symbol_counts[symbol])
+            else:
+                del self.symbol_counts[symbol]
+                pipe.hdel(self.subscribers_key, symbol)
+        pipe.pexpire(self.subscribers_key, Config.MARKET_STREAM_LEADER_TTL * 1000)
+        pipe.sadd(self.WORKERS_KEY, self.worker_id)
+        pipe.execute()
+    
+    def _on_tick(self, channel, tick):
+        """Keep only the latest tick per watched symbol until the next flush"""
+        if not self.is_leader or tick['symbol'] not in self.active_symbols:
+            return
+        self.last_tick_at[tick['symbol']] = time.time()
+        with self.lock:
+            if tick['symbol'] in self.pending_ticks:
+                self.ticks_coalesced += 1
+            self.pending_ticks[tick['symbol']] = tick
+    
+    def _run(self):
+        """Flush pending ticks every MARKET_STREAM_INTERVAL, i.e. at most one message per symbol"""
+        refresh_at = 0
+        while True:
+            try:
+                if time.time() >= refresh_at:
+                    self._heartbeat()
+                    self._refresh_leadership()
+                    if self.is_leader:
+                        self._poll_quiet_symbols()
+                    refresh_at = time.time() + 1
+                
+                with self.lock:
+                    ticks, self.pending_ticks = self.pending_ticks, {}
+                for symbol, tick in ticks.items():
+                    # Tick payloads are shared with other bus handlers; copy, don't mutate
+                    price_data = {key: value for key, value in tick.items() if key != 'published_at'}
+                    socketio.emit('market_data', {'symbol': symbol, 'data': price_data}, to=self.room(symbol))
+                    self.messages_sent += 1
+            
+            except Exception as e:
+                print(f"Error in market data broadcaster: {e}")
+            socketio.sleep(Config.MARKET_STREAM_INTERVAL)
+    
+    def _heartbeat(self):
+        """Keep this process's subscriber counts alive while it has any"""
+        with self.lock:
+            has_subscribers = bool(self.symbol_counts)
+        if has_subscribers:
+            redis_client.pexpire(self.subscribers_key, Config.MARKET_STREAM_LEADER_TTL * 1000)
+    
+    def _refresh_leadership(self):
+        """Take or renew the leader lease and reload which symbols have subscribers"""
+        ttl_ms = Config.MARKET_STREAM_LEADER_TTL * 1000
+        if self.is_leader:
+            self.is_leader = bool(redis_client.eval(RENEW_LEASE_SCRIPT, 1, self.LEADER_KEY, self.worker_id, ttl_ms))
+        else:
+            self.is_leader = bool(redis_client.set(self.LEADER_KEY, self.worker_id, nx=True, px=ttl_ms))
+        
+        if self.is_leader:
+            self.active_symbols = self._load_active_symbols()
+    
+    def _load_active_symbols(self):
+        """Symbols with a subscriber in any live process; forget processes whose counts expired"""
+        workers = [worker.decode('utf-8') for worker in redis_client.smembers(self.WORKERS_KEY)]
+        if not workers:
+            return set()
+        pipe = redis_client.pipeline(transaction=False)
+        for worker in workers:
+            pipe.hkeys(f"{self.SUBSCRIBERS_KEY}:{worker}")
+        active_symbols = set()
+        gone = []
+        for worker, symbols in zip(workers, pipe.execute()):
+            if symbols:
+                active_symbols.update(symbol.decode('utf-8') for symbol in symbols)
+            else:
+                gone.append(worker)
+        if gone:
+            redis_client.srem(self.WORKERS_KEY, *gone)
+        
+        for symbol in set(self.last_tick_at) - active_symbols:
+            self.last_tick_at.pop(symbol, None)
+        return active_symbols
+    
+    def _poll_quiet_symbols(self):
+        """Queue a fresh quote for watched symbols that have not ticked within MARKET_STREAM_POLL_AFTER"""
+        now = time.time()
+        quiet = []
+        for symbol in self.active_symbols:
+            if now - self.last_tick_at.setdefault(symbol, now) >= Config.MARKET_STREAM_POLL_AFTER:
+                quiet.append(symbol)
+        if not quiet:
+            return
+        
+        prices = market_data_service.get_live_prices(quiet)
+        with self.lock:
+            for symbol in quiet:
+                self.last_tick_at[symbol] = now
+                if symbol in prices and symbol not in self.pending_ticks:
+                    self.pending_ticks[symbol] = prices[symbol]
+        self.symbols_polled += len(prices)
+    
+    def stats(self):
+        with self.lock:
+            local_subscriptions = sum(len(symbols) for symbols in self.client_symbols.values())
+        return {
+            'leader': self.is_leader,
+            'connections': self.connections,
+            'local_subscriptions': local_subscriptions,
+            'active_symbols': len(self.active_symbols),
+            'messages_sent': self.messages_sent,
+            'ticks_coalesced': self.ticks_coalesced,
+            'symbols_polled': self.symbols_polled
+        }
+
+market_broadcaster = MarketBroadcaster()
\ No newline at end of file
@@ -0,0 +1,186 @@
+import threading
+import time
+from bisect import bisect_left
+import redis
+from pymongo import monitoring
+from redis.client import Pipeline
+
+# Upper bounds in seconds; +Inf is implied
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)] + list(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _number(value):
+    return repr(float(value)) if value != float('inf') else '+Inf'
+
+class Histogram:
+    """Cumulative-bucket latency histogram, one series per label combination"""
+    kind = 'histogram'
+    
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+    
+    def observe(self, seconds, *labels):
+        """Record one duration; labels are given in labelnames order"""
+        index = bisect_left(self.buckets, seconds)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                # Per-bucket counts (not cumulative), the overflow bucket, then sum
+                series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += seconds
+    
+    def samples(self):
+        with self.lock:
+            series = {labels: list(values) for labels, values in self.series.items()}
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values):
+                cumulative += count
+                bucket_label = 'le="' + _number(bound) + '"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, [bucket_label])} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(values[-1])}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+class Counter:
+    """Monotonic count, one series per label combination"""
+    kind = 'counter'
+    
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.series = {}
+        self.lock = threading.Lock()
+    
+    def inc(self, *labels, amount=1):
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+    
+    def samples(self):
+        with self.lock:
+            series = dict(self.series)
+        for labels, value in sorted(series.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+class Collected:
+    """Values read from a service's own counters at scrape time, so hot paths pay nothing.
+    
+    collect returns a number, or a dict of label-value tuples to numbers.
+    """
+    def __init__(self, name, documentation, kind, labelnames, collect):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+    
+    def samples(self):
+        values = self.collect()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in sorted(values.items()):
+            if value is not None:
+                yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+    
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+    
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+    
+    def gauge_callback(self, name, documentation, collect, labelnames=()):
+        return self._register(Collected(name, documentation, 'gauge', labelnames, collect))
+    
+    def counter_callback(self, name, documentation, collect, labelnames=()):
+        return self._register(Collected(name, documentation, 'counter', labelnames, collect))
+    
+    def _register(self, metric):
+        self.metrics.append(metric)
+        return metric
+    
+    def render(self):
+        """Every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                print(f"Error collecting metric {metric.name}: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    'http_request_duration_seconds', 'Flask request latency', ('blueprint', 'route', 'method', 'status')
+)
+mongo_command_duration = registry.histogram(
+    'mongo_command_duration_seconds', 'MongoDB command latency as seen by the driver', ('command',)
+)
+mongo_command_failures = registry.counter(
+    'mongo_command_failures_total', 'MongoDB commands that returned an error', ('command',)
+)
+redis_command_duration = registry.histogram(
+    'redis_command_duration_seconds', 'Redis command latency; a pipeline counts as one PIPELINE call', ('command',)
+)
+monitor_cycle_duration = registry.histogram(
+    'monitor_cycle_duration_seconds', 'Duration of a full trade monitor scan',
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+monitor_cycle_lag = registry.histogram(
+    'monitor_cycle_lag_seconds', 'How late a full trade monitor scan started after it was due'
+)
+monitor_tick_to_exit = registry.histogram(
+    'monitor_tick_to_exit_seconds', 'Time from a tick being published to the exits it triggered being settled'
+)
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Time every command the driver sends; pass to MongoClient(event_listeners=...)"""
+    def started(self, event):
+        pass
+    
+    def succeeded(self, event):
+        mongo_command_duration.observe(event.duration_micros / 1e6, event.command_name)
+    
+    def failed(self, event):
+        mongo_command_duration.observe(event.duration_micros / 1e6, event.command_name)
+        mongo_command_failures.inc(event.command_name)
+
+class InstrumentedPipeline(Pipeline):
+    def execute(self, raise_on_error=True):
+        started = time.perf_counter()
+        try:
+            return super().execute(raise_on_error)
+        finally:
+            redis_command_duration.observe(time.perf_counter() - started, 'MULTI' if self.transaction else 'PIPELINE')
+
+class InstrumentedRedis(redis.Redis):
+    """Redis client that times each command and each pipeline round trip"""
+    def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            redis_command_duration.observe(time.perf_counter() - started, str(args[0]).upper())
+    
+    def pipeline(self, transaction=True, shard_hint=None):
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
\ No newline at end of file
@@ -0,0 +1,161 @@
+import json
+import threading
+from datetime import datetime, timezone
+from redis.exceptions import RedisError
+from app import redis_client
+from app.config import Config
+
+# Fill only if no invalidation happened since the miss that read the generation
+SET_IF_GENERATION_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '0') == ARGV[1] then
+    redis.call('SETEX', KEYS[1], ARGV[2], ARGV[3])
+    return 1
+end
+return 0
+"""
+
+class ModelCache:
+    """Read-through Redis cache of small model documents, keyed by client_id.
+    
+    Documents are stored as a JSON array of field values in a fixed order,
+    with datetimes as epoch seconds, so an entry carries no field names.
+    Entries expire after ttl seconds and anything over max_bytes is not
+    cached at all. Redis failures only cost a cache miss.
+    
+    Every invalidation bumps a per-key generation. A miss hands back the
+    generation it saw, and the fill after the database read is skipped if
+    the generation has moved on, so a slow reader cannot re-cache a
+    document that a concurrent write already invalidated.
+    """
+    GENERATION_TTL = 3600  # Must outlive any miss-to-fill window
+    
+    def __init__(self, prefix, fields, datetime_fields=(), ttl=60, max_bytes=2048):
+        self.prefix = prefix
+        self.fields = fields
+        self.datetime_fields = set(datetime_fields)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.oversized = 0
+        self.stale_fills = 0
+        self.errors = 0
+    
+    def key(self, client_id):
+        return f"{self.prefix}:{client_id}"
+    
+    def generation_key(self, client_id):
+        return f"{self.prefix}:gen:{client_id}"
+    
+    def encode(self, document):
+        values = []
+        for field in self.fields:
+            value = document.get(field)
+            if field in self.datetime_fields and value is not None:
+                # Stored datetimes are naive UTC
+                value = value.replace(tzinfo=timezone.utc).timestamp()
+            values.append(value)
+        return json.dumps(values, separators=(',', ':'))
+    
+    def decode(self, payload):
+        document = dict(zip(self.fields, json.loads(payload)))
+        for field in self.datetime_fields:
+            if document.get(field) is not None:
+                document[field] = datetime.utcfromtimestamp(document[field])
+        return document
+    
+    def get(self, client_id):
+        """Cached document for client_id, or None on a miss"""
+        return self.lookup(client_id)[0]
+    
+    def lookup(self, client_id):
+        """(cached document or None, generation to pass to set when filling the miss)"""
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.get(self.key(client_id))
+            pipe.get(self.generation_key(client_id))
+            payload, generation = pipe.execute()
+        except RedisError as e:
+            print(f"Error reading {self.prefix} cache: {e}")
+            payload = generation = None
+            with self.lock:
+                self.errors += 1
+        
+        generation = generation.decode('utf-8') if generation else '0'
+        with self.lock:
+            if payload is None:
+                self.misses += 1
+                return None, generation
+            self.hits += 1
+        return self.decode(payload), generation
+    
+    def set(self, client_id, document, client=None, generation=None):
+        """Store a document; a pipeline may be passed to batch the write.
+        
+        Pass the generation from lookup when filling a miss; the write is
+        then dropped if the key was invalidated in between.
+        """
+        payload = self.encode(document)
+        if len(payload) > self.max_bytes:
+            with self.lock:
+                self.oversized += 1
+            return
+        try:
+            if generation is None:
+                (client or redis_client).setex(self.key(client_id), self.ttl, payload)
+            elif not (client or redis_client).eval(
+                SET_IF_GENERATION_SCRIPT, 2, self.key(client_id), self.generation_key(client_id),
+                generation, self.ttl, payload
+            ):
+                with self.lock:
+                    self.stale_fills += 1
+        except RedisError as e:
+            print(f"Error writing {self.prefix} cache: {e}")
+            with self.lock:
+                self.errors += 1
+    
+    def invalidate(self, *client_ids):
+        if not client_ids:
+            return
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.delete(*[self.key(client_id) for client_id in client_ids])
+            for client_id in client_ids:
+                pipe.incr(self.generation_key(client_id))
+                pipe.expire(self.generation_key(client_id), self.GENERATION_TTL)
+            pipe.execute()
+        except RedisError as e:
+            print(f"Error invalidating {self.prefix} cache: {e}")
+            with self.lock:
+                self.errors += 1
+    
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'oversized': self.oversized,
+                'stale_fills': self.stale_fills,
+                'errors': self.errors,
+                'ttl': self.ttl,
+                'max_bytes': self.max_bytes
+            }
+
+portfolio_cache = ModelCache(
+    'cache:portfolio',
+    ['user_id', 'available_margin', 'utilized_margin', 'total_pnl', 'created_at', 'updated_at'],
+    datetime_fields=('created_at', 'updated_at'),
+    ttl=Config.MODEL_CACHE_TTL,
+    max_bytes=Config.MODEL_CACHE_MAX_BYTES
+)
+
+# Password hashes never leave Mongo; login looks users up by email
+user_cache = ModelCache(
+    'cache:user',
+    ['client_id', 'name', 'email', 'phone'],
+    ttl=Config.MODEL_CACHE_TTL,
+    max_bytes=Config.MODEL_CACHE_MAX_BYTES
+)
\ No newline at end of file
@@ -1,104 +1,380 @@
+import queue
 import smtplib
-from email.mime.text import MimeText
-from email.mime.multipart import MimeMultipart
+import threading
+import time
+from collections import defaultdict
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
 import requests
-from app import redis_client
-import json
+from requests.adapters import HTTPAdapter
+from app.config import Config
+from app.models.user import User
+
+# Most events listed one by one in an email digest
+DIGEST_MAX_LINES = 50
+
+class SMTPConnection:
+    """A persistent, logged-in SMTP session, reopened when the server drops it"""
+    def __init__(self, host, port, username=None, password=None, use_tls=True, timeout=10):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.server = None
+    
+    def _connect(self):
+        self.server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            self.server.starttls()
+        if self.username:
+            self.server.login(self.username, self.password)
+    
+    def send(self, msg):
+        # A session idle past the server's timeout fails on first use; reconnect once
+        for attempt in range(2):
+            if self.server is None:
+                self._connect()
+            try:
+                self.server.send_message(msg)
+                return
+            except smtplib.SMTPServerDisconnected:
+                self.close()
+                if attempt:
+                    raise
+    
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.server = None
+
+class NotificationDispatcher:
+    """Bounded job queue drained by background worker threads.
+    
+    Submitting never blocks: when the queue is full the job is dropped and
+    counted. A job that raises is retried with exponential backoff up to
+    max_retries times.
+    """
+    def __init__(self, workers=4, queue_size=10000, max_retries=3, backoff=0.5):
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.started = False
+        self.submitted = 0
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+        self.dropped = 0
+    
+    def start(self):
+        """Start the worker threads once; called lazily on first submit"""
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+        for index in range(self.workers):
+            threading.Thread(target=self._work, name=f"notifications-{index}", daemon=True).start()
+    
+    def submit(self, fn, *args):
+        """Queue fn(*args); returns False if the queue is full"""
+        self.start()
+        try:
+            self.queue.put_nowait((fn, args, 0))
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            print(f"Notification queue full, dropping {fn.__name__}")
+            return False
+        with self.lock:
+            self.submitted += 1
+        return True
+    
+    def _work(self):
+        while True:
+            fn, args, attempt = self.queue.get()
+            try:
+                fn(*args)
+                with self.lock:
+                    self.completed += 1
+            except Exception as e:
+                if attempt < self.max_retries:
+                    with self.lock:
+                        self.retried += 1
+                    time.sleep(self.backoff * 2 ** attempt)
+                    self._requeue(fn, args, attempt + 1)
+                else:
+                    with self.lock:
+                        self.failed += 1
+                    print(f"Notification {fn.__name__} failed after {attempt + 1} attempts: {e}")
+            finally:
+                self.queue.task_done()
+    
+    def _requeue(self, fn, args, attempt):
+        try:
+            self.queue.put_nowait((fn, args, attempt))
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+    
+    def stats(self):
+        with self.lock:
+            return {
+                'workers': self.workers,
+                'queued': self.queue.qsize(),
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'retried': self.retried,
+                'failed': self.failed,
+                'dropped': self.dropped
+            }
+
+class NotificationCoalescer:
+    """Collect events per (user, channel) and flush each key as one batch.
+    
+    A key flushes once its oldest event is window seconds old and the
+    channel's per-user minimum interval has passed since its last send,
+    so a burst of exits becomes one message per user and channel, and a
+    user who keeps trading gets at most one SMS per interval.
+    """
+    def __init__(self, flush, window=5.0, min_intervals=None, channels=('sms', 'email')):
+        self.flush = flush
+        self.window = window
+        self.min_intervals = min_intervals or {}
+        self.channels = channels
+        self.lock = threading.Lock()
+        self.started = False
+        # (client_id, channel) -> [first_event_at, events]
+        self.pending = {}
+        self.last_sent = {}
+        self.events_received = 0
+        self.messages_flushed = 0
+    
+    def start(self):
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+        threading.Thread(target=self._run, name="notification-coalescer", daemon=True).start()
+    
+    def add(self, client_id, event):
+        self.start()
+        now = time.time()
+        with self.lock:
+            self.events_received += 1
+            for channel in self.channels:
+                self.pending.setdefault((client_id, channel), [now, []])[1].append(event)
+    
+    def _run(self):
+        while True:
+            time.sleep(min(self.window, 0.5) or 0.1)
+            try:
+                for (client_id, channel), events in self._due(time.time()):
+                    self.flush(client_id, channel, events)
+            except Exception as e:
+                print(f"Error flushing notifications: {e}")
+    
+    def _due(self, now):
+        """Pop every key that may be sent now"""
+        due = []
+        with self.lock:
+            for key, (first_at, events) in list(self.pending.items()):
+                if now - first_at < self.window:
+                    continue
+                if now - self.last_sent.get(key, 0) < self.min_intervals.get(key[1], 0):
+                    continue
+                del self.pending[key]
+                self.last_sent[key] = now
+                due.append((key, events))
+            self.messages_flushed += len(due)
+            
+            # Forget send times that can no longer hold anything back
+            longest = max(self.min_intervals.values(), default=0)
+            for key, sent_at in list(self.last_sent.items()):
+                if now - sent_at >= longest and key not in self.pending:
+                    del self.last_sent[key]
+        return due
+    
+    def stats(self):
+        with self.lock:
+            return {
+                'pending_keys': len(self.pending),
+                'pending_events': sum(len(events) for _, events in self.pending.values()),
+                'events_received': self.events_received,
+                'messages_flushed': self.messages_flushed
+            }
 
 class NotificationService:
     def __init__(self):
-        self.sms_api_key = "your_sms_api_key"  # Should be in environment variables
-        self.sms_url = "https://api.sms_service.com/send"
-        self.smtp_server = "smtp.gmail.com"
-        self.smtp_port = 587
-        self.email_sender = "noreply@papertrading.com"
-        self.email_password = "your_email_password"  # Should be in environment variables
+        self.backend = Config.NOTIFICATION_BACKEND
+        self.sms_api_key = Config.SMS_API_KEY
+        self.sms_url = Config.SMS_API_URL
+        self.smtp_server = Config.SMTP_SERVER
+        self.smtp_port = Config.SMTP_PORT
+        self.smtp_use_tls = Config.SMTP_USE_TLS
+        self.email_sender = Config.EMAIL_SENDER
+        self.email_password = Config.EMAIL_PASSWORD
+        self.dispatcher = NotificationDispatcher(
+            workers=Config.NOTIFICATION_WORKERS,
+            queue_size=Config.NOTIFICATION_QUEUE_SIZE,
+            max_retries=Config.NOTIFICATION_MAX_RETRIES,
+            backoff=Config.NOTIFICATION_RETRY_BACKOFF
+        )
+        
+        # Keep-alive connections to the SMS API, one per worker
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=Config.NOTIFICATION_WORKERS)
+        self.sms_session = requests.Session()
+        self.sms_session.mount('http://', adapter)
+        self.sms_session.mount('https://', adapter)
+        
+        # Each worker thread keeps its own logged-in SMTP session
+        self.smtp_local = threading.local()
+        
+        self.coalescer = NotificationCoalescer(
+            lambda client_id, channel, events: self.dispatcher.submit(self._deliver_events, client_id, channel, events),
+            window=Config.NOTIFICATION_COALESCE_WINDOW,
+            min_intervals={
+                'sms': Config.NOTIFICATION_SMS_MIN_INTERVAL,
+                'email': Config.NOTIFICATION_EMAIL_MIN_INTERVAL
+            }
+        )
     
     def send_sms(self, phone_number, message):
-        """Send SMS notification"""
-        try:
-            # Mock SMS implementation - replace with actual SMS service
-            print(f"SMS to {phone_number}: {message}")
-            
-            # Actual implementation would look like:
-            # payload = {
-            #     'api_key': self.sms_api_key,
-            #     'to': phone_number,
-            #     'message': message
-            # }
-            # response = requests.post(self.sms_url, json=payload)
-            # return response.status_code == 200
-            
-            return True  # Mock success
-            
-        except Exception as e:
-            print(f"SMS sending failed: {e}")
-            return False
+        """Queue an SMS; returns False only if the queue is full"""
+        return self.dispatcher.submit(self._deliver_sms, phone_number, message)
     
     def send_email(self, email, subject, message):
-        """Send email notification"""
-        try:
-            # Mock email implementation - replace with actual email service
+        """Queue an email; returns False only if the queue is full"""
+        return self.dispatcher.submit(self._deliver_email, email, subject, message)
+    
+    def _deliver_sms(self, phone_number, message):
+        if self.backend == 'log':
+            print(f"SMS to {phone_number}: {message}")
+            return
+        
+        payload = {
+            'api_key': self.sms_api_key,
+            'to': phone_number,
+            'message': message
+        }
+        response = self.sms_session.post(self.sms_url, json=payload, timeout=Config.NOTIFICATION_TIMEOUT)
+        response.raise_for_status()
+    
+    def _deliver_email(self, email, subject, message):
+        if self.backend == 'log':
             print(f"Email to {email} - {subject}: {message}")
-            
-            # Actual implementation would look like:
-            # msg = MimeMultipart()
-            # msg['From'] = self.email_sender
-            # msg['To'] = email
-            # msg['Subject'] = subject
-            # msg.attach(MimeText(message, 'plain'))
-            
-            # server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            # server.starttls()
-            # server.login(self.email_sender, self.email_password)
-            # server.send_message(msg)
-            # server.quit()
-            
-            return True  # Mock success
-            
-        except Exception as e:
-            print(f"Email sending failed: {e}")
-            return False
+            return
+        
+        msg = MIMEMultipart()
+        msg['From'] = self.email_sender
+        msg['To'] = email
+        msg['Subject'] = subject
+        msg.attach(MIMEText(message, 'plain'))
+        self._smtp_connection().send(msg)
     
-    def notify_trade_creation(self, user_email, user_phone, trade_details):
-        """Notify user about trade creation"""
-        message = f"Trade created: {trade_details['symbol']} {trade_details['trade_type']} {trade_details['quantity']} shares at {trade_details['entry_price']}"
+    def _smtp_connection(self):
+        connection = getattr(self.smtp_local, 'connection', None)
+        if connection is None:
+            connection = SMTPConnection(
+                self.smtp_server,
+                self.smtp_port,
+                self.email_sender,
+                self.email_password,
+                use_tls=self.smtp_use_tls,
+                timeout=Config.NOTIFICATION_TIMEOUT
+            )
+            self.smtp_local.connection = connection
+        return connection
+    
+    def notify_user(self, client_id, kind, trade_details):
+        """Queue a notification by client_id; bursts for one user are merged into a digest"""
+        self.coalescer.add(client_id, (kind, trade_details))
+    
+    def _deliver_events(self, client_id, channel, events):
+        """Send one message on channel covering every coalesced event"""
+        user = User.find_by_client_id(client_id)
+        if not user:
+            return
         
-        if user_phone:
-            self.send_sms(user_phone, message)
+        if len(events) == 1:
+            subject, message = self.compose(*events[0])
+        else:
+            subject, message = self.compose_digest(events, channel)
         
-        if user_email:
-            self.send_email(user_email, "Trade Created", message)
+        if channel == 'sms' and user.phone:
+            self._deliver_sms(user.phone, message)
+        elif channel == 'email' and user.email:
+            self._deliver_email(user.email, subject, message)
     
-    def notify_trade_exit(self, user_email, user_phone, trade_details):
-        """Notify user about trade exit"""
+    @staticmethod
+    def compose(kind, trade_details):
+        """Subject and message for a single event"""
+        if kind == 'trade_created':
+            return "Trade Created", f"Trade created: {trade_details['symbol']} {trade_details['trade_type']} {trade_details['quantity']} shares at {trade_details['entry_price']}"
+        if kind == 'stop_loss_hit':
+            return "Stop-Loss Triggered", f"Stop-loss triggered: {trade_details['symbol']} exited at {trade_details['exit_price']} with PnL: {trade_details['pnl']}"
+        if kind == 'target_hit':
+            return "Target Achieved", f"Target achieved: {trade_details['symbol']} exited at {trade_details['exit_price']} with PnL: {trade_details['pnl']}"
         pnl_text = "profit" if trade_details['pnl'] > 0 else "loss"
-        message = f"Trade exited: {trade_details['symbol']} at {trade_details['exit_price']} with {pnl_text} of {abs(trade_details['pnl'])}"
+        return "Trade Exited", f"Trade exited: {trade_details['symbol']} at {trade_details['exit_price']} with {pnl_text} of {abs(trade_details['pnl'])}"
+    
+    @staticmethod
+    def compose_digest(events, channel):
+        """One summary for many events: counts and net PnL, plus each event by email"""
+        counts = defaultdict(int)
+        net_pnl = 0.0
+        for kind, trade_details in events:
+            counts[kind] += 1
+            if kind != 'trade_created':
+                net_pnl += trade_details['pnl']
         
-        if user_phone:
-            self.send_sms(user_phone, message)
+        labels = {
+            'trade_created': 'opened',
+            'trade_exited': 'exited',
+            'stop_loss_hit': 'stopped out',
+            'target_hit': 'hit target'
+        }
+        summary = ", ".join(f"{count} {labels[kind]}" for kind, count in counts.items())
+        closed = len(events) - counts['trade_created']
+        message = f"{len(events)} trade updates: {summary}."
+        if closed:
+            message += f" Net PnL on exits: {round(net_pnl, 2)}"
         
-        if user_email:
-            self.send_email(user_email, "Trade Exited", message)
+        if channel == 'email':
+            lines = [NotificationService.compose(kind, trade_details)[1] for kind, trade_details in events[:DIGEST_MAX_LINES]]
+            if len(events) > DIGEST_MAX_LINES:
+                lines.append(f"...and {len(events) - DIGEST_MAX_LINES} more")
+            message += "\n\n" + "\n".join(lines)
+        return f"{len(events)} Trade Updates", message
     
-    def notify_stop_loss_hit(self, user_email, user_phone, trade_details):
-        """Notify user about stop-loss hit"""
-        message = f"Stop-loss triggered: {trade_details['symbol']} exited at {trade_details['exit_price']} with PnL: {trade_details['pnl']}"
+    def _notify(self, kind, user_email, user_phone, trade_details):
+        subject, message = self.compose(kind, trade_details)
         
         if user_phone:
             self.send_sms(user_phone, message)
         
         if user_email:
-            self.send_email(user_email, "Stop-Loss Triggered", message)
+            self.send_email(user_email, subject, message)
+    
+    def notify_trade_creation(self, user_email, user_phone, trade_details):
+        """Notify user about trade creation"""
+        self._notify('trade_created', user_email, user_phone, trade_details)
+    
+    def notify_trade_exit(self, user_email, user_phone, trade_details):
+        """Notify user about trade exit"""
+        self._notify('trade_exited', user_email, user_phone, trade_details)
+    
+    def notify_stop_loss_hit(self, user_email, user_phone, trade_details):
+        """Notify user about stop-loss hit"""
+        self._notify('stop_loss_hit', user_email, user_phone, trade_details)
     
     def notify_target_hit(self, user_email, user_phone, trade_details):
         """Notify user about target hit"""
-        message = f"Target achieved: {trade_details['symbol']} exited at {trade_details['exit_price']} with PnL: {trade_details['pnl']}"
-        
-        if user_phone:
-            self.send_sms(user_phone, message)
-        
-        if user_email:
-            self.send_email(user_email, "Target Achieved", message)
+        self._notify('target_hit', user_email, user_phone, trade_details)
 
 notification_service = NotificationService()
\ No newline at end of file
@@ -0,0 +1,60 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from eventlet import semaphore, tpool
+from eventlet.greenthread import getcurrent
+from app.config import Config
+
+class PasswordHasherBusy(Exception):
+    """Raised when no hashing slot frees up in time"""
+
+class PasswordHasher:
+    """bcrypt off the request path, with a cap on concurrent hashes.
+    
+    On a green thread of the eventlet hub a bcrypt call would block the
+    hub, and every greenlet with it, for its whole duration; it always
+    runs on eventlet's native thread pool there, monkey patched or not.
+    Callers on native threads hand it to a small pool of their own.
+    """
+    def __init__(self, rounds=12, max_concurrent=8, wait_timeout=5.0):
+        self.rounds = rounds
+        self.wait_timeout = wait_timeout
+        self.green_slots = semaphore.BoundedSemaphore(max_concurrent)
+        self.thread_slots = threading.BoundedSemaphore(max_concurrent)
+        self.pool = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix='bcrypt')
+    
+    def _run(self, fn, *args):
+        if getcurrent().parent is not None:
+            # Green threads run under the hub's greenlet; native threads have none
+            slots, execute = self.green_slots, tpool.execute
+        else:
+            slots, execute = self.thread_slots, lambda *call: self.pool.submit(*call).result()
+        
+        if not slots.acquire(timeout=self.wait_timeout):
+            raise PasswordHasherBusy('Too many concurrent password checks, try again shortly')
+        try:
+            return execute(fn, *args)
+        finally:
+            slots.release()
+    
+    def hash(self, password):
+        return self._run(
+            bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt(rounds=self.rounds)
+        ).decode('utf-8')
+    
+    def verify(self, password, password_hash):
+        return self._run(bcrypt.checkpw, password.encode('utf-8'), password_hash.encode('utf-8'))
+    
+    def needs_rehash(self, password_hash):
+        """True when the hash was made with a different cost than configured"""
+        # Hashes look like $2b$12$<salt+digest>
+        try:
+            return int(password_hash.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+password_hasher = PasswordHasher(
+    rounds=Config.BCRYPT_ROUNDS,
+    max_concurrent=Config.PASSWORD_HASH_CONCURRENCY,
+    wait_timeout=Config.PASSWORD_HASH_WAIT_TIMEOUT
+)
\ No newline at end of file
@@ -0,0 +1,271 @@
+import threading
+from collections import defaultdict
+from app import mongo_client, socketio
+from app.config import Config
+from app.models.portfolio import Portfolio
+from app.models.trade import calculate_pnl
+from app.services.event_bus import event_bus
+from app.services.market_data import market_data_service
+
+POSITION_PROJECTION = {
+    'symbol': 1,
+    'trade_type': 1,
+    'quantity': 1,
+    'entry_price': 1,
+    'margin_used': 1
+}
+
+class PortfolioStream:
+    """Live PnL for connected users, updated incrementally from ticking symbols.
+    
+    Positions are loaded from Mongo once when a user subscribes; after that
+    only the user's positions in a ticking symbol are re-marked, and opens
+    and exits arrive as trade events. Events arriving while a user loads
+    are buffered and replayed over the loaded positions. Each process
+    emits straight to the sockets it holds, so a user connected to
+    several processes never gets an update twice.
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.started = False
+        self.user_sids = defaultdict(set)
+        self.sid_users = {}
+        # client_id -> symbol -> trade_id -> position
+        self.positions = {}
+        self.symbol_users = defaultdict(set)
+        self.total_pnl = {}
+        # client_id -> trade events and latest ticks seen while the user's positions load
+        self.loading = {}
+        self.margins = {}
+        self.pending_changes = defaultdict(dict)
+        self.stale_margins = set()
+        self.messages_sent = 0
+    
+    def start(self):
+        """Start the stream once per process"""
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+        event_bus.subscribe('tick:*', self._on_tick)
+        event_bus.subscribe('trade:*', self._on_trade_event)
+        socketio.start_background_task(self._run)
+    
+    def subscribe(self, sid, client_id):
+        """Attach a socket to a user's stream and return the full snapshot"""
+        with self.lock:
+            self.user_sids[client_id].add(sid)
+            self.sid_users[sid] = client_id
+            loading = self.loading.get(client_id)
+            is_loader = client_id not in self.positions and loading is None
+            if is_loader:
+                loading = self.loading[client_id] = {'events': [], 'ticks': {}, 'done': threading.Event()}
+        
+        if is_loader:
+            try:
+                self._load_user(client_id)
+            finally:
+                with self.lock:
+                    self.loading.pop(client_id, None)
+                loading['done'].set()
+        elif loading:
+            # Another socket of the same user is loading; its snapshot is this one's too
+            loading['done'].wait(Config.PORTFOLIO_STREAM_LOAD_TIMEOUT)
+        return self._snapshot(client_id)
+    
+    def disconnect(self, sid):
+        """Detach a socket; forget the user once their last socket is gone"""
+        with self.lock:
+            client_id = self.sid_users.pop(sid, None)
+            if client_id is None:
+                return
+            self.user_sids[client_id].discard(sid)
+            if self.user_sids[client_id]:
+                return
+            
+            del self.user_sids[client_id]
+            for symbol in self.positions.pop(client_id, {}):
+                self.symbol_users[symbol].discard(client_id)
+                if not self.symbol_users[symbol]:
+                    del self.symbol_users[symbol]
+            self.total_pnl.pop(client_id, None)
+            self.margins.pop(client_id, None)
+            self.pending_changes.pop(client_id, None)
+            self.stale_margins.discard(client_id)
+    
+    def _load_user(self, client_id):
+        db = mongo_client.paper_trading
+        trades = list(db.trades.find({'user_id': client_id, 'status': 'ACTIVE'}, POSITION_PROJECTION))
+        prices = market_data_service.get_live_prices({trade['symbol'] for trade in trades})
+        portfolio = Portfolio.find_by_user_id(client_id)
+        
+        positions = defaultdict(dict)
+        for trade in trades:
+            price_data = prices.get(trade['symbol'])
+            current_price = price_data['price'] if price_data else trade['entry_price']
+            positions[trade['symbol']][str(trade['_id'])] = self._position(trade, current_price)
+        
+        with self.lock:
+            # Every socket left while loading
+            if not self.user_sids.get(client_id):
+                return
+            self.positions[client_id] = positions
+            for symbol in positions:
+                self.symbol_users[symbol].add(client_id)
+            self.total_pnl[client_id] = sum(
+                position['pnl'] for by_trade in positions.values() for position in by_trade.values()
+            )
+            self.margins[client_id] = self._margin(portfolio)
+            
+            # The reads above may predate events published meanwhile; opens and
+            # exits already seen by the read are skipped as duplicates
+            loading = self.loading[client_id]
+            for channel, trade_data in loading['events']:
+                self._apply_trade_event(client_id, channel, trade_data)
+            for symbol, current_price in loading['ticks'].items():
+                self._mark(client_id, symbol, current_price)
+    
+    @staticmethod
+    def _position(trade, current_price):
+        return {
+            'trade_id': str(trade['_id']),
+            'symbol': trade['symbol'],
+            'trade_type': trade['trade_type'],
+            'quantity': trade['quantity'],
+            'entry_price': trade['entry_price'],
+            'current_price': current_price,
+            'pnl': calculate_pnl(trade['trade_type'], trade['entry_price'], current_price, trade['quantity'])
+        }
+    
+    @staticmethod
+    def _margin(portfolio):
+        if not portfolio:
+            return None
+        total_margin = portfolio.available_margin + portfolio.utilized_margin
+        return {
+            'available_margin': portfolio.available_margin,
+            'utilized_margin': portfolio.utilized_margin,
+            'realized_pnl': portfolio.total_pnl,
+            'utilization_percentage': round(portfolio.utilized_margin / total_margin * 100, 2) if total_margin > 0 else 0
+        }
+    
+    def _snapshot(self, client_id):
+        with self.lock:
+            return {
+                'total_pnl': self.total_pnl.get(client_id, 0.0),
+                'positions': [
+                    dict(position)
+                    for by_trade in self.positions.get(client_id, {}).values()
+                    for position in by_trade.values()
+                ],
+                'margin': self.margins.get(client_id)
+            }
+    
+    def _on_tick(self, channel, tick):
+        """Re-mark only the positions in the ticking symbol"""
+        symbol = tick['symbol']
+        current_price = tick['price']
+        with self.lock:
+            for loading in self.loading.values():
+                loading['ticks'][symbol] = current_price
+            for client_id in self.symbol_users.get(symbol, ()):
+                self._mark(client_id, symbol, current_price)
+    
+    def _mark(self, client_id, symbol, current_price):
+        """Re-mark one user's positions in symbol; call with the lock held"""
+        for trade_id, position in self.positions[client_id].get(symbol, {}).items():
+            pnl = calculate_pnl(position['trade_type'], position['entry_price'], current_price, position['quantity'])
+            if pnl == position['pnl']:
+                continue
+            self.total_pnl[client_id] += pnl - position['pnl']
+            position['pnl'] = pnl
+            position['current_price'] = current_price
+            self.pending_changes[client_id][trade_id] = {
+                'trade_id': trade_id,
+                'symbol': symbol,
+                'current_price': current_price,
+                'pnl': pnl
+            }
+    
+    def _on_trade_event(self, channel, trade_data):
+        """Add opened positions and drop exited ones for streamed users"""
+        client_id = trade_data.get('user_id')
+        with self.lock:
+            if client_id in self.loading:
+                self.loading[client_id]['events'].append((channel, trade_data))
+            elif client_id in self.positions:
+                self._apply_trade_event(client_id, channel, trade_data)
+    
+    def _apply_trade_event(self, client_id, channel, trade_data):
+        """Add or drop one position of a loaded user; call with the lock held"""
+        positions = self.positions[client_id]
+        trade_id = str(trade_data['_id'])
+        symbol = trade_data['symbol']
+        if channel == 'trade:opened':
+            if trade_id in positions.get(symbol, {}):
+                return
+            position = self._position(trade_data, trade_data['entry_price'])
+            positions.setdefault(symbol, {})[trade_id] = position
+            self.symbol_users[symbol].add(client_id)
+            self.total_pnl[client_id] += position['pnl']
+            self.pending_changes[client_id][trade_id] = dict(position, status='ACTIVE')
+        elif channel == 'trade:closed':
+            position = positions.get(symbol, {}).pop(trade_id, None)
+            if position is None:
+                return
+            if not positions[symbol]:
+                del positions[symbol]
+                self.symbol_users[symbol].discard(client_id)
+                if not self.symbol_users[symbol]:
+                    del self.symbol_users[symbol]
+            self.total_pnl[client_id] -= position['pnl']
+            self.pending_changes[client_id][trade_id] = {'trade_id': trade_id, 'symbol': symbol, 'status': 'CLOSED'}
+        self.stale_margins.add(client_id)
+    
+    def _run(self):
+        """Push each user's accumulated changes every PORTFOLIO_STREAM_INTERVAL"""
+        while True:
+            try:
+                with self.lock:
+                    stale_margins, self.stale_margins = self.stale_margins, set()
+                # Margin only moves on opens and exits, so reload it just then
+                for client_id in stale_margins:
+                    margin = self._margin(Portfolio.find_by_user_id(client_id))
+                    with self.lock:
+                        if client_id in self.positions:
+                            self.margins[client_id] = margin
+                
+                with self.lock:
+                    pending, self.pending_changes = self.pending_changes, defaultdict(dict)
+                    updates = [
+                        (
+                            list(self.user_sids.get(client_id, ())),
+                            {
+                                'total_pnl': self.total_pnl.get(client_id, 0.0),
+                                'changes': list(changes.values()),
+                                'margin': self.margins.get(client_id)
+                            }
+                        )
+                        for client_id, changes in pending.items()
+                        if changes
+                    ]
+                
+                for sids, payload in updates:
+                    for sid in sids:
+                        socketio.emit('portfolio_pnl', payload, to=sid)
+                        self.messages_sent += 1
+            
+            except Exception as e:
+                print(f"Error in portfolio stream: {e}")
+            socketio.sleep(Config.PORTFOLIO_STREAM_INTERVAL)
+    
+    def stats(self):
+        with self.lock:
+            return {
+                'users': len(self.positions),
+                'sockets': len(self.sid_users),
+                'symbols': len(self.symbol_users),
+                'messages_sent': self.messages_sent
+            }
+
+portfolio_stream = PortfolioStream()
\ No newline at end of file
@@ -0,0 +1,101 @@
+import numpy as np
+from app.models.trade_rules import TradeType, TradeStatus
+
+class ColumnarPositionBook:
+    """Active positions in one symbol as parallel NumPy columns.
+    
+    Same interface as SymbolTriggerBook, but marking and trigger checks are
+    single vectorized passes over every position instead of per-trade
+    Python work. Rows are kept dense: removing a trade moves the last row
+    into its slot.
+    """
+    def __init__(self, symbol, capacity=64):
+        self.symbol = symbol
+        self.size = 0
+        self.rows = {}
+        self.trade_ids = []
+        self.trades = []
+        self.entry_price = np.empty(capacity, dtype=np.float64)
+        self.quantity = np.empty(capacity, dtype=np.float64)
+        # +1 for BUY, -1 for SELL, so PnL is side * (price - entry) * quantity
+        self.side = np.empty(capacity, dtype=np.int8)
+        # NaN where the trade has no level; NaN compares false, so it never triggers
+        self.stop_loss = np.empty(capacity, dtype=np.float64)
+        self.target_price = np.empty(capacity, dtype=np.float64)
+    
+    def _grow(self):
+        capacity = len(self.entry_price) * 2
+        for column in ('entry_price', 'quantity', 'side', 'stop_loss', 'target_price'):
+            grown = np.empty(capacity, dtype=getattr(self, column).dtype)
+            grown[:self.size] = getattr(self, column)[:self.size]
+            setattr(self, column, grown)
+    
+    def add(self, trade_data):
+        """Append an active trade document; re-adding the same trade is a no-op"""
+        trade_id = str(trade_data['_id'])
+        if trade_id in self.rows:
+            return
+        if self.size == len(self.entry_price):
+            self._grow()
+        
+        row = self.size
+        self.entry_price[row] = trade_data['entry_price']
+        self.quantity[row] = trade_data['quantity']
+        self.side[row] = 1 if TradeType(trade_data['trade_type']) == TradeType.BUY else -1
+        # Falsy levels never trigger in check_auto_exit
+        self.stop_loss[row] = trade_data.get('stop_loss') or np.nan
+        self.target_price[row] = trade_data.get('target_price') or np.nan
+        self.rows[trade_id] = row
+        self.trade_ids.append(trade_id)
+        self.trades.append(trade_data)
+        self.size += 1
+    
+    def remove(self, trade_id):
+        """Drop a trade from the book, returning its document if it was held"""
+        row = self.rows.pop(str(trade_id), None)
+        if row is None:
+            return None
+        
+        trade_data = self.trades[row]
+        last = self.size - 1
+        if row != last:
+            for column in (self.entry_price, self.quantity, self.side, self.stop_loss, self.target_price):
+                column[row] = column[last]
+            self.trade_ids[row] = self.trade_ids[last]
+            self.trades[row] = self.trades[last]
+            self.rows[self.trade_ids[row]] = row
+        self.trade_ids.pop()
+        self.trades.pop()
+        self.size = last
+        return trade_data
+    
+    def pnl(self, current_price):
+        """PnL of every position marked at current_price, in row order"""
+        size = self.size
+        return self.side[:size] * (current_price - self.entry_price[:size]) * self.quantity[:size]
+    
+    def mark(self, current_price):
+        """Total PnL of the book marked at current_price"""
+        return float(self.pnl(current_price).sum())
+    
+    def crossed(self, current_price):
+        """Return (trade_data, exit status) for every trade triggered at current_price
+        
+        A stop-loss takes priority over a target when both are crossed.
+        """
+        size = self.size
+        is_buy = self.side[:size] > 0
+        stop_loss = self.stop_loss[:size]
+        target_price = self.target_price[:size]
+        
+        stop_loss_hit = np.where(is_buy, current_price <= stop_loss, current_price >= stop_loss)
+        target_hit = np.where(is_buy, current_price >= target_price, current_price <= target_price) & ~stop_loss_hit
+        
+        return [
+            (self.trades[row], TradeStatus.STOP_LOSS_HIT) for row in np.flatnonzero(stop_loss_hit)
+        ] + [
+            (self.trades[row], TradeStatus.TARGET_HIT) for row in np.flatnonzero(target_hit)
+        ]
+    
+    def __len__(self):
+        return self.size
\ No newline at end of file
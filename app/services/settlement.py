@@ -0,0 +1,166 @@
+from collections import defaultdict
+from datetime import datetime
+from uuid import uuid4
+from bson.objectid import ObjectId
+from app import mongo_client, redis_client
+from app.models.portfolio import Portfolio
+from app.models.trade import TRADE_LIST_PROJECTION, Trade, TradeStatus, calculate_pnl
+from app.models.trade_stats import TradeStats
+from app.services.event_bus import event_bus
+from app.services.market_data import market_data_service
+from app.services.model_cache import portfolio_cache
+from app.services.notification_service import notification_service
+
+# Notification sent for each way a trade can be settled
+EXIT_NOTIFICATIONS = {
+    TradeStatus.CLOSED.value: 'trade_exited',
+    TradeStatus.STOP_LOSS_HIT.value: 'stop_loss_hit',
+    TradeStatus.TARGET_HIT.value: 'target_hit'
+}
+
+# Only the fields needed to price and settle a trade
+SETTLEMENT_PROJECTION = {
+    'user_id': 1,
+    'symbol': 1,
+    'trade_type': 1,
+    'quantity': 1,
+    'entry_price': 1,
+    'margin_used': 1
+}
+
+class SettlementService:
+    """Close batches of trades with one bulk write per collection.
+    
+    Used by exit-all, the trade monitor's auto-exits and the end-of-day
+    square-off, so every close path releases margin, updates stats and
+    announces the exit the same way.
+    """
+    def settle(self, exits):
+        """Close (trade_data, exit_price, status) exits; return the trade_data actually closed here"""
+        if not exits:
+            return []
+        
+        db = mongo_client.paper_trading
+        
+        closed_at = datetime.utcnow()
+        # Tags the trades this call closes; another batch may close some in the same millisecond
+        settlement_id = uuid4().hex
+        
+        close_ops = []
+        for trade_data, exit_price, exit_status in exits:
+            pnl = calculate_pnl(
+                trade_data['trade_type'], trade_data['entry_price'], exit_price, trade_data['quantity']
+            )
+            close_ops.append(Trade.close_op(trade_data['_id'], exit_price, exit_status, pnl, closed_at, settlement_id))
+            trade_data.update({
+                'pnl': pnl,
+                'exit_price': exit_price,
+                'current_price': exit_price,
+                'status': exit_status.value,
+                'closed_at': closed_at,
+                'updated_at': closed_at
+            })
+        
+        result = db.trades.bulk_write(close_ops, ordered=False)
+        
+        # Closes only match trades that are still active; if some were closed
+        # elsewhere meanwhile, release margin only for the ones closed here
+        if result.matched_count == len(exits):
+            closed = [trade_data for trade_data, _, _ in exits]
+        else:
+            closed_ids = {
+                doc['_id'] for doc in db.trades.find(
+                    {
+                        '_id': {'$in': [ObjectId(trade_data['_id']) for trade_data, _, _ in exits]},
+                        'settlement_id': settlement_id
+                    },
+                    {'_id': 1}
+                )
+            }
+            closed = [trade_data for trade_data, _, _ in exits if ObjectId(trade_data['_id']) in closed_ids]
+        
+        if not closed:
+            return []
+        
+        # One atomic increment per user, however many of their trades closed
+        margin_by_user = defaultdict(lambda: [0.0, 0.0])
+        for trade_data in closed:
+            print(f"Trade {trade_data['_id']} closed: {trade_data['status']}")
+            margin_by_user[trade_data['user_id']][0] += trade_data['margin_used']
+            margin_by_user[trade_data['user_id']][1] += trade_data['pnl']
+        
+        db.portfolios.bulk_write([
+            Portfolio.release_margin_op(user_id, margin_freed, pnl)
+            for user_id, (margin_freed, pnl) in margin_by_user.items()
+        ], ordered=False)
+        portfolio_cache.invalidate(*margin_by_user)
+        TradeStats.record_closes([(trade_data['user_id'], trade_data['pnl']) for trade_data in closed])
+        
+        # Let trigger books and live portfolio streams drop the closed positions
+        pipe = redis_client.pipeline(transaction=False)
+        for trade_data in closed:
+            event_bus.publish('trade:closed', {
+                '_id': str(trade_data['_id']),
+                'symbol': trade_data['symbol'],
+                'user_id': trade_data['user_id']
+            }, pipe)
+        pipe.execute()
+        
+        # Only queued here; delivery happens on the notification workers
+        for trade_data in closed:
+            notification_service.notify_user(trade_data['user_id'], EXIT_NOTIFICATIONS[trade_data['status']], {
+                'symbol': trade_data['symbol'],
+                'exit_price': trade_data['exit_price'],
+                'pnl': trade_data['pnl']
+            })
+        
+        return closed
+    
+    def close_at_market(self, trades_data, status=TradeStatus.CLOSED):
+        """Close trades at live prices, fetching each distinct symbol once.
+        
+        Trades whose symbol has no price stay open.
+        """
+        prices = market_data_service.get_live_prices({trade_data['symbol'] for trade_data in trades_data})
+        return self.settle([
+            (trade_data, prices[trade_data['symbol']]['price'], status)
+            for trade_data in trades_data
+            if trade_data['symbol'] in prices
+        ])
+    
+    def exit_all(self, user_id):
+        """Close all of a user's active trades; None if they have none"""
+        db = mongo_client.paper_trading
+        trades_data = list(db.trades.find(
+            {'user_id': user_id, 'status': TradeStatus.ACTIVE.value},
+            TRADE_LIST_PROJECTION
+        ))
+        if not trades_data:
+            return None
+        return self.close_at_market(trades_data)
+    
+    def square_off_all(self, batch_size=1000):
+        """Close every user's active trades at market, batch_size trades per settlement"""
+        db = mongo_client.paper_trading
+        cursor = db.trades.find({'status': TradeStatus.ACTIVE.value}, SETTLEMENT_PROJECTION).batch_size(batch_size)
+        
+        summary = {'active': 0, 'closed': 0, 'margin_freed': 0.0, 'pnl': 0.0}
+        batch = []
+        for trade_data in cursor:
+            batch.append(trade_data)
+            if len(batch) < batch_size:
+                continue
+            self._square_off_batch(batch, summary)
+            batch = []
+        if batch:
+            self._square_off_batch(batch, summary)
+        return summary
+    
+    def _square_off_batch(self, batch, summary):
+        closed = self.close_at_market(batch)
+        summary['active'] += len(batch)
+        summary['closed'] += len(closed)
+        summary['margin_freed'] += sum(trade_data['margin_used'] for trade_data in closed)
+        summary['pnl'] += sum(trade_data['pnl'] for trade_data in closed)
+
+settlement_service = SettlementService()
\ No newline at end of file
@@ -0,0 +1,128 @@
+import hashlib
+import threading
+import time
+from bisect import bisect
+from app import redis_client
+from app.config import Config
+from app.services.redis_scripts import RENEW_LEASE_SCRIPT, RELEASE_LEASE_SCRIPT
+
+def stable_hash(key):
+    """Process-independent 32-bit hash (Python's hash() is salted per process)"""
+    return int(hashlib.md5(key.encode('utf-8')).hexdigest()[:8], 16)
+
+class ConsistentHashRing:
+    """Hash ring mapping keys to nodes, with virtual nodes for balance"""
+    def __init__(self, nodes, replicas=64):
+        self.ring = sorted(
+            (stable_hash(f"{node}#{replica}"), node)
+            for node in nodes
+            for replica in range(replicas)
+        )
+        self.hashes = [point for point, _ in self.ring]
+    
+    def get_node(self, key):
+        if not self.ring:
+            return None
+        index = bisect(self.hashes, stable_hash(key)) % len(self.ring)
+        return self.ring[index][1]
+
+class ShardCoordinator:
+    """Partition symbols into shards and own a subset of them through Redis leases.
+    
+    Live workers heartbeat into a sorted set; each worker claims the shards
+    the consistent hash ring assigns to it. A dead worker stops renewing, so
+    its leases expire and the surviving workers pick its shards up.
+    """
+    WORKERS_KEY = 'monitor:workers'
+    
+    def __init__(self, worker_id, shard_count=None, lease_ttl=None):
+        self.worker_id = worker_id
+        self.shard_count = shard_count or Config.MONITOR_SHARDS
+        self.lease_ttl = lease_ttl or Config.MONITOR_LEASE_TTL
+        self.owned_shards = set()
+        self.valid_until = 0
+        self.on_change = None
+        self.running = False
+        self.thread = None
+    
+    def shard_for(self, symbol):
+        return stable_hash(symbol) % self.shard_count
+    
+    def owns(self, symbol):
+        """Whether this worker currently holds the lease for symbol's shard"""
+        return time.time() < self.valid_until and self.shard_for(symbol) in self.owned_shards
+    
+    def start(self):
+        """Claim shards now and keep renewing leases in the background"""
+        self.running = True
+        self.rebalance()
+        self.thread = threading.Thread(target=self._renew_loop)
+        self.thread.daemon = True
+        self.thread.start()
+    
+    def stop(self):
+        """Hand every shard back so other workers can take over immediately"""
+        self.running = False
+        pipe = redis_client.pipeline(transaction=False)
+        for shard in self.owned_shards:
+            pipe.eval(RELEASE_LEASE_SCRIPT, 1, self._lease_key(shard), self.worker_id)
+        pipe.zrem(self.WORKERS_KEY, self.worker_id)
+        pipe.execute()
+        self.owned_shards = set()
+    
+    def _lease_key(self, shard):
+        return f"monitor:lease:{shard}"
+    
+    def _renew_loop(self):
+        while self.running:
+            time.sleep(self.lease_ttl / 3)
+            try:
+                self.rebalance()
+            except Exception as e:
+                print(f"Shard lease renewal failed for {self.worker_id}: {e}")
+    
+    def rebalance(self):
+        """Heartbeat, renew held leases, release moved shards and claim new ones"""
+        started = time.time()
+        ttl_ms = int(self.lease_ttl * 1000)
+        
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.zadd(self.WORKERS_KEY, {self.worker_id: started})
+        pipe.zremrangebyscore(self.WORKERS_KEY, '-inf', started - self.lease_ttl)
+        pipe.zrange(self.WORKERS_KEY, 0, -1)
+        live_workers = [worker.decode('utf-8') for worker in pipe.execute()[2]]
+        
+        ring = ConsistentHashRing(live_workers)
+        desired = {
+            shard for shard in range(self.shard_count)
+            if ring.get_node(f"shard:{shard}") == self.worker_id
+        }
+        
+        held = sorted(self.owned_shards)
+        to_claim = sorted(desired - self.owned_shards)
+        pipe = redis_client.pipeline(transaction=False)
+        for shard in held:
+            if shard in desired:
+                pipe.eval(RENEW_LEASE_SCRIPT, 1, self._lease_key(shard), self.worker_id, ttl_ms)
+            else:
+                pipe.eval(RELEASE_LEASE_SCRIPT, 1, self._lease_key(shard), self.worker_id)
+        for shard in to_claim:
+            pipe.set(self._lease_key(shard), self.worker_id, nx=True, px=ttl_ms)
+        results = pipe.execute()
+        
+        owned = {
+            shard for shard, renewed in zip(held, results[:len(held)])
+            if shard in desired and renewed
+        }
+        owned.update(
+            shard for shard, claimed in zip(to_claim, results[len(held):])
+            if claimed
+        )
+        
+        changed = owned != self.owned_shards
+        self.owned_shards = owned
+        # Leases were set after `started`, so they hold at least this long
+        self.valid_until = started + self.lease_ttl
+        if changed and self.on_change:
+            self.on_change()
+        return changed
\ No newline at end of file
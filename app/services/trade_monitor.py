@@ -1,18 +1,78 @@
 import threading
 import time
-from app import mongo_client, redis_client
+from collections import deque
+from datetime import datetime
+from app import mongo_client
+from app.config import Config
 from app.models.trade import Trade
 from app.services.market_data import market_data_service
-from app.models.portfolio import Portfolio
+from app.services.event_bus import event_bus
+from app.services.metrics import monitor_cycle_duration, monitor_cycle_lag, monitor_tick_to_exit
+from app.services.settlement import settlement_service
+from app.services.trigger_book import create_trigger_book
+
+# Only the fields the monitor needs to mark and settle a trade
+ACTIVE_TRADE_PROJECTION = {
+    'user_id': 1,
+    'symbol': 1,
+    'trade_type': 1,
+    'quantity': 1,
+    'entry_price': 1,
+    'margin_used': 1,
+    'stop_loss': 1,
+    'target_price': 1
+}
+
+class LatencyTracker:
+    """Rolling window of latency samples in seconds"""
+    def __init__(self, size=1000):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+    
+    def record(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+    
+    def snapshot(self):
+        if not self.samples:
+            return {'count': self.count}
+        
+        ordered = sorted(self.samples)
+        return {
+            'count': self.count,
+            'last_ms': round(self.samples[-1] * 1000, 2),
+            'avg_ms': round(sum(ordered) / len(ordered) * 1000, 2),
+            'p50_ms': round(ordered[len(ordered) // 2] * 1000, 2),
+            'p99_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 2),
+            'max_ms': round(ordered[-1] * 1000, 2)
+        }
 
 class TradeMonitor:
-    def __init__(self):
+    def __init__(self, coordinator=None):
         self.running = False
         self.monitor_thread = None
+        self.last_cycle = None
+        self.last_cycle_at = None
+        self.last_tick_at = None
+        self.trigger_books = {}
+        self.books_loaded_at = None
+        self.lock = threading.RLock()
+        self.pending_ticks = {}
+        self.tick_event = threading.Event()
+        self.exit_latency = LatencyTracker()
+        self.snapshot_at = 0
+        # With a coordinator, only symbols in shards this worker leases are monitored
+        self.coordinator = coordinator
+        if coordinator:
+            coordinator.on_change = self._on_shards_changed
     
     def start_monitoring(self):
         """Start background thread for monitoring trades"""
+        self.load_trigger_books()
         self.running = True
+        event_bus.subscribe('trade:*', self._on_trade_event)
+        if Config.MONITOR_MODE == 'push':
+            event_bus.subscribe('tick:*', self._on_tick)
         self.monitor_thread = threading.Thread(target=self._monitor_loop)
         self.monitor_thread.daemon = True
         self.monitor_thread.start()
@@ -21,46 +81,245 @@ class TradeMonitor:
     def stop_monitoring(self):
         """Stop the monitoring thread"""
         self.running = False
+        self.tick_event.set()
         if self.monitor_thread:
             self.monitor_thread.join()
         print("Trade monitoring stopped")
     
     def _monitor_loop(self):
-        """Main monitoring loop"""
+        """Main monitoring loop: react to ticks, scan all trades on a fixed cadence"""
+        last_due = None
         while self.running:
             try:
-                self._check_active_trades()
-                time.sleep(5)  # Check every 5 seconds
+                now = time.time()
+                # Recomputed every pass, so a feed going quiet shortens the wait at once
+                due_at = now if last_due is None else last_due + self._scan_interval()
+                if now >= due_at or self.books_loaded_at is None:
+                    if now >= due_at:
+                        if last_due is not None:
+                            # Against the schedule, not the last scan's end, so overrunning scans show as lag
+                            monitor_cycle_lag.observe(now - due_at)
+                        # A whole interval behind restarts the cadence instead of scanning back to back
+                        last_due = due_at if now - due_at < self._scan_interval() else now
+                    self._check_active_trades()
+                    due_at = last_due + self._scan_interval()
+                
+                # Wake at least every poll interval to notice the feed stopping
+                if self.tick_event.wait(max(0, min(due_at - time.time(), Config.MONITOR_POLL_INTERVAL))):
+                    self.tick_event.clear()
+                    self._process_ticks()
             except Exception as e:
                 print(f"Error in trade monitoring: {e}")
                 time.sleep(10)
     
+    def _scan_interval(self):
+        """Full scans are only a safety net while pushed ticks are actually flowing"""
+        ticks_flowing = self.last_tick_at is not None and \
+            time.time() - self.last_tick_at <= Config.MONITOR_TICK_STALE_AFTER
+        if Config.MONITOR_MODE == 'push' and event_bus.connected and ticks_flowing:
+            return Config.MONITOR_SWEEP_INTERVAL
+        return Config.MONITOR_POLL_INTERVAL
+    
+    def _owns(self, symbol):
+        return self.coordinator is None or self.coordinator.owns(symbol)
+    
+    def _on_shards_changed(self):
+        """Reload the books on the next loop pass after shard ownership moved"""
+        self.books_loaded_at = None
+        self.tick_event.set()
+    
+    def _on_tick(self, channel, tick):
+        """Queue a published tick; only the latest price per symbol is kept"""
+        # Any tick shows the feed is alive, even for a symbol nobody holds
+        self.last_tick_at = time.time()
+        with self.lock:
+            if not self.trigger_books.get(tick['symbol']):
+                return
+            self.pending_ticks[tick['symbol']] = tick
+        self.tick_event.set()
+    
+    def _process_ticks(self):
+        """Mark and check only the symbols that ticked since the last pass"""
+        with self.lock:
+            ticks, self.pending_ticks = self.pending_ticks, {}
+            exits = []
+            for symbol, tick in ticks.items():
+                trigger_book = self.trigger_books.get(symbol)
+                if trigger_book and self._owns(symbol):
+                    exits.extend(
+                        (trade_data, tick['price'], exit_status)
+                        for trade_data, exit_status in trigger_book.crossed(tick['price'])
+                    )
+        
+        if not ticks:
+            return
+        
+        # With snapshots on an interval, marks are written by the scan cycle instead
+        if Config.MTM_SNAPSHOT_INTERVAL <= 0:
+            db = mongo_client.paper_trading
+            db.trades.bulk_write([
+                Trade.mark_to_market_op(symbol, tick['price']) for symbol, tick in ticks.items()
+            ], ordered=False)
+        
+        closed = self._settle_exits(exits)
+        
+        exited_at = time.time()
+        for trade_data in closed:
+            published_at = ticks[trade_data['symbol']].get('published_at')
+            if published_at:
+                self.exit_latency.record(exited_at - published_at)
+                monitor_tick_to_exit.observe(exited_at - published_at)
+    
+    def tracked_trades(self):
+        """Active trades held in the trigger books"""
+        return sum(len(book) for book in list(self.trigger_books.values()))
+    
+    def get_stats(self):
+        """Monitor state and tick-to-exit latency"""
+        return {
+            'running': self.running,
+            'mode': Config.MONITOR_MODE,
+            'worker_id': self.coordinator.worker_id if self.coordinator else None,
+            'owned_shards': len(self.coordinator.owned_shards) if self.coordinator else None,
+            'push_connected': event_bus.connected,
+            'tracked_trades': self.tracked_trades(),
+            'last_cycle': self.last_cycle,
+            'tick_to_exit_latency': self.exit_latency.snapshot()
+        }
+    
+    def load_trigger_books(self):
+        """Rebuild the per-symbol trigger books from the active trades in Mongo"""
+        db = mongo_client.paper_trading
+        query = {'status': 'ACTIVE'}
+        if self.coordinator:
+            query['symbol'] = {'$in': [
+                symbol for symbol in db.trades.distinct('symbol', {'status': 'ACTIVE'})
+                if self.coordinator.owns(symbol)
+            ]}
+        
+        trigger_books = {}
+        for trade_data in db.trades.find(query, ACTIVE_TRADE_PROJECTION):
+            symbol = trade_data['symbol']
+            if symbol not in trigger_books:
+                trigger_books[symbol] = create_trigger_book(symbol)
+            trigger_books[symbol].add(trade_data)
+        
+        with self.lock:
+            self.trigger_books = trigger_books
+            self.books_loaded_at = time.time()
+    
+    def track_trade(self, trade):
+        """Announce a newly created trade to the monitor owning its symbol"""
+        trade_data = {
+            '_id': trade.trade_id,
+            'user_id': trade.user_id,
+            'symbol': trade.symbol,
+            'trade_type': trade.trade_type.value,
+            'quantity': trade.quantity,
+            'entry_price': trade.entry_price,
+            'margin_used': trade.margin_used,
+            'stop_loss': trade.stop_loss,
+            'target_price': trade.target_price
+        }
+        event_bus.publish('trade:opened', trade_data)
+    
+    def untrack_trade(self, trade_id, symbol, user_id=None):
+        """Announce a manually exited trade to the monitor owning its symbol"""
+        event_bus.publish('trade:closed', {'_id': str(trade_id), 'symbol': symbol, 'user_id': user_id})
+    
+    def _on_trade_event(self, channel, trade_data):
+        """Keep the trigger books in step with trades opened or exited elsewhere"""
+        if not self._owns(trade_data['symbol']):
+            return
+        
+        if channel == 'trade:opened':
+            with self.lock:
+                if trade_data['symbol'] not in self.trigger_books:
+                    self.trigger_books[trade_data['symbol']] = create_trigger_book(trade_data['symbol'])
+                self.trigger_books[trade_data['symbol']].add(trade_data)
+        elif channel == 'trade:closed':
+            self._remove_from_book(trade_data['_id'], trade_data['symbol'])
+    
+    def _remove_from_book(self, trade_id, symbol):
+        with self.lock:
+            trigger_book = self.trigger_books.get(symbol)
+            if trigger_book:
+                trigger_book.remove(trade_id)
+    
     def _check_active_trades(self):
-        """Check all active trades for auto-exit conditions"""
+        """Check all active trades for auto-exit conditions in one batched cycle"""
+        started = time.perf_counter()
         db = mongo_client.paper_trading
-        active_trades = db.trades.find({'status': 'ACTIVE'})
         
-        for trade_data in active_trades:
+        # Periodically reload so trades opened or closed elsewhere are picked up
+        if self.books_loaded_at is None or time.time() - self.books_loaded_at >= Config.MONITOR_RESYNC_INTERVAL:
+            self.load_trigger_books()
+        
+        with self.lock:
+            trade_counts = {symbol: len(book) for symbol, book in self.trigger_books.items() if book}
+        
+        # One round trip for every owned symbol's price
+        prices = market_data_service.get_live_prices([
+            symbol for symbol in trade_counts if self._owns(symbol)
+        ])
+        
+        # Reads derive live PnL from the price cache, so stored marks are only snapshots
+        write_snapshot = time.time() - self.snapshot_at >= Config.MTM_SNAPSHOT_INTERVAL
+        mark_ops = []
+        exits = []
+        for symbol, current_price_data in prices.items():
             try:
-                trade = Trade.from_dict(trade_data)
-                current_price_data = market_data_service.get_live_price(trade.symbol)
+                current_price = current_price_data['price']
+                if write_snapshot:
+                    mark_ops.append(Trade.mark_to_market_op(symbol, current_price))
                 
-                if current_price_data:
-                    current_price = current_price_data['price']
-                    
-                    # Update current price and PnL
-                    trade.update_price(current_price)
-                    
-                    # Check for auto-exit conditions
-                    if trade.check_auto_exit(current_price):
-                        print(f"Trade {trade.trade_id} auto-closed: {trade.status.value}")
-                        
-                        # Update portfolio margin
-                        portfolio = Portfolio.find_by_user_id(trade.user_id)
-                        if portfolio:
-                            portfolio.update_margin(-trade.margin_used, trade.pnl)
-                            
+                # Only trades whose stop-loss or target was crossed are touched
+                with self.lock:
+                    trigger_book = self.trigger_books[symbol]
+                    crossed = trigger_book.crossed(current_price)
+                exits.extend((trade_data, current_price, exit_status) for trade_data, exit_status in crossed)
+            
             except Exception as e:
-                print(f"Error monitoring trade {trade_data.get('_id')}: {e}")
+                print(f"Error monitoring symbol {symbol}: {e}")
+        
+        if mark_ops:
+            db.trades.bulk_write(mark_ops, ordered=False)
+        if write_snapshot:
+            self.snapshot_at = time.time()
+        
+        closed = self._settle_exits(exits)
+        
+        duration = time.perf_counter() - started
+        monitor_cycle_duration.observe(duration)
+        self.last_cycle_at = time.time()
+        self.last_cycle = {
+            'trades': sum(trade_counts.values()),
+            'symbols': len(trade_counts),
+            'exits': len(closed),
+            'snapshot_written': bool(mark_ops),
+            'duration_ms': round(duration * 1000, 2),
+            'finished_at': datetime.utcnow().isoformat()
+        }
+        print(
+            f"Monitor cycle: {self.last_cycle['trades']} trades, {self.last_cycle['symbols']} symbols, "
+            f"{self.last_cycle['exits']} exits in {self.last_cycle['duration_ms']} ms"
+        )
+        return self.last_cycle
+    
+    def _settle_exits(self, exits):
+        """Close triggered trades and release their margin in bulk"""
+        if not exits:
+            return []
+        
+        # Whether closed here or elsewhere, these trades are no longer active
+        for trade_data, _, _ in exits:
+            self._remove_from_book(trade_data['_id'], trade_data['symbol'])
+        
+        # Lease fencing: never settle a symbol whose shard lease has lapsed
+        exits = [pending for pending in exits if self._owns(pending[0]['symbol'])]
+        if not exits:
+            return []
+        
+        return settlement_service.settle(exits)
 
 trade_monitor = TradeMonitor()
\ No newline at end of file
@@ -0,0 +1,111 @@
+from bisect import bisect_left, bisect_right
+from app.config import Config
+from app.models.trade_rules import TradeType, TradeStatus, calculate_pnl
+
+class _LevelIndex:
+    """Sorted price levels with the trade ids resting at each level"""
+    def __init__(self):
+        self.levels = []
+        self.trade_ids = []
+    
+    def add(self, level, trade_id):
+        index = bisect_right(self.levels, level)
+        self.levels.insert(index, level)
+        self.trade_ids.insert(index, trade_id)
+    
+    def remove(self, level, trade_id):
+        index = bisect_left(self.levels, level)
+        while index < len(self.levels) and self.levels[index] == level:
+            if self.trade_ids[index] == trade_id:
+                del self.levels[index]
+                del self.trade_ids[index]
+                return
+            index += 1
+    
+    def at_or_below(self, price):
+        """Trade ids with level <= price"""
+        return self.trade_ids[:bisect_right(self.levels, price)]
+    
+    def at_or_above(self, price):
+        """Trade ids with level >= price"""
+        return self.trade_ids[bisect_left(self.levels, price):]
+    
+    def __len__(self):
+        return len(self.levels)
+
+class SymbolTriggerBook:
+    """Stop-loss and target levels of the active trades in one symbol"""
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.trades = {}
+        self.buy_stop_loss = _LevelIndex()
+        self.buy_target = _LevelIndex()
+        self.sell_stop_loss = _LevelIndex()
+        self.sell_target = _LevelIndex()
+    
+    def _indexes(self, trade_type):
+        if TradeType(trade_type) == TradeType.BUY:
+            return self.buy_stop_loss, self.buy_target
+        return self.sell_stop_loss, self.sell_target
+    
+    def add(self, trade_data):
+        """Index an active trade document; re-adding the same trade is a no-op"""
+        trade_id = str(trade_data['_id'])
+        if trade_id in self.trades:
+            return
+        
+        self.trades[trade_id] = trade_data
+        stop_loss_index, target_index = self._indexes(trade_data['trade_type'])
+        # Falsy levels never trigger in check_auto_exit, so they are not indexed
+        if trade_data.get('stop_loss'):
+            stop_loss_index.add(trade_data['stop_loss'], trade_id)
+        if trade_data.get('target_price'):
+            target_index.add(trade_data['target_price'], trade_id)
+    
+    def remove(self, trade_id):
+        """Drop a trade from the book, returning its document if it was indexed"""
+        trade_data = self.trades.pop(str(trade_id), None)
+        if not trade_data:
+            return None
+        
+        stop_loss_index, target_index = self._indexes(trade_data['trade_type'])
+        if trade_data.get('stop_loss'):
+            stop_loss_index.remove(trade_data['stop_loss'], str(trade_id))
+        if trade_data.get('target_price'):
+            target_index.remove(trade_data['target_price'], str(trade_id))
+        return trade_data
+    
+    def crossed(self, current_price):
+        """Return (trade_data, exit status) for every trade triggered at current_price
+        
+        Mirrors Trade.check_auto_exit: a stop-loss takes priority over a
+        target when both are crossed by the same price.
+        """
+        triggered = {}
+        for trade_id in self.buy_stop_loss.at_or_above(current_price):
+            triggered[trade_id] = TradeStatus.STOP_LOSS_HIT
+        for trade_id in self.sell_stop_loss.at_or_below(current_price):
+            triggered[trade_id] = TradeStatus.STOP_LOSS_HIT
+        for trade_id in self.buy_target.at_or_below(current_price):
+            triggered.setdefault(trade_id, TradeStatus.TARGET_HIT)
+        for trade_id in self.sell_target.at_or_above(current_price):
+            triggered.setdefault(trade_id, TradeStatus.TARGET_HIT)
+        
+        return [(self.trades[trade_id], status) for trade_id, status in triggered.items()]
+    
+    def mark(self, current_price):
+        """Total PnL of the book marked at current_price"""
+        return sum(
+            calculate_pnl(trade_data['trade_type'], trade_data['entry_price'], current_price, trade_data['quantity'])
+            for trade_data in self.trades.values()
+        )
+    
+    def __len__(self):
+        return len(self.trades)
+
+def create_trigger_book(symbol):
+    """Book implementation selected by Config.MONITOR_BOOK"""
+    if Config.MONITOR_BOOK == 'columnar':
+        from app.services.position_book import ColumnarPositionBook
+        return ColumnarPositionBook(symbol)
+    return SymbolTriggerBook(symbol)
\ No newline at end of file
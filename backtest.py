@@ -0,0 +1,82 @@
+import argparse
+import csv
+import json
+import random
+import sys
+
+FILL_FIELDS = ['symbol', 'trade_type', 'quantity', 'entry_time', 'entry_price', 'stop_loss', 'target_price',
+               'status', 'exit_time', 'exit_price', 'pnl']
+
+def load_positions(path):
+    """Positions from an NDJSON file, one position dict per line"""
+    with open(path) as positions_file:
+        return [json.loads(line) for line in positions_file if line.strip()]
+
+def random_positions(tick_file, count, stop_loss_pct, target_pct, seed):
+    """Positions on random symbols opened at random ticks, with levels a fixed % from entry"""
+    rng = random.Random(seed)
+    symbols = [symbol for symbol, (_, ticks) in tick_file.symbols.items() if ticks]
+    positions = []
+    for _ in range(count):
+        symbol = rng.choice(symbols)
+        timestamps, prices = tick_file.ticks(symbol)
+        tick = rng.randrange(len(timestamps))
+        entry_price = float(prices[tick])
+        direction = 1 if rng.random() < 0.5 else -1
+        positions.append({
+            'symbol': symbol,
+            'trade_type': 'BUY' if direction > 0 else 'SELL',
+            'quantity': rng.randint(1, 100),
+            'entry_time': float(timestamps[tick]),
+            'entry_price': entry_price,
+            'stop_loss': round(entry_price * (1 - direction * stop_loss_pct / 100), 2) if stop_loss_pct else None,
+            'target_price': round(entry_price * (1 + direction * target_pct / 100), 2) if target_pct else None
+        })
+    return positions
+
+def write_fills(path, fills):
+    with open(path, 'w', newline='') as fills_file:
+        writer = csv.DictWriter(fills_file, fieldnames=FILL_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(fills)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Backtest stop-loss and target exits over recorded ticks')
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    convert_parser = commands.add_parser('convert', help='Convert a CSV or NDJSON tick recording to a tick file')
+    convert_parser.add_argument('source', help='CSV (symbol,price,timestamp) or .ndjson recording')
+    convert_parser.add_argument('output', help='Tick file to write')
+    
+    run_parser = commands.add_parser('run', help='Replay a tick file against positions')
+    run_parser.add_argument('ticks', help='Tick file written by convert')
+    run_parser.add_argument('--positions-file', help='NDJSON positions; random positions are generated otherwise')
+    run_parser.add_argument('--positions', type=int, default=10000, help='Random positions to generate')
+    run_parser.add_argument('--stop-loss-pct', type=float, default=1.0, help='Random positions: stop distance from entry')
+    run_parser.add_argument('--target-pct', type=float, default=2.0, help='Random positions: target distance from entry')
+    run_parser.add_argument('--seed', type=int, default=42)
+    run_parser.add_argument('--fills', help='Write every fill to this CSV')
+    run_parser.add_argument('--report', help='Write the PnL report to this JSON file')
+    args = parser.parse_args()
+    
+    # The engine only needs NumPy and the trade rules, not the app's databases
+    from app.services.backtest import TickFile, convert_ticks, run_backtest
+    
+    if args.command == 'convert':
+        count = convert_ticks(args.source, args.output)
+        print(f"Wrote {count} ticks to {args.output}")
+        sys.exit(0)
+    
+    tick_file = TickFile(args.ticks)
+    if args.positions_file:
+        positions = load_positions(args.positions_file)
+    else:
+        positions = random_positions(tick_file, args.positions, args.stop_loss_pct, args.target_pct, args.seed)
+    
+    fills, report = run_backtest(tick_file, positions)
+    if args.fills:
+        write_fills(args.fills, fills)
+    if args.report:
+        with open(args.report, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+    print(json.dumps(report, indent=2))
\ No newline at end of file
@@ -0,0 +1,354 @@
+"""Latency and throughput of the order, monitor, analytics and quote hot paths.
+
+    python benchmarks/hot_paths.py --users 1000 --trades 50000 --symbols 50 --output run.json
+    python benchmarks/hot_paths.py --baseline run.json --threshold 0.2
+
+Runs offline. The default backend is in-process fakes (mongomock and
+fakeredis with Lua support, installed separately); --backend local uses a local mongod and
+redis instead and WIPES their paper_trading data. Fakes are much slower
+than the real servers, so only compare runs made on the same backend.
+
+Paths measured, each with p50/p99 latency and throughput:
+
+  get_live_price_warm   quote served from the in-process cache
+  get_live_price_cold   quote fetched from the provider and stored
+  create_trade          POST /trades/create, JWT and all
+  trade_performance     GET /trades/performance/<user_id>
+  monitor_cycle         one TradeMonitor._check_active_trades pass
+
+With --baseline, each p50 and throughput is compared with the baseline
+run and the exit status is 1 when any is worse by more than --threshold.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Metrics where a higher value is a regression; the rest regress when lower
+LOWER_IS_BETTER = ('p50_ms', 'p99_ms', 'mean_ms', 'max_ms')
+
+def configure_environment(args):
+    """Settings read when app.config is first imported"""
+    os.environ['MARKET_DATA_PROVIDER'] = 'synthetic'
+    os.environ['SYNTHETIC_SYMBOLS'] = ','.join(symbol_names(args.symbols))
+    os.environ['SYNTHETIC_SEED'] = str(args.seed)
+    # Keep notification digests from being delivered (and printed) mid-run
+    os.environ.setdefault('NOTIFICATION_BACKEND', 'log')
+    os.environ.setdefault('NOTIFICATION_COALESCE_WINDOW', '3600')
+
+def symbol_names(count):
+    return [f"SYM{index:03d}" for index in range(count)]
+
+def connect(args):
+    """Point the app's clients at the chosen backend before any model is imported"""
+    import app
+    if args.backend == 'fake':
+        try:
+            import fakeredis
+            import mongomock
+        except ImportError:
+            sys.exit('The fake backend needs mongomock and fakeredis: pip install mongomock "fakeredis[lua]"')
+        app.mongo_client = mongomock.MongoClient()
+        app.redis_client = fakeredis.FakeRedis()
+        return
+    
+    import redis
+    from pymongo import MongoClient
+    app.mongo_client = MongoClient(args.mongo_uri)
+    app.redis_client = redis.from_url(args.redis_url)
+    if app.mongo_client.paper_trading.users.estimated_document_count() and not args.drop_existing:
+        sys.exit('paper_trading already has data; pass --drop-existing to let the benchmark wipe it')
+
+def build_fixtures(args):
+    """N users with portfolios and stats, M trades across K symbols, about a third still open"""
+    import app
+    from app.migrations import MIGRATIONS, run_migrations
+    from app.models.trade_stats import TradeStats
+    
+    app.mongo_client.drop_database('paper_trading')
+    app.redis_client.flushdb()
+    db = app.mongo_client.paper_trading
+    if args.backend == 'fake':
+        # mongomock has indexes but no time-series collections
+        MIGRATIONS[0][2](db)
+    else:
+        run_migrations(db)
+    
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    user_ids = [f"BENCH{index:06d}" for index in range(args.users)]
+    symbols = symbol_names(args.symbols)
+    
+    trades = []
+    utilized = dict.fromkeys(user_ids, 0.0)
+    for index in range(args.trades):
+        user_id = user_ids[index % len(user_ids)]
+        trade_type = rng.choice(('BUY', 'SELL'))
+        direction = 1 if trade_type == 'BUY' else -1
+        # Synthetic quotes start at 1000 for these symbols
+        entry_price = round(1000 * rng.uniform(0.98, 1.02), 2)
+        quantity = rng.randint(1, 50)
+        created_at = now - timedelta(minutes=rng.randint(1, 60 * 24 * 90))
+        trade = {
+            'user_id': user_id,
+            'symbol': rng.choice(symbols),
+            'trade_type': trade_type,
+            'quantity': quantity,
+            'entry_price': entry_price,
+            'margin_used': entry_price * quantity,
+            'stop_loss': round(entry_price * (1 - direction * rng.uniform(0.01, 0.05)), 2) if rng.random() < 0.7 else None,
+            'target_price': round(entry_price * (1 + direction * rng.uniform(0.01, 0.05)), 2) if rng.random() < 0.7 else None,
+            'current_price': entry_price,
+            'pnl': 0.0,
+            'status': 'ACTIVE',
+            'created_at': created_at,
+            'updated_at': created_at,
+            'closed_at': None,
+            'exit_price': None
+        }
+        if rng.random() < 0.65:
+            exit_price = round(entry_price * rng.uniform(0.95, 1.05), 2)
+            trade.update(
+                status=rng.choice(('CLOSED', 'STOP_LOSS_HIT', 'TARGET_HIT')),
+                exit_price=exit_price,
+                current_price=exit_price,
+                pnl=round(direction * (exit_price - entry_price) * quantity, 2),
+                closed_at=created_at + timedelta(minutes=rng.randint(1, 600))
+            )
+        else:
+            utilized[user_id] += trade['margin_used']
+        trades.append(trade)
+    
+    for start in range(0, len(trades), 10000):
+        db.trades.insert_many(trades[start:start + 10000], ordered=False)
+    db.users.insert_many([
+        {
+            'client_id': user_id,
+            'name': f"Bench User {index}",
+            'email': f"{user_id.lower()}@bench.invalid",
+            'phone': f"+9190000{index:05d}",
+            # Never verified here; bcrypt cost would dominate fixture setup
+            'password_hash': '$2b$04$benchmarkbenchmarkbenchmarkbenchmarkbenchmarkbenchm',
+            'created_at': now
+        }
+        for index, user_id in enumerate(user_ids)
+    ])
+    db.portfolios.insert_many([
+        {
+            'user_id': user_id,
+            'available_margin': 10000000.0,
+            'utilized_margin': utilized[user_id],
+            'total_pnl': 0.0,
+            'created_at': now,
+            'updated_at': now
+        }
+        for user_id in user_ids
+    ])
+    TradeStats.rebuild()
+    return user_ids, symbols
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def measure(op, iterations, warmup, setup=None):
+    """Time op() iterations times after warmup untimed calls; setup() runs untimed before each"""
+    for _ in range(warmup):
+        if setup:
+            setup()
+        op()
+    
+    timings = []
+    errors = 0
+    for _ in range(iterations):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        ok = op()
+        timings.append(time.perf_counter() - started)
+        if ok is False:
+            errors += 1
+    
+    ordered = sorted(timings)
+    total = sum(timings)
+    return {
+        'ops': iterations,
+        'errors': errors,
+        'throughput_ops_s': round(iterations / total, 2) if total > 0 else None,
+        'p50_ms': round(percentile(ordered, 0.5) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+        'mean_ms': round(total / iterations * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3)
+    }
+
+def run_benchmarks(args, user_ids, symbols):
+    from flask import Flask
+    from flask_jwt_extended import JWTManager, create_access_token
+    from app import redis_client
+    from app.routes.trades import trades_bp
+    from app.services.market_data import market_data_service
+    from app.services.trade_monitor import TradeMonitor
+    
+    # Just the blueprint under test, without create_app's Socket.IO and database setup
+    bench_app = Flask(__name__)
+    bench_app.config['JWT_SECRET_KEY'] = 'benchmark-only-signing-key-of-32-bytes-or-more'
+    JWTManager(bench_app)
+    bench_app.register_blueprint(trades_bp, url_prefix='/trades')
+    client = bench_app.test_client()
+    with bench_app.app_context():
+        headers = {
+            user_id: {'Authorization': f"Bearer {create_access_token(identity=user_id)}"}
+            for user_id in user_ids
+        }
+    
+    rng = random.Random(args.seed)
+    
+    def get_live_price():
+        return market_data_service.get_live_price(rng.choice(symbols)) is not None
+    
+    evicted = []
+    
+    def evict_quote():
+        symbol = rng.choice(symbols)
+        market_data_service.local_cache.invalidate(symbol)
+        redis_client.delete(f"price:{symbol}")
+        evicted.append(symbol)
+    
+    def get_evicted_price():
+        return market_data_service.get_live_price(evicted.pop()) is not None
+    
+    def create_trade():
+        direction = rng.choice((1, -1))
+        response = client.post('/trades/create', headers=headers[rng.choice(user_ids)], json={
+            'symbol': rng.choice(symbols),
+            'trade_type': 'BUY' if direction > 0 else 'SELL',
+            'quantity': rng.randint(1, 50),
+            'stop_loss': round(1000 * (1 - direction * 0.03), 2),
+            'target_price': round(1000 * (1 + direction * 0.03), 2)
+        })
+        return response.status_code == 201
+    
+    def trade_performance():
+        user_id = rng.choice(user_ids)
+        return client.get(f"/trades/performance/{user_id}", headers=headers[user_id]).status_code == 200
+    
+    monitor = TradeMonitor()
+    
+    def monitor_cycle():
+        monitor._check_active_trades()
+    
+    benchmarks = {
+        'get_live_price_warm': (get_live_price, args.iterations, None),
+        'get_live_price_cold': (get_evicted_price, args.iterations, evict_quote),
+        'create_trade': (create_trade, args.iterations, None),
+        'trade_performance': (trade_performance, args.iterations, None),
+        'monitor_cycle': (monitor_cycle, args.cycles, None)
+    }
+    
+    results = {}
+    for name, (op, iterations, setup) in benchmarks.items():
+        if args.only and name not in args.only:
+            continue
+        # The app logs with print(); keep it out of the report unless asked for
+        output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with output:
+            results[name] = measure(op, iterations, args.warmup, setup)
+        if name == 'monitor_cycle' and monitor.last_cycle:
+            results[name]['trades_per_cycle'] = monitor.last_cycle['trades']
+            results[name]['trades_per_s'] = round(monitor.last_cycle['trades'] * results[name]['throughput_ops_s'], 2)
+        print_result(name, results[name])
+    return results
+
+def print_result(name, result):
+    print(
+        f"{name:>20} {result['ops']:>7} {result['errors']:>6} {result['throughput_ops_s']:>12.1f} "
+        f"{result['p50_ms']:>9.3f} {result['p99_ms']:>9.3f}"
+    )
+
+def compare(results, baseline, metrics, threshold):
+    """Return (name, metric, baseline, current, change) for every metric worse than threshold"""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline['results'].get(name)
+        if not previous:
+            continue
+        for metric in metrics:
+            if not previous.get(metric) or result.get(metric) is None:
+                continue
+            change = (result[metric] - previous[metric]) / previous[metric]
+            worse = change > threshold if metric in LOWER_IS_BETTER else change < -threshold
+            if worse:
+                regressions.append((name, metric, previous[metric], result[metric], change))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', choices=['fake', 'local'], default='fake')
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017')
+    parser.add_argument('--redis-url', default='redis://localhost:6379/15')
+    parser.add_argument('--drop-existing', action='store_true', help='allow wiping an existing paper_trading database')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--trades', type=int, default=20000)
+    parser.add_argument('--symbols', type=int, default=50)
+    parser.add_argument('--iterations', type=int, default=1000, help='timed calls per request path')
+    parser.add_argument('--cycles', type=int, default=20, help='timed monitor cycles')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--only', nargs='+', help='run only these benchmarks')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='results JSON from an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed fractional slowdown, 0.2 = 20%%')
+    parser.add_argument('--metrics', nargs='+', default=['p50_ms', 'throughput_ops_s'], help='metrics compared')
+    parser.add_argument('--verbose', action='store_true', help="show the app's own log output")
+    args = parser.parse_args()
+    
+    configure_environment(args)
+    connect(args)
+    started = time.perf_counter()
+    user_ids, symbols = build_fixtures(args)
+    print(f"Fixtures: {args.users} users, {args.trades} trades, {args.symbols} symbols "
+          f"in {time.perf_counter() - started:.1f}s on the {args.backend} backend")
+    
+    print(f"{'benchmark':>20} {'ops':>7} {'errors':>6} {'ops/s':>12} {'p50 ms':>9} {'p99 ms':>9}")
+    report = {
+        'meta': {
+            'backend': args.backend,
+            'users': args.users,
+            'trades': args.trades,
+            'symbols': args.symbols,
+            'iterations': args.iterations,
+            'cycles': args.cycles,
+            'seed': args.seed,
+            'python': platform.python_version(),
+            'machine': platform.node(),
+            'finished_at': None
+        },
+        'results': run_benchmarks(args, user_ids, symbols)
+    }
+    report['meta']['finished_at'] = datetime.utcnow().isoformat()
+    
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+    
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline['meta']['backend'] != args.backend:
+            print(f"Warning: baseline ran on the {baseline['meta']['backend']} backend")
+        regressions = compare(report['results'], baseline, args.metrics, args.threshold)
+        for name, metric, previous, current, change in regressions:
+            print(f"REGRESSION {name} {metric}: {previous} -> {current} ({change:+.1%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,165 @@
+"""Compare per-cycle cost of the monitor's position representations.
+
+    python benchmarks/position_book_benchmark.py --sizes 10000 100000 1000000
+
+For each size it builds the same random positions three ways and times
+one monitor cycle (mark every position and find triggered exits) at a
+fresh price per symbol:
+
+  objects   one Trade per document, PnL and exit checked per trade
+  levels    SymbolTriggerBook: sorted trigger levels, PnL per trade
+  columnar  ColumnarPositionBook: NumPy columns, vectorized
+
+Memory is what tracemalloc sees allocated while building the structure.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+
+# Positions live in memory only; the models just need the clients bound to import
+app.mongo_client = None
+app.redis_client = None
+
+from app.models.trade import Trade, evaluate_auto_exit, calculate_pnl
+from app.services.position_book import ColumnarPositionBook
+from app.services.trigger_book import SymbolTriggerBook
+
+def generate_positions(count, base_prices, seed):
+    """Positions entered within 5% of their symbol's base price, with levels 1-5% from entry"""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    symbols = list(base_prices)
+    positions = []
+    for index in range(count):
+        symbol = symbols[index % len(symbols)]
+        entry_price = base_prices[symbol] * rng.uniform(0.95, 1.05)
+        trade_type = rng.choice(('BUY', 'SELL'))
+        # Stop below and target above a long entry, the other way round for a short
+        direction = 1 if trade_type == 'BUY' else -1
+        positions.append({
+            '_id': f"{index:024x}",
+            'user_id': f"user{index % 1000}",
+            'symbol': symbol,
+            'trade_type': trade_type,
+            'quantity': rng.randint(1, 100),
+            'entry_price': entry_price,
+            'margin_used': entry_price,
+            'stop_loss': entry_price * (1 - direction * rng.uniform(0.01, 0.05)) if rng.random() < 0.7 else None,
+            'target_price': entry_price * (1 + direction * rng.uniform(0.01, 0.05)) if rng.random() < 0.7 else None,
+            'current_price': entry_price,
+            'pnl': 0.0,
+            'status': 'ACTIVE',
+            'created_at': now,
+            'updated_at': now
+        })
+    return positions
+
+def build_objects(positions):
+    by_symbol = {}
+    for trade_data in positions:
+        by_symbol.setdefault(trade_data['symbol'], []).append(Trade.from_dict(trade_data))
+    return by_symbol
+
+def build_books(positions, book_class):
+    books = {}
+    for trade_data in positions:
+        if trade_data['symbol'] not in books:
+            books[trade_data['symbol']] = book_class(trade_data['symbol'])
+        books[trade_data['symbol']].add(trade_data)
+    return books
+
+def cycle_objects(by_symbol, prices):
+    exits = 0
+    total_pnl = 0.0
+    for symbol, trades in by_symbol.items():
+        price = prices[symbol]
+        for trade in trades:
+            # What update_price and check_auto_exit do, minus the writes
+            trade.current_price = price
+            trade.pnl = calculate_pnl(trade.trade_type, trade.entry_price, price, trade.quantity)
+            total_pnl += trade.pnl
+            if evaluate_auto_exit(trade.trade_type, trade.stop_loss, trade.target_price, price):
+                exits += 1
+    return exits, total_pnl
+
+def cycle_books(books, prices):
+    exits = 0
+    total_pnl = 0.0
+    for symbol, book in books.items():
+        exits += len(book.crossed(prices[symbol]))
+        total_pnl += book.mark(prices[symbol])
+    return exits, total_pnl
+
+def measure(build, cycle, positions, prices, cycles):
+    tracemalloc.start()
+    started = time.perf_counter()
+    structure = build(positions)
+    build_seconds = time.perf_counter() - started
+    memory_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    
+    timings = []
+    for price_set in prices[:cycles]:
+        started = time.perf_counter()
+        exits, total_pnl = cycle(structure, price_set)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        'build_s': build_seconds,
+        'memory_mb': memory_bytes / 1024 / 1024,
+        'cycle_ms': timings[len(timings) // 2] * 1000,
+        'exits': exits,
+        'pnl': total_pnl
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--symbols', type=int, default=200)
+    parser.add_argument('--cycles', type=int, default=5, help='cycles timed per approach; the median is reported')
+    parser.add_argument('--approaches', nargs='+', default=['objects', 'levels', 'columnar'])
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    
+    approaches = {
+        'objects': (build_objects, cycle_objects),
+        'levels': (lambda positions: build_books(positions, SymbolTriggerBook), cycle_books),
+        'columnar': (lambda positions: build_books(positions, ColumnarPositionBook), cycle_books)
+    }
+    rng = random.Random(args.seed)
+    base_prices = {f"SYM{index}": rng.uniform(100, 5000) for index in range(args.symbols)}
+    # Each cycle moves every symbol up to 2%, so a realistic few percent of positions exit
+    prices = [
+        {symbol: price * rng.uniform(0.98, 1.02) for symbol, price in base_prices.items()}
+        for _ in range(args.cycles)
+    ]
+    
+    print(f"{'positions':>10} {'approach':>9} {'build s':>9} {'memory MB':>10} {'cycle ms':>10} {'exits':>8}")
+    for size in args.sizes:
+        positions = generate_positions(size, base_prices, args.seed)
+        results = {}
+        for name in args.approaches:
+            build, cycle = approaches[name]
+            results[name] = measure(build, cycle, positions, prices, args.cycles)
+            result = results[name]
+            print(
+                f"{size:>10} {name:>9} {result['build_s']:>9.2f} {result['memory_mb']:>10.1f} "
+                f"{result['cycle_ms']:>10.2f} {result['exits']:>8}"
+            )
+        
+        # Every approach must agree on what exits and on the marked PnL
+        reference = next(iter(results.values()))
+        for name, result in results.items():
+            assert result['exits'] == reference['exits'], f"{name} disagrees on exits"
+            assert abs(result['pnl'] - reference['pnl']) <= 1e-6 * max(1.0, abs(reference['pnl'])), f"{name} disagrees on PnL"
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
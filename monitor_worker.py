@@ -0,0 +1,57 @@
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+
+def run_worker():
+    """Run one monitor process over the symbol shards it manages to lease"""
+    # Exit through the finally block below so leases are handed back on terminate
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    
+    from app import create_app
+    create_app()
+    
+    from app.services.shard_coordinator import ShardCoordinator
+    from app.services.trade_monitor import TradeMonitor
+    
+    coordinator = ShardCoordinator(f"{socket.gethostname()}:{os.getpid()}")
+    monitor = TradeMonitor(coordinator)
+    coordinator.start()
+    monitor.start_monitoring()
+    print(f"Monitor worker {coordinator.worker_id} owns {len(coordinator.owned_shards)} shards")
+    
+    try:
+        while monitor.running:
+            time.sleep(1)
+    finally:
+        monitor.stop_monitoring()
+        coordinator.stop()
+
+def start_worker():
+    process = multiprocessing.Process(target=run_worker)
+    process.start()
+    return process
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run sharded trade monitor workers')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                        help='Number of monitor processes on this node')
+    args = parser.parse_args()
+    
+    workers = [start_worker() for _ in range(args.processes)]
+    try:
+        # Replace crashed workers; their shards move on when the leases expire
+        while True:
+            time.sleep(5)
+            for index, process in enumerate(workers):
+                if not process.is_alive():
+                    print(f"Monitor worker {process.pid} exited with {process.exitcode}, restarting")
+                    workers[index] = start_worker()
+    except KeyboardInterrupt:
+        for process in workers:
+            process.terminate()
+        for process in workers:
+            process.join()
\ No newline at end of file
@@ -1,12 +1,24 @@
 from app import create_app, socketio
+from app.config import Config
+from app.services.candle_service import candle_service
+from app.services.market_data import market_data_service
 from app.services.trade_monitor import trade_monitor
 import os
 
 app = create_app()
 
 if __name__ == '__main__':
-    # Start trade monitoring
-    trade_monitor.start_monitoring()
+    # Stream ticks from feed-style providers (synthetic, replay)
+    if Config.MARKET_DATA_FEED_ENABLED:
+        market_data_service.start_feed()
+    
+    # Aggregate published ticks into OHLCV bars
+    if Config.CANDLES_ENABLED:
+        candle_service.start()
+    
+    # Start trade monitoring, unless dedicated monitor workers own it
+    if Config.MONITOR_IN_PROCESS:
+        trade_monitor.start_monitoring()
     
     port = int(os.environ.get('PORT', 5000))
     socketio.run(app, host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
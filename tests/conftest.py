@@ -0,0 +1,75 @@
+"""Shared fixtures: every test runs against in-process MongoDB and Redis fakes.
+
+The models bind app.mongo_client and app.redis_client when first
+imported, so the fakes are installed here, before any test module loads.
+"""
+import functools
+import os
+import sys
+import threading
+
+import fakeredis
+import mongomock
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('MARKET_DATA_PROVIDER', 'mock')
+os.environ.setdefault('NOTIFICATION_BACKEND', 'log')
+
+import app  # noqa: E402
+
+# A real server applies each single-document write atomically; mongomock
+# reads and writes in separate steps, so serialize its writes to match
+_write_lock = threading.RLock()
+
+def _atomic(method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with _write_lock:
+            return method(*args, **kwargs)
+    return wrapper
+
+for _name in ('insert_one', 'insert_many', 'update_one', 'update_many', 'replace_one', 'delete_one',
+              'delete_many', 'find_one_and_update', 'find_one_and_replace', 'find_one_and_delete', 'bulk_write'):
+    setattr(mongomock.Collection, _name, _atomic(getattr(mongomock.Collection, _name)))
+
+app.mongo_client = mongomock.MongoClient()
+app.redis_client = fakeredis.FakeRedis()
+
+@pytest.fixture
+def db():
+    """An empty paper_trading database and Redis for each test"""
+    app.mongo_client.drop_database('paper_trading')
+    app.redis_client.flushall()
+    yield app.mongo_client.paper_trading
+
+@pytest.fixture(scope='session')
+def flask_app():
+    """The blueprints on a bare app; create_app also starts clients and migrations"""
+    from flask import Flask
+    from app.init import jwt
+    from app.routes.market import market_bp
+    from app.routes.portfolio import portfolio_bp
+    from app.routes.trades import trades_bp
+    
+    flask_app = Flask('app')
+    flask_app.config.update(TESTING=True, JWT_SECRET_KEY='test-jwt-secret-key-of-32-bytes-or-more')
+    jwt.init_app(flask_app)
+    flask_app.register_blueprint(portfolio_bp, url_prefix='/portfolio')
+    flask_app.register_blueprint(trades_bp, url_prefix='/trades')
+    flask_app.register_blueprint(market_bp, url_prefix='/market')
+    return flask_app
+
+@pytest.fixture
+def client(flask_app, db):
+    return flask_app.test_client()
+
+@pytest.fixture
+def auth_headers(flask_app):
+    """Bearer headers for a user id"""
+    from flask_jwt_extended import create_access_token
+    
+    def auth_headers(user_id='client01'):
+        with flask_app.app_context():
+            return {'Authorization': f"Bearer {create_access_token(identity=user_id)}"}
+    return auth_headers
\ No newline at end of file
@@ -0,0 +1,119 @@
+import csv
+import json
+import os
+import random
+import subprocess
+import sys
+import tracemalloc
+from bisect import bisect_left
+
+import numpy as np
+import pytest
+
+from app.models.trade_rules import TradeStatus, evaluate_auto_exit
+from app.services.backtest import CHUNK_TICKS, TickFile, convert_ticks, run_backtest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+START = 1700000000
+
+@pytest.fixture
+def tick_file(tmp_path):
+    """Random walks for two symbols, one tick a second, and an empty third symbol"""
+    rng = random.Random(7)
+    source = tmp_path / 'ticks.csv'
+    with open(source, 'w', newline='') as source_file:
+        writer = csv.writer(source_file)
+        writer.writerow(['symbol', 'price', 'timestamp'])
+        for symbol in ('TCS', 'INFY'):
+            price = 100.0
+            for second in range(3000):
+                price = round(price * (1 + rng.gauss(0, 0.003)), 2)
+                writer.writerow([symbol, price, START + second])
+    convert_ticks(str(source), str(tmp_path / 'ticks.bin'))
+    return TickFile(str(tmp_path / 'ticks.bin'))
+
+def random_position(rng):
+    direction = rng.choice((1, -1))
+    level = lambda sign: rng.choice((None, 0, round(100 * (1 + sign * direction * rng.uniform(0, 0.04)), 2)))
+    return {
+        'symbol': rng.choice(('TCS', 'INFY')),
+        'trade_type': 'BUY' if direction > 0 else 'SELL',
+        'quantity': rng.randint(1, 50),
+        'entry_time': START + rng.uniform(-10, 3010),
+        'stop_loss': level(-1),
+        'target_price': level(1)
+    }
+
+def replay(ticks, position):
+    """Walk the ticks one by one with the monitor's rule"""
+    timestamps, prices = ticks[position['symbol']]
+    start = bisect_left(timestamps, position['entry_time'])
+    if start == len(timestamps):
+        return 'NOT_OPENED', None
+    for at, price in zip(timestamps[start:], prices[start:]):
+        status = evaluate_auto_exit(position['trade_type'], position['stop_loss'], position['target_price'], price)
+        if status:
+            return status.value, at
+    return TradeStatus.ACTIVE.value, timestamps[-1]
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('chunk_ticks', [7, 256, CHUNK_TICKS])
+def test_fills_match_evaluate_auto_exit_tick_by_tick(tick_file, seed, chunk_ticks):
+    rng = random.Random(seed)
+    positions = [random_position(rng) for _ in range(300)]
+    
+    # Small chunks carry most positions across many chunk boundaries
+    fills, report = run_backtest(tick_file, positions, chunk_ticks=chunk_ticks)
+    
+    ticks = {symbol: tuple(column.tolist() for column in tick_file.ticks(symbol)) for symbol in ('TCS', 'INFY')}
+    for position, fill in zip(positions, fills):
+        status, exit_time = replay(ticks, position)
+        assert fill['status'] == status, position
+        if status != 'NOT_OPENED':
+            assert fill['exit_time'] == exit_time, position
+    statuses = report['statuses']
+    assert statuses.get('STOP_LOSS_HIT') and statuses.get('TARGET_HIT') and statuses.get('ACTIVE')
+
+def test_replay_memory_does_not_grow_with_the_day(tmp_path):
+    """The range table covers one chunk, never a symbol's whole tick column"""
+    count = 300000
+    rng = np.random.default_rng(3)
+    with open(tmp_path / 'ticks.csv', 'w') as source_file:
+        source_file.write('symbol,price,timestamp\n')
+        prices = 100.0 * np.exp(np.cumsum(rng.normal(0, 0.0002, count)))
+        source_file.writelines(f"TCS,{price:.2f},{START + second}\n" for second, price in enumerate(prices))
+    convert_ticks(str(tmp_path / 'ticks.csv'), str(tmp_path / 'ticks.bin'))
+    tick_file = TickFile(str(tmp_path / 'ticks.bin'))
+    # Levels no tick reaches, so every position stays open through every chunk
+    positions = [
+        {'symbol': 'TCS', 'trade_type': 'BUY', 'quantity': 1, 'entry_time': START + second,
+         'stop_loss': 1.0, 'target_price': 10000.0}
+        for second in range(0, count, count // 100)
+    ]
+    
+    tracemalloc.start()
+    try:
+        fills, _ = run_backtest(tick_file, positions)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    
+    assert {fill['status'] for fill in fills} == {'ACTIVE'}
+    # A sparse table over the whole column would take about 2 * 19 * 2.4 MB
+    assert peak < 40 * 1024 * 1024
+
+def test_symbols_without_ticks_are_reported(tick_file):
+    fills, report = run_backtest(tick_file, [{'symbol': 'WIPRO', 'trade_type': 'BUY', 'quantity': 1, 'entry_time': START}])
+    assert fills[0]['status'] == 'NO_DATA'
+    assert report['statuses'] == {'NO_DATA': 1}
+
+def test_cli_runs_without_database_clients(tmp_path, tick_file):
+    """A fresh interpreter, without the clients conftest injects"""
+    report_path = tmp_path / 'report.json'
+    subprocess.run(
+        [sys.executable, 'backtest.py', 'run', str(tmp_path / 'ticks.bin'), '--positions', '50',
+         '--report', str(report_path)],
+        cwd=REPO_ROOT, check=True, capture_output=True
+    )
+    with open(report_path) as report_file:
+        assert json.load(report_file)['positions'] == 50
\ No newline at end of file
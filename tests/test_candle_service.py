@@ -0,0 +1,105 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.config import Config
+from app.services.candle_service import CandleService
+
+# 2024-01-02 00:00:00 UTC, a whole day on the epoch grid
+DAY = 1704153600
+
+@pytest.fixture
+def service(db, monkeypatch):
+    monkeypatch.setattr(Config, 'CANDLE_CLOSE_GRACE', 2.0)
+    service = CandleService(intervals=('1m', '5m', '1d'))
+    service.is_leader = True
+    return service
+
+def tick(service, at, price, volume=0, symbol='TCS'):
+    service._on_tick(f"tick:{symbol}", {'symbol': symbol, 'price': price, 'timestamp': at, 'volume': volume})
+
+def stored(db, interval='1m'):
+    return [
+        dict(candle, t=candle['t'].replace(tzinfo=timezone.utc).timestamp())
+        for candle in db.candles.find({'meta.interval': interval}, {'_id': 0, 'meta': 0}).sort('t', 1)
+    ]
+
+def test_buckets_align_to_the_epoch(service):
+    tick(service, DAY + 7 * 60 + 42.5, 100.0)
+    
+    assert service.bars[('TCS', '1m')]['t'] == DAY + 7 * 60
+    assert service.bars[('TCS', '5m')]['t'] == DAY + 5 * 60
+    assert service.bars[('TCS', '1d')]['t'] == DAY
+
+def test_bars_track_ohlc_and_volume_deltas(service):
+    for second, price, cumulative in ((1, 100.0, 1000), (20, 103.0, 1400), (40, 99.0, 1500), (59, 101.0, 1800)):
+        tick(service, DAY + second, price, cumulative)
+    
+    bar = service.bars[('TCS', '1m')]
+    assert (bar['o'], bar['h'], bar['l'], bar['c']) == (100.0, 103.0, 99.0, 101.0)
+    # The first tick only sets the cumulative baseline
+    assert bar['v'] == 800
+
+def test_late_ticks_never_reopen_a_closed_bucket(db, service):
+    tick(service, DAY + 10, 100.0)
+    tick(service, DAY + 65, 101.0)
+    # The second bar closes once ticks run past its end plus the grace period
+    tick(service, DAY + 125, 102.0)
+    service.flush()
+    assert [candle['t'] for candle in stored(db)] == [DAY, DAY + 60]
+    
+    # Late for both flushed buckets: counted and dropped, no second candle
+    tick(service, DAY + 30, 90.0)
+    tick(service, DAY + 90, 90.0)
+    tick(service, DAY + 190, 103.0)
+    service.flush()
+    
+    assert service.late_ticks == 2
+    candles = stored(db)
+    assert [candle['t'] for candle in candles] == [DAY, DAY + 60, DAY + 120]
+    assert min(candle['l'] for candle in candles) == 100.0
+
+def test_open_bars_are_hot_in_redis_until_they_close(service):
+    tick(service, DAY + 10, 100.0)
+    service.flush()
+    assert service.open_bar('TCS', '1m')['c'] == 100.0
+    
+    tick(service, DAY + 70, 101.0)
+    service.flush()
+    assert service.open_bar('TCS', '1m')['t'] == DAY + 60
+
+def insert_candles(db, interval, bars):
+    db.candles.insert_many([
+        {
+            't': datetime.fromtimestamp(at, tz=timezone.utc).replace(tzinfo=None),
+            'meta': {'symbol': 'TCS', 'interval': interval},
+            'o': price, 'h': price + 1, 'l': price - 1, 'c': price, 'v': 10
+        }
+        for at, price in bars
+    ])
+
+def test_candles_merge_the_hot_bar_after_the_closed_ones(db, service):
+    insert_candles(db, '1m', [(DAY + minute * 60, 100.0 + minute) for minute in range(3)])
+    tick(service, DAY + 3 * 60 + 5, 110.0)
+    service.flush()
+    
+    bars = service.candles('TCS', '1m', DAY, DAY + 3600, limit=10)
+    assert [bar['t'] for bar in bars] == [DAY, DAY + 60, DAY + 120, DAY + 180]
+    assert bars[-1]['c'] == 110.0
+    
+    # The limit keeps the newest bars, the hot one included
+    assert [bar['t'] for bar in service.candles('TCS', '1m', DAY, DAY + 3600, limit=2)] == [DAY + 120, DAY + 180]
+
+def test_downsampled_candles_fold_the_hot_bar_into_its_bucket(db, service):
+    insert_candles(db, '1m', [(DAY + minute * 60, 100.0 + minute) for minute in range(8)])
+    tick(service, DAY + 8 * 60 + 5, 120.0, 0)
+    tick(service, DAY + 8 * 60 + 6, 95.0, 5)
+    service.flush()
+    
+    # 2 hours into about 24 points: 5 minute buckets
+    bars = service.candles('TCS', '1m', DAY, DAY + 7200, limit=100, points=24)
+    assert [bar['t'] for bar in bars] == [DAY, DAY + 300]
+    first, second = bars
+    assert (first['o'], first['h'], first['l'], first['c'], first['v']) == (100.0, 105.0, 99.0, 104.0, 50)
+    # Minutes 5-7 from Mongo plus the open minute 8
+    assert (second['o'], second['h'], second['l'], second['c'], second['v']) == (105.0, 120.0, 95.0, 95.0, 35)
\ No newline at end of file
@@ -0,0 +1,57 @@
+import json
+import threading
+import time
+
+import pytest
+
+import app
+from app.config import Config
+from app.services.market_data import MarketDataService
+from app.services.market_data_providers import MarketDataProvider, build_price_data
+
+SYMBOLS = ['TCS', 'INFY', 'RELIANCE']
+
+class CountingProvider(MarketDataProvider):
+    def __init__(self):
+        self.calls = []
+    
+    def get_quote(self, symbol):
+        return self.get_quotes([symbol]).get(symbol)
+    
+    def get_quotes(self, symbols):
+        self.calls.append(list(symbols))
+        return {symbol: build_price_data(symbol, 100.0) for symbol in symbols}
+
+@pytest.fixture
+def contended(db, monkeypatch):
+    """Every symbol's refresh lock held by another worker, with no stale copy to serve"""
+    monkeypatch.setattr(Config, 'PRICE_REFRESH_LOCK_MS', 400)
+    for symbol in SYMBOLS:
+        app.redis_client.set(f"lock:price:{symbol}", 'other-worker', px=400)
+    provider = CountingProvider()
+    return MarketDataService(provider), provider
+
+def test_contended_symbols_are_waited_on_together(contended):
+    service, provider = contended
+    
+    def other_worker_refreshes():
+        time.sleep(0.1)
+        for symbol in SYMBOLS:
+            app.redis_client.set(f"price:{symbol}", json.dumps(build_price_data(symbol, 200.0)))
+    threading.Thread(target=other_worker_refreshes).start()
+    
+    started = time.time()
+    prices = service._refresh_prices(SYMBOLS)
+    assert time.time() - started < 0.35
+    assert {symbol: price_data['price'] for symbol, price_data in prices.items()} == dict.fromkeys(SYMBOLS, 200.0)
+    assert provider.calls == []
+
+def test_refreshes_that_never_land_cost_one_lock_wait_and_one_fetch(contended):
+    service, provider = contended
+    
+    started = time.time()
+    prices = service._refresh_prices(SYMBOLS)
+    # Waiting symbol by symbol would take three lock lifetimes
+    assert time.time() - started < 0.8
+    assert set(prices) == set(SYMBOLS)
+    assert provider.calls == [SYMBOLS]
\ No newline at end of file
@@ -0,0 +1,123 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from app.services.market_data_providers import HttpQuoteProvider, MarketDataError, MarketDataProvider
+
+class FakeQuoteServer(ThreadingHTTPServer):
+    """Local quote API; each request takes the next scripted (status, body, delay) reply"""
+    daemon_threads = True
+    
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeQuoteHandler)
+        self.replies = []
+        self.requests = []
+        self.connections = set()
+    
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+class FakeQuoteHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    
+    def do_GET(self):
+        server = self.server
+        server.connections.add(self.client_address)
+        server.requests.append({
+            'path': urlparse(self.path).path,
+            'query': parse_qs(urlparse(self.path).query),
+            'authorization': self.headers.get('Authorization')
+        })
+        status, body, delay = server.replies.pop(0) if server.replies else (200, {'data': {}}, 0)
+        time.sleep(delay)
+        payload = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+    
+    def log_message(self, format, *args):
+        pass
+
+def quote_body(*symbols):
+    return {'data': {
+        f"NSE_EQ:{symbol}": {'symbol': symbol, 'last_price': 100.0 + index, 'net_change': 1.5, 'volume': 10}
+        for index, symbol in enumerate(symbols)
+    }}
+
+@pytest.fixture
+def server():
+    server = FakeQuoteServer()
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def provider(server):
+    return HttpQuoteProvider(server.url, 'test-key', timeout=0.3, batch_size=2)
+
+def test_provider_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        MarketDataProvider()
+
+def test_batches_map_to_quotes_over_one_connection(server, provider):
+    server.replies = [(200, quote_body('TCS', 'INFY'), 0), (200, quote_body('WIPRO'), 0)]
+    
+    quotes = provider.get_quotes(['TCS', 'INFY', 'WIPRO'])
+    
+    assert sorted(quotes) == ['INFY', 'TCS', 'WIPRO']
+    assert quotes['TCS']['price'] == 100.0
+    assert quotes['TCS']['change'] == 1.5
+    assert quotes['TCS']['volume'] == 10
+    assert [request['query']['symbol'] for request in server.requests] == [['TCS,INFY'], ['WIPRO']]
+    assert all(request['path'] == '/market-quote/quotes' for request in server.requests)
+    assert all(request['authorization'] == 'Bearer test-key' for request in server.requests)
+    # Keep-alive: both batches went over the same pooled connection
+    assert len(server.connections) == 1
+
+def test_retries_transient_errors(server, provider):
+    server.replies = [(503, {'error': 'busy'}, 0), (502, {'error': 'gateway'}, 0), (200, quote_body('TCS'), 0)]
+    
+    assert provider.get_quote('TCS')['price'] == 100.0
+    assert len(server.requests) == 3
+
+def test_persistent_errors_are_mapped_after_retries(server, provider):
+    server.replies = [(503, {'error': 'busy'}, 0)] * 3
+    
+    with pytest.raises(MarketDataError, match='after retries'):
+        provider.get_quotes(['TCS'])
+    assert len(server.requests) == 3
+
+def test_client_errors_are_mapped_without_retrying(server, provider):
+    server.replies = [(401, {'error': 'bad token'}, 0)]
+    
+    with pytest.raises(MarketDataError, match='returned 401'):
+        provider.get_quotes(['TCS'])
+    assert len(server.requests) == 1
+
+def test_timeouts_are_mapped(server, provider):
+    server.replies = [(200, quote_body('TCS'), 1.0)] * 3
+    
+    started = time.perf_counter()
+    with pytest.raises(MarketDataError, match='timed out'):
+        provider.get_quotes(['TCS'])
+    # Read timeouts are retried too, but each attempt is bounded by the timeout
+    assert time.perf_counter() - started < 2.0
+
+@pytest.mark.parametrize('body', ['not json', {'data': {'NSE_EQ:TCS': {'symbol': 'TCS'}}}])
+def test_malformed_responses_are_mapped(server, provider, body):
+    server.replies = [(200, body, 0)]
+    
+    with pytest.raises(MarketDataError):
+        provider.get_quotes(['TCS'])
\ No newline at end of file
@@ -0,0 +1,87 @@
+import time
+
+import pytest
+
+import app
+from app.config import Config
+from app.services import market_stream
+from app.services.market_data_providers import build_price_data
+from app.services.market_stream import MarketBroadcaster
+
+@pytest.fixture
+def broadcasters(db, monkeypatch):
+    """Two web processes' broadcasters sharing one Redis, outside any Socket.IO request"""
+    monkeypatch.setattr(market_stream, 'join_room', lambda room, sid: None)
+    monkeypatch.setattr(market_stream, 'leave_room', lambda room, sid: None)
+    first, second = MarketBroadcaster(), MarketBroadcaster()
+    first.worker_id, second.worker_id = 'web-1', 'web-2'
+    first.subscribers_key = f"{MarketBroadcaster.SUBSCRIBERS_KEY}:web-1"
+    second.subscribers_key = f"{MarketBroadcaster.SUBSCRIBERS_KEY}:web-2"
+    return first, second
+
+def test_disconnect_releases_every_subscription(broadcasters):
+    first, second = broadcasters
+    first.connect('a')
+    first.subscribe('a', 'TCS')
+    first.subscribe('a', 'INFY')
+    second.connect('b')
+    second.subscribe('b', 'TCS')
+    assert first._load_active_symbols() == {'TCS', 'INFY'}
+    
+    first.disconnect('a')
+    assert first._load_active_symbols() == {'TCS'}
+    assert first.symbol_counts == {}
+    
+    second.disconnect('b')
+    assert first._load_active_symbols() == set()
+    assert app.redis_client.smembers(MarketBroadcaster.WORKERS_KEY) == set()
+
+def test_unsubscribe_only_drops_the_symbol_when_no_client_is_left(broadcasters):
+    first, _ = broadcasters
+    first.subscribe('a', 'TCS')
+    first.subscribe('b', 'TCS')
+    first.subscribe('b', 'TCS')
+    
+    first.unsubscribe('a', 'TCS')
+    assert first._load_active_symbols() == {'TCS'}
+    first.unsubscribe('b', 'TCS')
+    assert first._load_active_symbols() == set()
+
+def test_counts_of_a_dead_process_expire(broadcasters):
+    first, second = broadcasters
+    first.subscribe('a', 'TCS')
+    second.subscribe('b', 'INFY')
+    
+    # The second process dies without running its disconnect handlers
+    app.redis_client.delete(second.subscribers_key)
+    assert first._load_active_symbols() == {'TCS'}
+    assert app.redis_client.smembers(MarketBroadcaster.WORKERS_KEY) == {b'web-1'}
+
+def test_quiet_symbols_are_polled(broadcasters, monkeypatch):
+    first, _ = broadcasters
+    monkeypatch.setattr(Config, 'MARKET_STREAM_POLL_AFTER', 2.0)
+    polled = []
+    
+    def get_live_prices(symbols):
+        polled.append(sorted(symbols))
+        return {symbol: build_price_data(symbol, 100.0) for symbol in symbols}
+    monkeypatch.setattr(market_stream.market_data_service, 'get_live_prices', get_live_prices)
+    
+    first.is_leader = True
+    first.active_symbols = {'TCS', 'INFY'}
+    first._poll_quiet_symbols()
+    assert polled == []
+    
+    # TCS keeps ticking; INFY has been quiet for longer than POLL_AFTER
+    first.last_tick_at['INFY'] -= 3
+    first._on_tick('tick:TCS', build_price_data('TCS', 101.0))
+    first._poll_quiet_symbols()
+    assert polled == [['INFY']]
+    assert first.pending_ticks['INFY']['price'] == 100.0
+    assert first.pending_ticks['TCS']['price'] == 101.0
+    assert first.symbols_polled == 1
+    
+    # Polling restarts the quiet clock
+    first._poll_quiet_symbols()
+    assert polled == [['INFY']]
+    assert time.time() - first.last_tick_at['INFY'] < 1
\ No newline at end of file
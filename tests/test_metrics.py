@@ -0,0 +1,17 @@
+from collections import Counter
+
+from app.routes.metrics import register_collectors
+from app.services.metrics import registry
+
+def test_collectors_register_once(db):
+    register_collectors()
+    register_collectors()
+    
+    names = Counter(metric.name for metric in registry.metrics)
+    assert names['cache_hits_total'] == 1
+    assert max(names.values()) == 1
+    
+    rendered = registry.render()
+    assert rendered.count('# TYPE monitor_tracked_trades gauge') == 1
+    assert 'cache_hits_total{cache="portfolios"}' in rendered
+    assert 'notification_jobs_total{outcome="submitted"}' in rendered
\ No newline at end of file
@@ -0,0 +1,81 @@
+import os
+from datetime import datetime
+
+import pytest
+from pymongo import MongoClient
+
+from app.migrations import HOT_QUERIES, MIGRATIONS, check_query_plans, run_migrations
+
+# explain() needs a real server; mongomock has no query planner
+MONGO_TEST_URI = os.environ.get('MONGO_TEST_URI')
+
+class FakeCursor:
+    def __init__(self, explain):
+        self._explain = explain
+    
+    def sort(self, sort):
+        return self
+    
+    def explain(self):
+        return self._explain
+
+class FakeDatabase:
+    """Answers every find with the explain output registered for its collection"""
+    def __init__(self, plans):
+        self.plans = plans
+    
+    def __getitem__(self, collection):
+        explain = self.plans.get(collection, {'queryPlanner': {'winningPlan': {'stage': 'IXSCAN'}}})
+        return type('FakeCollection', (), {'find': lambda _, query: FakeCursor(explain)})()
+
+def test_collscans_are_found_anywhere_in_the_plan_tree():
+    plans = {
+        'trades': {'queryPlanner': {'winningPlan': {
+            'stage': 'FETCH', 'inputStage': {'stage': 'OR', 'inputStages': [
+                {'stage': 'IXSCAN'}, {'stage': 'COLLSCAN'}
+            ]}
+        }}},
+        # Time-series collections explain as an aggregation over their buckets
+        'candles': {'stages': [{'$cursor': {'queryPlanner': {'winningPlan': {
+            'stage': 'SORT', 'inputStage': {'stage': 'COLLSCAN'}
+        }}}}]}
+    }
+    
+    names = check_query_plans(FakeDatabase(plans))
+    
+    expected = [name for name, collection, _, _ in HOT_QUERIES if collection in plans]
+    assert names == expected
+
+def test_index_only_plans_pass():
+    assert check_query_plans(FakeDatabase({})) == []
+
+def test_trade_symbols_are_upper_cased(db):
+    db.trades.insert_many([{'symbol': symbol} for symbol in ('tcs', 'Infy', 'WIPRO')])
+    uppercase_trade_symbols = dict((version, migrate) for version, _, migrate in MIGRATIONS)[3]
+    
+    uppercase_trade_symbols(db)
+    
+    assert sorted(trade['symbol'] for trade in db.trades.find()) == ['INFY', 'TCS', 'WIPRO']
+
+@pytest.mark.skipif(not MONGO_TEST_URI, reason='set MONGO_TEST_URI to explain against a real MongoDB')
+def test_hot_queries_use_indexes_after_migrations():
+    client = MongoClient(MONGO_TEST_URI)
+    client.drop_database('paper_trading_plan_test')
+    db = client.paper_trading_plan_test
+    try:
+        run_migrations(db)
+        # A few documents so the planner has more than an empty collection to choose over
+        now = datetime.utcnow()
+        db.trades.insert_many([
+            {'user_id': f'client{i:02d}', 'symbol': 'RELIANCE', 'status': 'ACTIVE' if i % 2 else 'CLOSED', 'created_at': now}
+            for i in range(20)
+        ])
+        db.users.insert_one({'email': 'user@example.com', 'client_id': 'client01'})
+        db.portfolios.insert_one({'user_id': 'client01'})
+        db.trade_stats.insert_one({'user_id': 'client01'})
+        db.candles.insert_one({'t': now, 'meta': {'symbol': 'RELIANCE', 'interval': '1m'}, 'c': 100.0})
+        
+        assert check_query_plans(db) == []
+    finally:
+        client.drop_database('paper_trading_plan_test')
+        client.close()
\ No newline at end of file
@@ -0,0 +1,58 @@
+from datetime import datetime
+
+from app.models.portfolio import Portfolio
+from app.services.model_cache import portfolio_cache
+
+def portfolio_document(available_margin):
+    now = datetime.utcnow().replace(microsecond=0)
+    return {
+        'user_id': 'client01',
+        'available_margin': available_margin,
+        'utilized_margin': 100000.0 - available_margin,
+        'total_pnl': 0.0,
+        'created_at': now,
+        'updated_at': now
+    }
+
+def test_fill_after_a_miss_is_cached(db):
+    document, generation = portfolio_cache.lookup('client01')
+    assert document is None
+    
+    portfolio_cache.set('client01', portfolio_document(100000.0), generation=generation)
+    assert portfolio_cache.get('client01') == portfolio_document(100000.0)
+
+def test_fill_racing_an_invalidation_is_dropped(db):
+    # A reader misses and reads the old document from Mongo...
+    _, generation = portfolio_cache.lookup('client01')
+    stale = portfolio_document(100000.0)
+    
+    # ...a writer updates Mongo and invalidates before the reader fills
+    portfolio_cache.invalidate('client01')
+    
+    stale_fills = portfolio_cache.stats()['stale_fills']
+    portfolio_cache.set('client01', stale, generation=generation)
+    assert portfolio_cache.get('client01') is None
+    assert portfolio_cache.stats()['stale_fills'] == stale_fills + 1
+    
+    # The next reader sees the new generation and fills normally
+    _, generation = portfolio_cache.lookup('client01')
+    portfolio_cache.set('client01', portfolio_document(90000.0), generation=generation)
+    assert portfolio_cache.get('client01')['available_margin'] == 90000.0
+
+def test_find_by_user_id_does_not_recache_a_reserved_portfolio(db, monkeypatch):
+    Portfolio('client01').save()
+    portfolio_cache.invalidate('client01')
+    
+    # Reserve margin between the reader's Mongo read and its cache fill
+    fill = portfolio_cache.set
+    
+    def reserve_then_fill(*args, **kwargs):
+        Portfolio.reserve_margin('client01', 25000.0)
+        fill(*args, **kwargs)
+    monkeypatch.setattr(portfolio_cache, 'set', reserve_then_fill)
+    
+    assert Portfolio.find_by_user_id('client01').available_margin == 100000.0
+    monkeypatch.undo()
+    
+    assert portfolio_cache.get('client01') is None
+    assert Portfolio.find_by_user_id('client01').available_margin == 75000.0
\ No newline at end of file
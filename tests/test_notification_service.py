@@ -0,0 +1,208 @@
+import json
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.config import Config
+from app.models.user import User
+from app.services.notification_service import NotificationCoalescer, NotificationService
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    """Just enough SMTP to accept messages; optionally hangs up after every drop_after messages"""
+    daemon_threads = True
+    allow_reuse_address = True
+    
+    def __init__(self, drop_after=None):
+        super().__init__(('127.0.0.1', 0), FakeSMTPHandler)
+        self.drop_after = drop_after
+        self.connections = 0
+        self.logins = 0
+        self.messages = []
+
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+    
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply('220 fake ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip().upper()
+            if command.startswith('EHLO'):
+                self.reply('250-fake')
+                self.reply('250 AUTH PLAIN')
+            elif command.startswith('AUTH'):
+                server.logins += 1
+                self.reply('235 authenticated')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                for data_line in iter(self.rfile.readline, b''):
+                    if data_line == b'.\r\n':
+                        break
+                    lines.append(data_line.decode())
+                server.messages.append(''.join(lines))
+                self.reply('250 queued')
+                if server.drop_after and len(server.messages) % server.drop_after == 0:
+                    return
+            elif command == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 ok')
+
+class FakeSMSServer(ThreadingHTTPServer):
+    """SMS API answering each POST with the next scripted status"""
+    daemon_threads = True
+    
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeSMSHandler)
+        self.statuses = []
+        self.requests = []
+        self.connections = set()
+
+class FakeSMSHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    
+    def do_POST(self):
+        server = self.server
+        server.connections.add(self.client_address)
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        server.requests.append((time.perf_counter(), body))
+        status = server.statuses.pop(0) if server.statuses else 200
+        self.send_response(status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+    
+    def log_message(self, format, *args):
+        pass
+
+def serve(server):
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    return server
+
+@pytest.fixture
+def smtp_server():
+    server = serve(FakeSMTPServer())
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def sms_server():
+    server = serve(FakeSMSServer())
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def service(monkeypatch, smtp_server, sms_server):
+    """A live-backend service pointed at the fake servers, with fast retries"""
+    monkeypatch.setattr(Config, 'NOTIFICATION_BACKEND', 'live')
+    monkeypatch.setattr(Config, 'SMTP_SERVER', '127.0.0.1')
+    monkeypatch.setattr(Config, 'SMTP_PORT', smtp_server.server_address[1])
+    monkeypatch.setattr(Config, 'SMTP_USE_TLS', False)
+    monkeypatch.setattr(Config, 'EMAIL_SENDER', 'alerts@example.com')
+    monkeypatch.setattr(Config, 'EMAIL_PASSWORD', 'secret')
+    monkeypatch.setattr(Config, 'SMS_API_URL', f"http://127.0.0.1:{sms_server.server_address[1]}/sms")
+    monkeypatch.setattr(Config, 'NOTIFICATION_WORKERS', 1)
+    monkeypatch.setattr(Config, 'NOTIFICATION_MAX_RETRIES', 2)
+    monkeypatch.setattr(Config, 'NOTIFICATION_RETRY_BACKOFF', 0.05)
+    monkeypatch.setattr(Config, 'NOTIFICATION_TIMEOUT', 2.0)
+    return NotificationService()
+
+def test_emails_reuse_one_smtp_session(service, smtp_server):
+    for index in range(3):
+        service.send_email('user@example.com', 'Trade Created', f"message {index}")
+    service.dispatcher.queue.join()
+    
+    assert len(smtp_server.messages) == 3
+    assert (smtp_server.connections, smtp_server.logins) == (1, 1)
+    assert service.dispatcher.stats()['completed'] == 3
+
+def test_dropped_smtp_session_is_reopened(service, smtp_server):
+    smtp_server.drop_after = 1
+    for index in range(3):
+        service.send_email('user@example.com', 'Trade Created', f"message {index}")
+    service.dispatcher.queue.join()
+    
+    assert len(smtp_server.messages) == 3
+    assert (smtp_server.connections, smtp_server.logins) == (3, 3)
+    assert service.dispatcher.stats()['retried'] == 0
+
+def test_sms_reuse_one_http_connection(service, sms_server):
+    for index in range(3):
+        service.send_sms('+919999999999', f"message {index}")
+    service.dispatcher.queue.join()
+    
+    assert [body['message'] for _, body in sms_server.requests] == ['message 0', 'message 1', 'message 2']
+    assert len(sms_server.connections) == 1
+
+def test_failed_sends_are_retried_with_backoff(service, sms_server):
+    sms_server.statuses = [503, 500]
+    service.send_sms('+919999999999', 'Stop-loss triggered')
+    service.dispatcher.queue.join()
+    
+    stats = service.dispatcher.stats()
+    assert (stats['completed'], stats['retried'], stats['failed']) == (1, 2, 0)
+    sent_at = [at for at, _ in sms_server.requests]
+    assert len(sent_at) == 3
+    # Backoff doubles: 0.05s, then 0.1s
+    assert sent_at[1] - sent_at[0] >= 0.05
+    assert sent_at[2] - sent_at[1] >= 0.1
+
+def test_sends_fail_once_retries_are_exhausted(service, sms_server):
+    sms_server.statuses = [500, 500, 500]
+    service.send_sms('+919999999999', 'Stop-loss triggered')
+    service.dispatcher.queue.join()
+    
+    stats = service.dispatcher.stats()
+    assert (stats['completed'], stats['retried'], stats['failed']) == (0, 2, 1)
+    assert len(sms_server.requests) == 3
+
+def exit_event(symbol, pnl):
+    return ('stop_loss_hit', {'symbol': symbol, 'exit_price': 100.0, 'pnl': pnl})
+
+def test_bursts_coalesce_into_one_batch_per_user_and_channel():
+    coalescer = NotificationCoalescer(lambda *batch: None, window=5.0, min_intervals={'sms': 60.0})
+    coalescer.started = True  # Drive _due by hand instead of from the flush thread
+    for index in range(5):
+        coalescer.add('client01', exit_event('TCS', index))
+    coalescer.add('client02', exit_event('INFY', 10))
+    assert coalescer._due(time.time()) == []
+    
+    now = time.time() + 5.0
+    due = dict(coalescer._due(now))
+    assert sorted(due) == [('client01', 'email'), ('client01', 'sms'), ('client02', 'email'), ('client02', 'sms')]
+    assert len(due[('client01', 'sms')]) == 5
+    assert coalescer.stats()['messages_flushed'] == 4
+    
+    # The next burst waits out the SMS interval but not the shorter email one
+    coalescer.add('client01', exit_event('TCS', 5))
+    coalescer.pending[('client01', 'sms')][0] -= 5.0
+    coalescer.pending[('client01', 'email')][0] -= 5.0
+    assert [key for key, _ in coalescer._due(now + 1.0)] == [('client01', 'email')]
+    assert [key for key, _ in coalescer._due(now + 60.0)] == [('client01', 'sms')]
+
+def test_coalesced_events_arrive_as_one_digest(db, service, smtp_server, sms_server):
+    User('client01', 'Test User', 'user@example.com', '+919999999999', 'unused').save()
+    service.coalescer.started = True
+    for index in range(4):
+        service.notify_user('client01', *exit_event('TCS', 10 * index))
+    
+    for (client_id, channel), events in service.coalescer._due(time.time() + Config.NOTIFICATION_COALESCE_WINDOW):
+        service.coalescer.flush(client_id, channel, events)
+    service.dispatcher.queue.join()
+    
+    assert len(sms_server.requests) == 1
+    assert sms_server.requests[0][1]['message'] == '4 trade updates: 4 stopped out. Net PnL on exits: 60.0'
+    assert len(smtp_server.messages) == 1
+    assert 'Subject: 4 Trade Updates' in smtp_server.messages[0]
\ No newline at end of file
@@ -0,0 +1,66 @@
+import threading
+import time
+
+import bcrypt
+import eventlet
+import pytest
+
+from app.services.password_hasher import PasswordHasher, PasswordHasherBusy
+
+hashpw = bcrypt.hashpw
+
+def recording_hash(calls, delay=0.0):
+    """bcrypt.hashpw that records which native thread ran it"""
+    def recording_hashpw(password, salt):
+        calls.append(threading.current_thread().name)
+        time.sleep(delay)
+        return hashpw(password, salt)
+    return recording_hashpw
+
+def test_native_threads_hash_on_the_pool(monkeypatch):
+    hasher = PasswordHasher(rounds=4)
+    calls = []
+    monkeypatch.setattr(bcrypt, 'hashpw', recording_hash(calls))
+    
+    password_hash = hasher.hash('secret')
+    
+    assert hasher.verify('secret', password_hash)
+    assert not hasher.verify('wrong', password_hash)
+    assert calls[0].startswith('bcrypt')
+
+def test_green_threads_hash_without_blocking_the_hub(monkeypatch):
+    hasher = PasswordHasher(rounds=4)
+    calls = []
+    monkeypatch.setattr(bcrypt, 'hashpw', recording_hash(calls, delay=0.2))
+    ticks = []
+    
+    def ticker():
+        for _ in range(5):
+            ticks.append(time.perf_counter())
+            eventlet.sleep(0.02)
+    
+    started = time.perf_counter()
+    hashing = eventlet.spawn(hasher.hash, 'secret')
+    eventlet.spawn(ticker).wait()
+    password_hash = hashing.wait()
+    
+    # The ticker kept running while bcrypt held a native thread
+    assert ticks[-1] - started < 0.2
+    assert calls[0] != threading.current_thread().name
+    assert hasher.verify('secret', password_hash)
+
+@pytest.mark.parametrize('green', [False, True])
+def test_hashes_beyond_the_cap_give_up(monkeypatch, green):
+    hasher = PasswordHasher(rounds=4, max_concurrent=1, wait_timeout=0.05)
+    slots = hasher.green_slots if green else hasher.thread_slots
+    slots.acquire()
+    try:
+        if green:
+            with pytest.raises(PasswordHasherBusy):
+                eventlet.spawn(hasher.hash, 'secret').wait()
+        else:
+            with pytest.raises(PasswordHasherBusy):
+                hasher.hash('secret')
+    finally:
+        slots.release()
+    assert hasher.needs_rehash(hasher.hash('secret')) is False
\ No newline at end of file
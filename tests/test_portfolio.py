@@ -0,0 +1,65 @@
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.models.portfolio import Portfolio
+
+STARTING_MARGIN = 100000.0
+
+@pytest.fixture
+def portfolio(db):
+    Portfolio('client01', available_margin=STARTING_MARGIN).save()
+    return db.portfolios
+
+def test_parallel_reservations_never_overdraw(portfolio):
+    # 64 reservations of 2500 against 100000: exactly 40 can succeed
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda _: Portfolio.reserve_margin('client01', 2500.0), range(64)))
+    
+    reserved = [result for result in results if result is not None]
+    assert len(reserved) == 40
+    assert all(result.available_margin >= 0 for result in reserved)
+    
+    stored = portfolio.find_one({'user_id': 'client01'})
+    assert stored['available_margin'] == 0.0
+    assert stored['utilized_margin'] == 100000.0
+
+def test_parallel_reserve_and_release_reconcile(portfolio):
+    lock = threading.Lock()
+    held = []
+    totals = {'reserved': 0.0, 'released': 0.0, 'pnl': 0.0}
+    
+    def trader(seed):
+        rng = random.Random(seed)
+        for _ in range(50):
+            if held and rng.random() < 0.4:
+                with lock:
+                    amount = held.pop() if held else None
+                if amount is None:
+                    continue
+                pnl = round(rng.uniform(-100, 100), 2)
+                Portfolio.release_margin('client01', amount, pnl)
+                with lock:
+                    totals['released'] += amount
+                    totals['pnl'] += pnl
+            else:
+                amount = float(rng.choice((1000, 5000, 20000)))
+                result = Portfolio.reserve_margin('client01', amount)
+                if result is not None:
+                    assert result.available_margin >= 0
+                    with lock:
+                        held.append(amount)
+                        totals['reserved'] += amount
+    
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(trader, range(8)))
+    
+    stored = portfolio.find_one({'user_id': 'client01'})
+    outstanding = totals['reserved'] - totals['released']
+    assert outstanding == sum(held)
+    assert stored['available_margin'] >= 0
+    assert stored['utilized_margin'] == pytest.approx(outstanding)
+    assert stored['available_margin'] == pytest.approx(STARTING_MARGIN - outstanding)
+    assert stored['total_pnl'] == pytest.approx(totals['pnl'])
\ No newline at end of file
@@ -0,0 +1,151 @@
+from datetime import datetime
+
+import mongomock
+import pytest
+
+from app.models.portfolio import Portfolio
+from app.services import portfolio_stream as portfolio_stream_module
+from app.services.portfolio_stream import PortfolioStream
+
+PRICES = {'TCS': 105.0, 'INFY': 200.0}
+
+class StopStream(Exception):
+    pass
+
+@pytest.fixture
+def market(db, monkeypatch):
+    monkeypatch.setattr(
+        portfolio_stream_module.market_data_service, 'get_live_prices',
+        lambda symbols: {symbol: {'symbol': symbol, 'price': PRICES[symbol]} for symbol in symbols if symbol in PRICES}
+    )
+    Portfolio('client01').save()
+
+def insert_trade(db, symbol='TCS', trade_type='BUY', quantity=10, entry_price=100.0, user_id='client01'):
+    trade_data = {
+        'user_id': user_id, 'symbol': symbol, 'trade_type': trade_type, 'quantity': quantity,
+        'entry_price': entry_price, 'margin_used': entry_price * quantity, 'status': 'ACTIVE',
+        'created_at': datetime.utcnow()
+    }
+    trade_data['_id'] = db.trades.insert_one(trade_data).inserted_id
+    return trade_data
+
+def opened_event(trade_data):
+    return dict(trade_data, _id=str(trade_data['_id']))
+
+def closed_event(trade_data):
+    return {'_id': str(trade_data['_id']), 'symbol': trade_data['symbol'], 'user_id': trade_data['user_id']}
+
+def pnls(snapshot):
+    return sorted((position['symbol'], position['pnl']) for position in snapshot['positions'])
+
+def test_subscribe_snapshots_positions_at_live_prices(db, market):
+    insert_trade(db, 'TCS')
+    insert_trade(db, 'INFY', 'SELL', 5, 210.0)
+    insert_trade(db, 'TCS', user_id='client02')
+    
+    snapshot = PortfolioStream().subscribe('sid1', 'client01')
+    
+    assert pnls(snapshot) == [('INFY', 50.0), ('TCS', 50.0)]
+    assert snapshot['total_pnl'] == 100.0
+    assert snapshot['margin']['utilized_margin'] == 0.0
+
+def test_ticks_re_mark_only_the_ticking_symbol_without_reading_mongo(db, market, monkeypatch):
+    stream = PortfolioStream()
+    tcs, infy = insert_trade(db, 'TCS'), insert_trade(db, 'INFY', 'SELL', 5, 210.0)
+    stream.subscribe('sid1', 'client01')
+    stream.pending_changes.clear()
+    monkeypatch.setattr(mongomock.Collection, 'find', lambda *args, **kwargs: pytest.fail('tick read Mongo'))
+    
+    stream._on_tick('tick:TCS', {'symbol': 'TCS', 'price': 110.0})
+    stream._on_tick('tick:WIPRO', {'symbol': 'WIPRO', 'price': 50.0})
+    
+    assert stream.total_pnl['client01'] == 150.0
+    assert stream.pending_changes['client01'] == {
+        str(tcs['_id']): {'trade_id': str(tcs['_id']), 'symbol': 'TCS', 'current_price': 110.0, 'pnl': 100.0}
+    }
+    # An unchanged price produces no change to push
+    stream.pending_changes.clear()
+    stream._on_tick('tick:INFY', {'symbol': 'INFY', 'price': 200.0})
+    assert not stream.pending_changes.get('client01')
+
+def test_trade_events_add_and_drop_positions(db, market):
+    stream = PortfolioStream()
+    held = insert_trade(db, 'TCS')
+    stream.subscribe('sid1', 'client01')
+    
+    opened = insert_trade(db, 'INFY', quantity=2, entry_price=190.0)
+    stream._on_trade_event('trade:opened', opened_event(opened))
+    stream._on_trade_event('trade:opened', opened_event(opened))
+    stream._on_tick('tick:INFY', {'symbol': 'INFY', 'price': 200.0})
+    assert stream.total_pnl['client01'] == 70.0
+    
+    stream._on_trade_event('trade:closed', closed_event(held))
+    snapshot = stream._snapshot('client01')
+    assert pnls(snapshot) == [('INFY', 20.0)]
+    assert snapshot['total_pnl'] == 20.0
+    assert 'TCS' not in stream.symbol_users
+    assert stream.stale_margins == {'client01'}
+    # Other users' events are ignored
+    stream._on_trade_event('trade:opened', opened_event(insert_trade(db, 'TCS', user_id='client02')))
+    assert 'client02' not in stream.positions
+
+def test_events_during_the_initial_load_are_replayed(db, monkeypatch):
+    Portfolio('client01').save()
+    stream = PortfolioStream()
+    closed_during_load = insert_trade(db, 'TCS')
+    kept = insert_trade(db, 'TCS', entry_price=90.0)
+    
+    def prices_after_events(symbols):
+        # The trades were read already; these land before the positions are installed
+        opened = insert_trade(db, 'INFY', quantity=2, entry_price=190.0)
+        stream._on_trade_event('trade:opened', opened_event(opened))
+        stream._on_trade_event('trade:closed', closed_event(closed_during_load))
+        stream._on_tick('tick:TCS', {'symbol': 'TCS', 'price': 101.0})
+        stream._on_tick('tick:INFY', {'symbol': 'INFY', 'price': 195.0})
+        return {symbol: {'symbol': symbol, 'price': 100.0} for symbol in symbols}
+    monkeypatch.setattr(portfolio_stream_module.market_data_service, 'get_live_prices', prices_after_events)
+    
+    snapshot = stream.subscribe('sid1', 'client01')
+    
+    assert pnls(snapshot) == [('INFY', 10.0), ('TCS', 110.0)]
+    assert [position['trade_id'] for position in snapshot['positions'] if position['symbol'] == 'TCS'] == [str(kept['_id'])]
+    assert snapshot['total_pnl'] == 120.0
+    assert stream.loading == {}
+
+def test_users_who_leave_while_loading_are_not_kept(db, monkeypatch):
+    stream = PortfolioStream()
+    insert_trade(db, 'TCS')
+    
+    def disconnect_while_loading(symbols):
+        stream.disconnect('sid1')
+        return {}
+    monkeypatch.setattr(portfolio_stream_module.market_data_service, 'get_live_prices', disconnect_while_loading)
+    
+    stream.subscribe('sid1', 'client01')
+    
+    assert stream.stats() == {'users': 0, 'sockets': 0, 'symbols': 0, 'messages_sent': 0}
+
+def test_run_pushes_accumulated_changes_to_every_socket_of_the_user(db, market, monkeypatch):
+    stream = PortfolioStream()
+    insert_trade(db, 'TCS')
+    stream.subscribe('sid1', 'client01')
+    stream.subscribe('sid2', 'client01')
+    stream.pending_changes.clear()
+    emitted = []
+    monkeypatch.setattr(portfolio_stream_module.socketio, 'emit', lambda event, payload, to: emitted.append((to, payload)))
+    
+    def sleep(seconds):
+        raise StopStream()
+    monkeypatch.setattr(portfolio_stream_module.socketio, 'sleep', sleep)
+    
+    stream._on_tick('tick:TCS', {'symbol': 'TCS', 'price': 101.0})
+    stream._on_tick('tick:TCS', {'symbol': 'TCS', 'price': 102.0})
+    with pytest.raises(StopStream):
+        stream._run()
+    
+    assert sorted(to for to, _ in emitted) == ['sid1', 'sid2']
+    payload = emitted[0][1]
+    # Two ticks coalesce into one change per trade
+    assert [(change['current_price'], change['pnl']) for change in payload['changes']] == [(102.0, 20.0)]
+    assert payload['total_pnl'] == 20.0
+    assert stream.stats()['messages_sent'] == 2
\ No newline at end of file
@@ -0,0 +1,122 @@
+from datetime import datetime
+
+import pytest
+
+from app.models.portfolio import Portfolio
+from app.models.trade_rules import TradeStatus
+from app.models.trade_stats import TradeStats
+from app.services import settlement as settlement_module
+from app.services.settlement import settlement_service
+
+STARTING_MARGIN = 100000.0
+PRICES = {'TCS': 110.0, 'INFY': 95.0}
+
+@pytest.fixture
+def market(db, monkeypatch):
+    """Fixed live prices, recording every batch of symbols fetched, and no notifications"""
+    fetches = []
+    
+    def get_live_prices(symbols):
+        fetches.append(sorted(symbols))
+        return {symbol: {'symbol': symbol, 'price': PRICES[symbol]} for symbol in symbols if symbol in PRICES}
+    monkeypatch.setattr(settlement_module.market_data_service, 'get_live_prices', get_live_prices)
+    monkeypatch.setattr(settlement_module.notification_service, 'notify_user', lambda *args: None)
+    return fetches
+
+def open_trade(db, user_id, symbol, trade_type='BUY', quantity=10, entry_price=100.0):
+    """An active trade with its margin reserved, as create_trade leaves it"""
+    margin_used = entry_price * quantity
+    if not db.portfolios.find_one({'user_id': user_id}):
+        Portfolio(user_id, available_margin=STARTING_MARGIN).save()
+        TradeStats.rebuild(user_id)
+    Portfolio.reserve_margin(user_id, margin_used)
+    TradeStats.record_open(user_id)
+    trade_data = {
+        'user_id': user_id, 'symbol': symbol, 'trade_type': trade_type, 'quantity': quantity,
+        'entry_price': entry_price, 'margin_used': margin_used, 'stop_loss': None, 'target_price': None,
+        'pnl': 0.0, 'status': TradeStatus.ACTIVE.value, 'created_at': datetime.utcnow()
+    }
+    trade_data['_id'] = db.trades.insert_one(trade_data).inserted_id
+    return trade_data
+
+def portfolio(db, user_id):
+    return db.portfolios.find_one({'user_id': user_id})
+
+def test_settle_releases_margin_and_records_stats_once_per_trade(db, market):
+    trades = [open_trade(db, 'client01', 'TCS'), open_trade(db, 'client01', 'INFY', 'SELL')]
+    
+    closed = settlement_service.settle([(trade, 110.0, TradeStatus.TARGET_HIT) for trade in trades])
+    
+    assert [trade['pnl'] for trade in closed] == [100.0, -100.0]
+    stored = portfolio(db, 'client01')
+    assert (stored['available_margin'], stored['utilized_margin']) == (STARTING_MARGIN, 0.0)
+    stats = TradeStats.find_by_user_id('client01')
+    assert (stats.active_trades, stats.closed_trades, stats.profitable_trades) == (0, 2, 1)
+
+def test_settle_skips_trades_closed_elsewhere(db, market):
+    kept, taken = open_trade(db, 'client01', 'TCS'), open_trade(db, 'client01', 'TCS', entry_price=90.0)
+    db.trades.update_one({'_id': taken['_id']}, {'$set': {'status': TradeStatus.CLOSED.value}})
+    
+    closed = settlement_service.settle([(kept, 110.0, TradeStatus.CLOSED), (taken, 110.0, TradeStatus.CLOSED)])
+    
+    assert [trade['_id'] for trade in closed] == [kept['_id']]
+    # Only the trade closed here gave its margin back
+    assert portfolio(db, 'client01')['utilized_margin'] == 900.0
+
+def test_overlapping_settlements_in_the_same_millisecond_claim_each_trade_once(db, market, monkeypatch):
+    class FrozenDatetime(datetime):
+        @classmethod
+        def utcnow(cls):
+            return datetime(2024, 1, 2, 9, 15, 0, 123000)
+    monkeypatch.setattr(settlement_module, 'datetime', FrozenDatetime)
+    first, shared, last = (open_trade(db, 'client01', 'TCS') for _ in range(3))
+    
+    # A monitor shard and an exit-all racing over the shared trade
+    by_monitor = settlement_service.settle([(first, 110.0, TradeStatus.TARGET_HIT), (shared, 110.0, TradeStatus.TARGET_HIT)])
+    by_exit_all = settlement_service.settle([(dict(shared), 110.0, TradeStatus.CLOSED), (last, 110.0, TradeStatus.CLOSED)])
+    
+    assert [trade['_id'] for trade in by_monitor] == [first['_id'], shared['_id']]
+    assert [trade['_id'] for trade in by_exit_all] == [last['_id']]
+    stored = portfolio(db, 'client01')
+    assert (stored['available_margin'], stored['utilized_margin'], stored['total_pnl']) == (STARTING_MARGIN, 0.0, 300.0)
+    assert TradeStats.find_by_user_id('client01').closed_pnl == 300.0
+
+def test_exit_all_fetches_each_symbol_once_and_leaves_other_users_alone(db, market):
+    for symbol in ('TCS', 'TCS', 'INFY', 'INFY'):
+        open_trade(db, 'client01', symbol)
+    other = open_trade(db, 'client02', 'TCS')
+    
+    closed = settlement_service.exit_all('client01')
+    
+    assert len(closed) == 4
+    assert market == [['INFY', 'TCS']]
+    assert db.trades.count_documents({'user_id': 'client01', 'status': TradeStatus.ACTIVE.value}) == 0
+    assert db.trades.find_one({'_id': other['_id']})['status'] == TradeStatus.ACTIVE.value
+    assert settlement_service.exit_all('client01') is None
+
+def test_exit_all_keeps_trades_without_a_price_open(db, market):
+    open_trade(db, 'client01', 'TCS')
+    unpriced = open_trade(db, 'client01', 'WIPRO')
+    
+    closed = settlement_service.exit_all('client01')
+    
+    assert [trade['symbol'] for trade in closed] == ['TCS']
+    assert db.trades.find_one({'_id': unpriced['_id']})['status'] == TradeStatus.ACTIVE.value
+    assert portfolio(db, 'client01')['utilized_margin'] == 1000.0
+
+def test_square_off_settles_every_user_across_batches(db, market):
+    for user_id, symbol, trade_type in (
+        ('client01', 'TCS', 'BUY'), ('client02', 'TCS', 'SELL'), ('client01', 'INFY', 'SELL'),
+        ('client03', 'INFY', 'BUY'), ('client02', 'WIPRO', 'BUY')
+    ):
+        open_trade(db, user_id, symbol, trade_type)
+    
+    summary = settlement_service.square_off_all(batch_size=2)
+    
+    assert summary == {'active': 5, 'closed': 4, 'margin_freed': 4000.0, 'pnl': 0.0}
+    # One price fetch per batch, each batch spanning users
+    assert len(market) == 3
+    assert [(stored['utilized_margin'], stored['total_pnl']) for stored in db.portfolios.find().sort('user_id', 1)] == [
+        (0.0, 150.0), (1000.0, -100.0), (0.0, -50.0)
+    ]
+    assert [trade['symbol'] for trade in db.trades.find({'status': TradeStatus.ACTIVE.value})] == ['WIPRO']
\ No newline at end of file
@@ -0,0 +1,121 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from bson.objectid import ObjectId
+
+from app.models.portfolio import Portfolio
+from app.models.trade import Trade
+from app.routes import trades as trades_routes
+
+NOW = datetime(2024, 1, 2, 9, 15)
+
+@pytest.fixture
+def market(monkeypatch):
+    quote = lambda symbol: {'symbol': symbol, 'price': 120.0}
+    monkeypatch.setattr(trades_routes.market_data_service, 'get_live_price', quote)
+    monkeypatch.setattr(
+        trades_routes.market_data_service, 'get_live_prices', lambda symbols: {symbol: quote(symbol) for symbol in symbols}
+    )
+    monkeypatch.setattr(trades_routes.notification_service, 'notify_user', lambda *args: None)
+
+def insert_trades(db, count, created_at=NOW, symbol='TCS', status='CLOSED', user_id='client01'):
+    db.trades.insert_many([
+        {
+            'user_id': user_id, 'symbol': symbol, 'trade_type': 'BUY', 'quantity': 1, 'entry_price': 100.0,
+            'current_price': 110.0, 'margin_used': 100.0, 'pnl': 10.0, 'status': status, 'created_at': created_at,
+            'updated_at': created_at
+        }
+        for _ in range(count)
+    ])
+
+def history(client, auth_headers, **params):
+    return client.get('/trades/history', query_string=params, headers=auth_headers())
+
+def test_symbols_are_stored_upper_case_and_found_by_the_filter(client, auth_headers, db, market):
+    Portfolio('client01').save()
+    
+    response = client.post('/trades/create', json={'symbol': ' tcs ', 'trade_type': 'BUY', 'quantity': 2},
+                           headers=auth_headers())
+    
+    assert response.status_code == 201
+    assert db.trades.find_one()['symbol'] == 'TCS'
+    for symbol in ('tcs', 'TCS'):
+        assert [trade['symbol'] for trade in history(client, auth_headers, symbol=symbol).get_json()['trades']] == ['TCS']
+
+def test_cursor_round_trips(db):
+    insert_trades(db, 1)
+    trade = Trade.from_dict(db.trades.find_one())
+    
+    assert Trade.decode_cursor(Trade.encode_cursor(trade)) == (trade.created_at, ObjectId(trade.trade_id))
+
+@pytest.mark.parametrize('cursor', [
+    'not base64!',
+    base64.urlsafe_b64encode(b'no separator').decode(),
+    base64.urlsafe_b64encode(b'2024-01-02T09:15:00|not-an-object-id').decode(),
+    base64.urlsafe_b64encode(f"yesterday|{ObjectId()}".encode()).decode()
+])
+def test_invalid_cursors_are_rejected(client, auth_headers, db, cursor):
+    with pytest.raises(ValueError):
+        Trade.decode_cursor(cursor)
+    
+    response = history(client, auth_headers, cursor=cursor)
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid cursor'}
+
+@pytest.mark.parametrize('limit, status_code', [('0', 400), ('501', 400), ('ten', 400), ('1', 200), ('500', 200)])
+def test_limit_bounds(client, auth_headers, db, limit, status_code):
+    insert_trades(db, 2)
+    assert history(client, auth_headers, limit=limit).status_code == status_code
+
+def test_pages_walk_trades_sharing_created_at_without_gaps(client, auth_headers, db):
+    # Seven trades in the same millisecond straddle every page boundary
+    insert_trades(db, 2, NOW + timedelta(seconds=1))
+    insert_trades(db, 7, NOW)
+    insert_trades(db, 2, NOW - timedelta(seconds=1))
+    insert_trades(db, 3, NOW, user_id='client02')
+    expected = [
+        str(trade['_id']) for trade in db.trades.find({'user_id': 'client01'}).sort([('created_at', -1), ('_id', -1)])
+    ]
+    
+    seen = []
+    cursor = None
+    while True:
+        page = history(client, auth_headers, limit=3, **({'cursor': cursor} if cursor else {})).get_json()
+        assert len(page['trades']) <= 3
+        seen.extend(trade['trade_id'] for trade in page['trades'])
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    
+    assert seen == expected
+
+def test_filters_combine_with_pagination(client, auth_headers, db):
+    insert_trades(db, 3, NOW, symbol='INFY')
+    insert_trades(db, 3, NOW, symbol='TCS', status='ACTIVE')
+    insert_trades(db, 3, NOW - timedelta(days=2), symbol='TCS')
+    
+    page = history(client, auth_headers, symbol='tcs', status='closed', limit=2).get_json()
+    assert [trade['status'] for trade in page['trades']] == ['CLOSED', 'CLOSED']
+    rest = history(client, auth_headers, symbol='tcs', status='closed', cursor=page['next_cursor']).get_json()
+    assert len(rest['trades']) == 1 and rest['next_cursor'] is None
+    
+    recent = history(client, auth_headers, **{'from': (NOW - timedelta(days=1)).isoformat()}).get_json()
+    assert len(recent['trades']) == 6
+
+def test_ndjson_export_streams_the_whole_history(client, auth_headers, db, market):
+    insert_trades(db, 250)
+    insert_trades(db, 2, NOW + timedelta(seconds=1), status='ACTIVE')
+    insert_trades(db, 5, user_id='client02')
+    
+    response = history(client, auth_headers, format='ndjson')
+    
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.is_streamed
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert len(lines) == 252
+    # Open trades are reported at the live price, newest first
+    assert [line['current_price'] for line in lines[:2]] == [120.0, 120.0]
+    assert {line['user_id'] for line in lines} == {'client01'}
\ No newline at end of file
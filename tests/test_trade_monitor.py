@@ -0,0 +1,99 @@
+import time
+from datetime import datetime
+
+import pytest
+
+from app.config import Config
+from app.services import trade_monitor as trade_monitor_module
+from app.services.event_bus import event_bus
+from app.services.metrics import monitor_cycle_lag
+from app.services.trade_monitor import TradeMonitor
+from app.services.trigger_book import create_trigger_book
+
+@pytest.fixture
+def push_mode(monkeypatch):
+    monkeypatch.setattr(Config, 'MONITOR_MODE', 'push')
+    monkeypatch.setattr(event_bus, 'connected', True)
+
+def test_push_mode_polls_until_a_tick_arrives(push_mode):
+    monitor = TradeMonitor()
+    assert monitor._scan_interval() == Config.MONITOR_POLL_INTERVAL
+    
+    monitor._on_tick('tick:TCS', {'symbol': 'TCS', 'price': 100.0})
+    assert monitor._scan_interval() == Config.MONITOR_SWEEP_INTERVAL
+
+def test_push_mode_falls_back_to_polling_when_ticks_stop(push_mode):
+    monitor = TradeMonitor()
+    monitor._on_tick('tick:TCS', {'symbol': 'TCS', 'price': 100.0})
+    monitor.last_tick_at = time.time() - Config.MONITOR_TICK_STALE_AFTER - 1
+    assert monitor._scan_interval() == Config.MONITOR_POLL_INTERVAL
+
+def test_poll_mode_always_polls(monkeypatch):
+    monkeypatch.setattr(Config, 'MONITOR_MODE', 'poll')
+    monitor = TradeMonitor()
+    monitor._on_tick('tick:TCS', {'symbol': 'TCS', 'price': 100.0})
+    assert monitor._scan_interval() == Config.MONITOR_POLL_INTERVAL
+@pytest.mark.parametrize('book', ['levels', 'columnar'])
+def test_cycles_and_stats_never_mark_the_books(db, monkeypatch, book):
+    monkeypatch.setattr(Config, 'MONITOR_BOOK', book)
+    now = datetime.utcnow()
+    for trade_type, entry_price in (('BUY', 100.0), ('SELL', 110.0)):
+        db.trades.insert_one({
+            'user_id': 'client01', 'symbol': 'TCS', 'trade_type': trade_type, 'quantity': 10,
+            'entry_price': entry_price, 'margin_used': entry_price * 10, 'stop_loss': None,
+            'target_price': None, 'status': 'ACTIVE', 'created_at': now
+        })
+    monkeypatch.setattr(
+        trade_monitor_module.market_data_service, 'get_live_prices',
+        lambda symbols: {symbol: {'symbol': symbol, 'price': 105.0} for symbol in symbols}
+    )
+    monitor = TradeMonitor()
+    
+    marks = []
+    book_class = type(create_trigger_book('TCS'))
+    monkeypatch.setattr(book_class, 'mark', lambda self, price: marks.append(price) or 0.0)
+    monitor._check_active_trades()
+    stats = monitor.get_stats()
+    
+    # Walking every position would hold the lock ticks need to settle exits
+    assert marks == []
+    assert stats['tracked_trades'] == 2
+    assert 'unrealized_pnl' not in stats
+
+def test_monitor_stats_need_a_token(client, auth_headers):
+    assert client.get('/market/monitor/stats').status_code == 401
+    
+    response = client.get('/market/monitor/stats', headers=auth_headers())
+    assert response.status_code == 200
+    assert response.get_json()['monitor']['running'] is False
+
+def lag_samples():
+    """(count, sum) of monitor_cycle_lag observations so far"""
+    series = monitor_cycle_lag.series.get((), [0] * (len(monitor_cycle_lag.buckets) + 1) + [0.0])
+    return sum(series[:-1]), series[-1]
+
+def test_cycle_lag_is_measured_against_the_cadence(monkeypatch):
+    monkeypatch.setattr(Config, 'MONITOR_MODE', 'poll')
+    monkeypatch.setattr(Config, 'MONITOR_POLL_INTERVAL', 0.1)
+    monitor = TradeMonitor()
+    monitor.books_loaded_at = time.time()
+    scans = []
+    
+    def overrunning_scan():
+        # Each scan takes 0.15s against a 0.1s cadence
+        scans.append(time.time())
+        time.sleep(0.15)
+        if len(scans) == 4:
+            monitor.running = False
+    monkeypatch.setattr(monitor, '_check_active_trades', overrunning_scan)
+    
+    count, total = lag_samples()
+    monitor.running = True
+    monitor._monitor_loop()
+    count, total = lag_samples()[0] - count, lag_samples()[1] - total
+    
+    # Scans start late against the schedule, not 0s after the previous one ended
+    assert count == 3
+    assert total / count >= 0.04
+    # The next scan starts as soon as the overrunning one ends
+    assert all(later - earlier < 0.2 for earlier, later in zip(scans, scans[1:]))
\ No newline at end of file
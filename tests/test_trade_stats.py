@@ -0,0 +1,117 @@
+import random
+from datetime import datetime
+
+import mongomock
+import pytest
+
+from app.models.portfolio import Portfolio
+from app.models.trade_stats import TradeStats
+from app.routes import trades as trades_routes
+
+def insert_trade(db, user_id, pnl, status='CLOSED'):
+    db.trades.insert_one({
+        'user_id': user_id, 'symbol': 'TCS', 'trade_type': 'BUY', 'quantity': 10, 'entry_price': 100.0,
+        'current_price': 100.0 + pnl / 10, 'margin_used': 1000.0, 'pnl': pnl, 'status': status,
+        'created_at': datetime.utcnow()
+    })
+
+def open_and_close(db, user_id, pnl, status='CLOSED'):
+    """A trade through the same stats calls create_trade and settlement make"""
+    insert_trade(db, user_id, pnl, status)
+    TradeStats.record_open(user_id)
+    if status != 'ACTIVE':
+        TradeStats.record_closes([(user_id, pnl)])
+
+def counters(user_id):
+    stats = TradeStats.find_by_user_id(user_id)
+    return (stats.total_trades, stats.active_trades, stats.profitable_trades, stats.closed_pnl, stats.profit_sum)
+
+def test_increments_before_any_rebuild_are_replaced_by_history(db):
+    for pnl in (50.0, -20.0):
+        insert_trade(db, 'client01', pnl)
+    # The first increment creates the document from nothing but the new trade
+    open_and_close(db, 'client01', 30.0)
+    assert 'rebuilt_at' not in db.trade_stats.find_one({'user_id': 'client01'})
+    
+    assert counters('client01') == (3, 0, 2, 60.0, 80.0)
+
+def test_increments_after_a_rebuild_are_applied(db):
+    insert_trade(db, 'client01', 50.0)
+    assert counters('client01') == (1, 0, 1, 50.0, 50.0)
+    
+    open_and_close(db, 'client01', -10.0)
+    open_and_close(db, 'client01', 0.0, status='ACTIVE')
+    
+    assert counters('client01') == (3, 1, 1, 40.0, 50.0)
+
+def test_increment_racing_a_rebuild_is_not_overwritten(db, monkeypatch):
+    insert_trade(db, 'client01', 50.0)
+    open_and_close(db, 'client01', 20.0)
+    aggregate = mongomock.Collection.aggregate
+    raced = []
+    
+    def aggregate_then_race(collection, pipeline, *args, **kwargs):
+        results = list(aggregate(collection, pipeline, *args, **kwargs))
+        if not raced:
+            # A close lands after the rebuild read the trades but before it writes
+            raced.append(True)
+            open_and_close(db, 'client01', -5.0)
+        return iter(results)
+    monkeypatch.setattr(mongomock.Collection, 'aggregate', aggregate_then_race)
+    
+    assert TradeStats.rebuild('client01') == 1
+    monkeypatch.undo()
+    
+    assert counters('client01') == (3, 0, 2, 65.0, 70.0)
+
+def test_rebuild_of_every_user(db):
+    for user_id, pnl in (('client01', 10.0), ('client02', -10.0), ('client02', 5.0)):
+        insert_trade(db, user_id, pnl)
+    
+    assert TradeStats.rebuild() == 2
+    assert counters('client01') == (1, 0, 1, 10.0, 10.0)
+    assert counters('client02') == (2, 0, 1, -5.0, 5.0)
+
+def baseline_statistics(db, user_id):
+    """The numbers /trades/performance computed from the full history before stats documents"""
+    all_trades = list(db.trades.find({'user_id': user_id}))
+    active_trades = [trade for trade in all_trades if trade['status'] == 'ACTIVE']
+    profitable_trades = [trade for trade in all_trades if trade['pnl'] > 0 and trade['status'] != 'ACTIVE']
+    closed_trades_count = len(all_trades) - len(active_trades)
+    return {
+        'total_trades': len(all_trades),
+        'active_trades': len(active_trades),
+        'closed_trades': closed_trades_count,
+        'win_rate': round(len(profitable_trades) / closed_trades_count * 100, 2) if closed_trades_count else 0,
+        'total_pnl': sum(trade['pnl'] for trade in all_trades),
+        'active_pnl': sum(trade['pnl'] for trade in active_trades),
+        'average_profit': round(
+            sum(trade['pnl'] for trade in profitable_trades) / len(profitable_trades), 2
+        ) if profitable_trades else 0,
+        'profitable_trades': len(profitable_trades)
+    }
+
+@pytest.mark.parametrize('rebuilt_first', [False, True])
+def test_performance_matches_the_full_history_computation(client, auth_headers, db, monkeypatch, rebuilt_first):
+    # Without live prices open trades are reported at their stored PnL, as before
+    monkeypatch.setattr(trades_routes.market_data_service, 'get_live_prices', lambda symbols: {})
+    Portfolio('client01').save()
+    rng = random.Random(11)
+    for index in range(60):
+        pnl = round(rng.uniform(-500, 500), 2) if index % 7 else 0.0
+        status = rng.choice(('CLOSED', 'STOP_LOSS_HIT', 'TARGET_HIT', 'ACTIVE'))
+        if rebuilt_first and index == 30:
+            TradeStats.rebuild('client01')
+        if rebuilt_first:
+            open_and_close(db, 'client01', pnl, status)
+        else:
+            insert_trade(db, 'client01', pnl, status)
+    
+    response = client.get('/trades/performance/client01', headers=auth_headers())
+    
+    assert response.status_code == 200
+    statistics = response.get_json()['performance']['trade_statistics']
+    expected = baseline_statistics(db, 'client01')
+    assert statistics.keys() == expected.keys()
+    for key, value in expected.items():
+        assert statistics[key] == pytest.approx(value), key
\ No newline at end of file
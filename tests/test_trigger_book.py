@@ -0,0 +1,101 @@
+import random
+from datetime import datetime
+
+import pytest
+
+from app.models.trade import Trade, TradeStatus
+from app.services.position_book import ColumnarPositionBook
+from app.services.trigger_book import SymbolTriggerBook
+
+BOOKS = [SymbolTriggerBook, ColumnarPositionBook]
+
+def insert_trade(db, trade_type, stop_loss, target_price, entry_price=100.0):
+    now = datetime.utcnow()
+    trade_data = {
+        'user_id': 'client01',
+        'symbol': 'TCS',
+        'trade_type': trade_type,
+        'quantity': 10,
+        'entry_price': entry_price,
+        'margin_used': entry_price * 10,
+        'stop_loss': stop_loss,
+        'target_price': target_price,
+        'current_price': entry_price,
+        'pnl': 0.0,
+        'status': 'ACTIVE',
+        'created_at': now,
+        'updated_at': now,
+        'closed_at': None,
+        'exit_price': None
+    }
+    trade_data['_id'] = db.trades.insert_one(trade_data).inserted_id
+    return trade_data
+
+def random_level(rng, entry_price, direction):
+    """A level a few percent from entry, or one of the falsy values that never trigger"""
+    if rng.random() < 0.2:
+        return rng.choice((None, 0, 0.0))
+    return round(entry_price * (1 + direction * rng.uniform(0.0, 0.05)), 2)
+
+@pytest.mark.parametrize('book_class', BOOKS)
+@pytest.mark.parametrize('seed', range(5))
+def test_book_triggers_exactly_what_check_auto_exit_closes(db, book_class, seed):
+    rng = random.Random(seed)
+    book = book_class('TCS')
+    trades = {}
+    for _ in range(200):
+        trade_type = rng.choice(('BUY', 'SELL'))
+        direction = 1 if trade_type == 'BUY' else -1
+        entry_price = round(rng.uniform(95, 105), 2)
+        trade_data = insert_trade(
+            db, trade_type,
+            stop_loss=random_level(rng, entry_price, -direction),
+            target_price=random_level(rng, entry_price, direction),
+            entry_price=entry_price
+        )
+        book.add(trade_data)
+        trades[str(trade_data['_id'])] = Trade.from_dict(trade_data)
+    
+    price = 100.0
+    for _ in range(300):
+        price = round(price * (1 + rng.gauss(0, 0.005)), 2)
+        
+        expected = {}
+        for trade_id, trade in trades.items():
+            if trade.check_auto_exit(price):
+                expected[trade_id] = trade.status
+        
+        crossed = {str(trade_data['_id']): status for trade_data, status in book.crossed(price)}
+        assert crossed == expected
+        for trade_id in crossed:
+            book.remove(trade_id)
+            del trades[trade_id]
+    
+    # The path has to actually exercise exits for the comparison to mean anything
+    assert 0 < len(trades) < 200
+    assert len(book) == len(trades)
+
+@pytest.mark.parametrize('book_class', BOOKS)
+def test_stop_loss_wins_when_both_levels_cross_on_the_same_tick(db, book_class):
+    book = book_class('TCS')
+    buy = insert_trade(db, 'BUY', stop_loss=100.0, target_price=99.0)
+    sell = insert_trade(db, 'SELL', stop_loss=100.0, target_price=101.0)
+    book.add(buy)
+    book.add(sell)
+    
+    crossed = {str(trade_data['_id']): status for trade_data, status in book.crossed(100.0)}
+    assert crossed == {str(buy['_id']): TradeStatus.STOP_LOSS_HIT, str(sell['_id']): TradeStatus.STOP_LOSS_HIT}
+    
+    trade = Trade.from_dict(buy)
+    assert trade.check_auto_exit(100.0)
+    assert trade.status == TradeStatus.STOP_LOSS_HIT
+
+@pytest.mark.parametrize('book_class', BOOKS)
+@pytest.mark.parametrize('level', [None, 0, 0.0])
+def test_falsy_levels_never_trigger(db, book_class, level):
+    book = book_class('TCS')
+    for trade_type in ('BUY', 'SELL'):
+        book.add(insert_trade(db, trade_type, stop_loss=level, target_price=level))
+    
+    for price in (0.0, 0.01, 100.0, 1e9):
+        assert book.crossed(price) == []
\ No newline at end of file